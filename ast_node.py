@@ -1,18 +1,89 @@
 from ast_visitor import AstVisitor
+from code_generator import CodeGenerator
+from emitter import Emitter
 
 
 class ASTNode:
+    """
+     Node of the AST. Nodes declare their attributes in `__slots__`, so none carries a `__dict__`,
+     and a node without children shares one empty tuple instead of holding a list of its own:
+     a large program is mostly such leaves, and both take memory and work from the garbage
+     collector. Children are only added through `add_child`.
+    """
+
+    __slots__ = ('parent', 'children')
+
+    # names the handlers of the node in a visitor: `visit_<kind>`, `leave_<kind>`...
+    kind = None
+
+    # whether statements can be among the descendants of the node; expressions never hold any,
+    # so `resolve_context` does not walk into them
+    holds_statements = False
 
     def __init__(self, parent=None):
         self.parent = parent
-        self.children = []
+        self.children = ()
 
     def add_child(self, node):
         node.parent = self
-        self.children.append(node)
+        if self.children:
+            self.children.append(node)
+        else:
+            self.children = [node]
 
     def accept(self, v: AstVisitor):
         raise NotImplementedError()
 
+    def child_context_(self, block, loop, function):
+        """
+         The innermost block (a code block or a function definition), loop and function around
+         the children of this node, given those around the node itself.
+        """
+        return block, loop, function
+
+    def bind_context_(self, block, loop, function):
+        """
+         Keeps what the node needs of its context for emission, and checks that it is valid
+         there.
+        """
+        pass
+
+    def resolve_context(self):
+        """
+         Binds every node of the subtree to its enclosing block, loop and function, so that
+         emission never searches the ancestors of a node. Misplaced statements, such as `break`
+         outside a loop, raise here, the first one in source order. Only statements are visited,
+         with an explicit stack, whatever the depth of the tree.
+        """
+        ancestors = []
+        node = self.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        context = (None, None, None)
+        for node in reversed(ancestors):
+            context = node.child_context_(*context)
+
+        stack = [(self, context)]
+        while stack:
+            node, context = stack.pop()
+            node.bind_context_(*context)
+            if node.holds_statements:
+                child_context = node.child_context_(*context)
+                stack.extend([(child, child_context) for child in reversed(node.children)])
+
+    def emit_to(self, out: Emitter):
+        """
+         Writes the instructions of the node into `out`. The context of the node must have been
+         resolved by `resolve_context`.
+        """
+        CodeGenerator(out).walk(self)
+
     def emit(self):
-        raise NotImplementedError()
+        """
+         Returns the instructions of the node as a list.
+        """
+        self.resolve_context()
+        out = Emitter()
+        self.emit_to(out)
+        return out.instructions()
@@ -2,6 +2,71 @@ from abc import ABC, abstractmethod
 
 
 class AstVisitor(ABC):
+    """
+     Visitor of the AST. `walk(root)` visits a whole subtree with an explicit stack rather than
+     Python recursion, so the depth of the tree is not limited by the recursion limit. The
+     handlers of a node are the methods named after its `kind`:
+
+      - `visit_<kind>(node)`, pre-order. It returns the children to walk, or None for all of them;
+      - `between_<kind>(node, idx)`, optional, after child `idx` of those when another one follows;
+      - `leave_<kind>(node)`, optional, post-order, once the children have been walked.
+
+     They are looked up when the visitor class is created, into a table from every kind to its
+     handlers that `walk` dispatches through. `node.accept(visitor)` still calls the `visit_*`
+     method of a single node.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # kind -> (visit, between, leave) functions of the class, filled for every `visit_*`
+        # method so that `walk` never misses
+        cls.handlers_ = {name[6:]: (getattr(cls, name),
+                                    getattr(cls, 'between_' + name[6:], None),
+                                    getattr(cls, 'leave_' + name[6:], None))
+                         for name in dir(cls) if name.startswith('visit_')}
+
+    def walk(self, root):
+        """
+         Visits `root` and its descendants, in the order a recursive visitor would.
+        """
+        table = self.handlers_
+        # for each node whose children are being walked: the iterator it was met in, and its
+        # leave handler and itself; the nodes without children are visited in the loop over
+        # their siblings and never go on a stack
+        iterators, leaves = [], []
+        it = iter((root,))
+        while True:
+            for node in it:
+                visit, between, leave = table[node.kind]
+                children = visit(self, node)
+                if children is None:
+                    children = node.children
+                if children:
+                    iterators.append(it)
+                    leaves.append(leave)
+                    leaves.append(node)
+                    it = iter(children) if between is None else self.interleave_(node, children, between)
+                    break
+                if leave is not None:
+                    leave(self, node)
+            else:
+                if not iterators:
+                    return
+                it = iterators.pop()
+                node = leaves.pop()
+                leave = leaves.pop()
+                if leave is not None:
+                    leave(self, node)
+
+    def interleave_(self, node, children, between):
+        """
+         Iterates over `children`, calling `between` before each child but the first: the next
+         child is only asked for once the previous one has been walked.
+        """
+        yield children[0]
+        for idx in range(1, len(children)):
+            between(self, node, idx - 1)
+            yield children[idx]
 
     @abstractmethod
     def visit_id(self, node):
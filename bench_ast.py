@@ -0,0 +1,47 @@
+"""
+ AST size benchmarks. Run as a script: `python bench_ast.py [n_nodes]`,
+ where n_nodes is the approximate size of the generated AST (default 1000000).
+"""
+import gc
+import sys
+
+from bench_lexer import best_time, measure_memory
+from input_generators import generate_flat_source
+from my_lexer import Lexer
+from my_parser import OldParser
+from my_parser2 import NewParser
+
+# nodes of each statement of `generate_flat_source`
+NODES_PER_STATEMENT = 9
+
+
+def count_nodes(ast):
+    n = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        n += 1
+        stack.extend(node.children)
+    return n
+
+
+def bench_build(parser, tokens, repeat=3):
+    name = parser.__class__.__name__
+    elapsed, _ = best_time(lambda: parser.parse(tokens), repeat)
+
+    gc.collect()
+    n_objects = len(gc.get_objects())
+    ast, current, peak = measure_memory(lambda: parser.parse(tokens))
+    n_tracked = len(gc.get_objects()) - n_objects
+    n_nodes = count_nodes(ast)
+    print(f'{name:>10}: {n_nodes:,} nodes built in {elapsed:.3f}s; {current / n_nodes:.0f} bytes/node kept, '
+          f'peak {peak / 2 ** 20:.1f}MB; {n_tracked / n_nodes:.2f} objects tracked by the GC per node')
+    elapsed, _ = best_time(gc.collect, 1)
+    print(f'{"":>10}  full collection with the AST alive: {elapsed * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    tokens = Lexer().analyze(generate_flat_source(size // NODES_PER_STATEMENT))
+    for parser in [OldParser(), NewParser()]:
+        bench_build(parser, tokens)
@@ -0,0 +1,31 @@
+"""
+ Code generation benchmarks. Run as a script: `python bench_codegen.py [depth]`,
+ where depth is the nesting depth of the generated programs (default 1000).
+"""
+import sys
+
+from bench_lexer import best_time
+from input_generators import generate_chain_source, generate_nested_jumps_source, generate_nested_source, \
+    generate_source
+from compiler import Compiler
+from my_lexer import Lexer
+from my_parser import OldParser
+
+
+def bench_emit(name, code, repeat=3):
+    ast = OldParser().parse(Lexer().analyze(code))
+    elapsed, cmds = best_time(ast.emit, repeat)
+    print(f'{name:>8}: {len(cmds)} instructions emitted in {elapsed * 1000:.1f}ms, '
+          f'{len(cmds) / elapsed:,.0f} instructions/sec')
+
+
+if __name__ == '__main__':
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # the parser recurses once per level of blocks
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), depth * 20))
+    bench_emit('nested', generate_nested_source(depth))
+    bench_emit('jumps', generate_nested_jumps_source(depth))
+    bench_emit('chain', generate_chain_source(depth * 10))
+    bench_emit('flat', generate_source(depth))
+    elapsed, _ = best_time(lambda: Compiler(OldParser()).compile(generate_nested_source(depth)), 3)
+    print(f'Nested source compiled in {elapsed * 1000:.1f}ms')
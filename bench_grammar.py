@@ -0,0 +1,36 @@
+"""
+ Grammar analysis benchmarks. Run as a script: `python bench_grammar.py [size]`,
+ where size scales the generated grammars (default 1000).
+"""
+import sys
+
+from bench_lexer import best_time
+from first_and_follow import GrammarAnalysis, description_analysis
+from grammar import Grammar
+from input_generators import generate_chain_grammar, generate_expression_grammar, generate_random_grammar
+
+
+def load(grammar):
+    out = Grammar()
+    for nonterminal, alternatives in grammar.items():
+        for symbols in alternatives:
+            out.add_prod(nonterminal, [s for s in symbols if s != 'e'])
+    return out
+
+
+def bench_analysis(name, grammar, repeat=3):
+    load_elapsed, grammar = best_time(lambda: load(grammar), repeat)
+    elapsed, analysis = best_time(lambda: GrammarAnalysis(grammar), repeat)
+    conflicts_elapsed, conflicts = best_time(analysis.conflicts, repeat)
+    print(f'{name:>12}: {len(grammar.productions):>6} productions loaded in {load_elapsed * 1000:.1f}ms, '
+          f'analyzed in {elapsed * 1000:.1f}ms, {len(conflicts)} conflicts found in {conflicts_elapsed * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    elapsed, _ = best_time(lambda: GrammarAnalysis(description_analysis().grammar), 3)
+    print(f'grammar_description.txt analyzed in {elapsed * 1000:.2f}ms')
+    bench_analysis('chain', generate_chain_grammar(size))
+    bench_analysis('expression', generate_expression_grammar(size // 2))
+    bench_analysis('random', generate_random_grammar(size))
+    bench_analysis('random', generate_random_grammar(size * 10))
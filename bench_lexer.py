@@ -0,0 +1,133 @@
+"""
+ Lexer benchmarks. Run as a script: `python bench_lexer.py [size]`,
+ where size is the number of generated functions (default 2000).
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from input_generators import generate_source
+from my_lexer import Lexer, OldLexer, map_source_file
+from parallel_lexer import ParallelLexer
+
+
+def best_time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench_throughput(code, repeat=3):
+    print(f'Source: {len(code)} chars, {code.count(chr(10))} lines')
+    for lexer in [OldLexer(), Lexer()]:
+        elapsed, tokens = best_time(lambda: lexer.analyze(code), repeat)
+        name = lexer.__class__.__name__
+        print(f'{name:>10}: {len(tokens)} tokens in {elapsed:.3f}s, {len(tokens) / elapsed:,.0f} tokens/sec')
+
+
+def measure_memory(fn):
+    tracemalloc.start()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def bench_token_stream(code, repeat=3):
+    lexer = Lexer()
+    print('Token list vs TokenStream:')
+    for name, fn in [('list of Token', lambda: lexer.analyze(code)), ('TokenStream', lambda: lexer.tokenize(code))]:
+        elapsed, _ = best_time(fn, repeat)
+        tokens, current, peak = measure_memory(fn)
+        n = len(tokens)
+        print(f'{name:>14}: {elapsed:.3f}s, {n / elapsed:,.0f} tokens/sec, '
+              f'kept {current / n:.1f} bytes/token, peak {peak / 2 ** 20:.1f} MiB')
+
+
+def bench_file_sources(code):
+    lexer = Lexer()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'source.prog')
+        with open(file_path, 'w') as f:
+            f.write(code)
+
+        def read_and_tokenize():
+            with open(file_path, 'r') as source_file:
+                return lexer.tokenize(source_file.read())
+
+        print('Tokenizing a file:')
+        for name, fn in [('read()', read_and_tokenize), ('mmap', lambda: lexer.tokenize(map_source_file(file_path)))]:
+            elapsed, _ = best_time(fn, 3)
+            _, _, peak = measure_memory(fn)
+            print(f'{name:>14}: {elapsed:.3f}s, peak {peak / 2 ** 20:.1f} MiB')
+
+
+def bench_relex(code):
+    lexer = Lexer()
+    elapsed, stream = best_time(lambda: lexer.tokenize(code), 1)
+    print(f'Relex on {code.count(chr(10))} lines; full tokenize: {elapsed * 1000:.1f}ms')
+    elapsed, _ = best_time(stream.line_starts, 1)
+    print(f'  line index, built once on first use: {elapsed * 1000:.1f}ms')
+    elapsed, _ = best_time(stream.lines, 1)
+    print(f'  lines of the source, split once on the first edit: {elapsed * 1000:.1f}ms')
+
+    middle = code.index('acc = acc + arg', len(code) // 2)
+    start = time.perf_counter()
+    for ch in 'xy + 1':
+        lexer.relex(stream, middle, 0, ch)
+        middle += 1
+    elapsed = (time.perf_counter() - start) / 6
+    print(f'  typing in one place: {elapsed * 1000:.3f}ms per keystroke')
+
+    block = generate_source(1)[1:-24]
+    for n_functions in [1, 10, 100, 1000]:
+        inserted = block * n_functions
+        start = time.perf_counter()
+        lexer.relex(stream, middle, 0, inserted)
+        elapsed = time.perf_counter() - start
+        print(f'  paste of {len(inserted)} chars: {elapsed * 1000:.3f}ms')
+
+    start = time.perf_counter()
+    lexer.relex(stream, 0, 0, '  ')
+    elapsed = time.perf_counter() - start
+    print(f'  keystroke far from the previous edits: {elapsed * 1000:.3f}ms')
+
+    elapsed, _ = best_time(lambda: stream[0].lexeme, 1)
+    print(f'  first lexeme read after the edits, which joins the lines: {elapsed * 1000:.1f}ms')
+
+
+def bench_parallel(code):
+    """
+     Speedup of ParallelLexer over the serial lexer for every worker count up to the number of
+     cores. With a single core only the pool overhead is measured.
+    """
+    n_cores = os.cpu_count() or 1
+    serial, _ = best_time(lambda: Lexer().tokenize(code), 3)
+    print(f'Parallel lexing of {len(code)} chars on {n_cores} cores; serial tokenize: {serial:.3f}s')
+
+    worker_counts = sorted({1, *[2 ** i for i in range(1, n_cores.bit_length())], n_cores})
+    for workers in worker_counts:
+        with ParallelLexer(workers=workers, min_parallel_size=0) as lexer:
+            lexer.tokenize(code)  # start the pool outside of the timing
+            elapsed, _ = best_time(lambda: lexer.tokenize(code), 3)
+            tokens_elapsed, _ = best_time(lambda: lexer.analyze(code), 1)
+        print(f'  {workers:>3} workers: tokenize {elapsed:.3f}s, speedup {serial / elapsed:.2f}x; '
+              f'analyze {tokens_elapsed:.3f}s')
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    src = generate_source(size)
+    bench_throughput(src)
+    bench_token_stream(src)
+    bench_file_sources(src)
+    bench_relex(generate_source(9100))
+    bench_parallel(generate_source(size * 5))
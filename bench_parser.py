@@ -0,0 +1,73 @@
+"""
+ Parser benchmarks. Run as a script: `python bench_parser.py [size]`,
+ where size is the number of generated functions (default 2000).
+"""
+import os
+import sys
+
+from bench_lexer import best_time
+from input_generators import generate_expression_source, generate_flat_source, generate_source
+from my_lexer import Lexer
+from my_parser import OldParser
+from my_parser2 import NewParser
+from table_parser import TableParser
+from lalr_parser import LALRParser
+from parallel_parser import ParallelParser
+from first_and_follow import GrammarAnalysis, load_description
+from ll1_table import build_description_table, build_parse_table
+from lalr_table import build_lalr_table, lalr_description_table, load_grammar
+
+
+def bench_parsers(code, repeat=3):
+    tokens = Lexer().analyze(code)
+    print(f'Parsing {len(tokens)} tokens')
+    for parser in [OldParser(), NewParser(), TableParser(), LALRParser()]:
+        elapsed, _ = best_time(lambda: parser.parse(tokens), repeat)
+        name = parser.__class__.__name__
+        print(f'{name:>12}: {elapsed:.3f}s, {len(tokens) / elapsed:,.0f} tokens/sec')
+
+
+def build_ll1_table():
+    analysis = GrammarAnalysis(*load_description())
+    return build_parse_table(analysis.grammar, analysis.first_of, analysis.follow, analysis.start)
+
+
+def bench_table_generation(repeat=3):
+    """
+     Tables generated from the grammar descriptions, against tables loaded from the cache.
+    """
+    elapsed, table = best_time(build_ll1_table, repeat)
+    print(f'LL(1) table for {len(table.productions)} productions generated in {elapsed * 1000:.1f}ms')
+    elapsed, _ = best_time(build_description_table, repeat)
+    print(f'LL(1) table loaded from the cache in {elapsed * 1000:.1f}ms')
+
+    elapsed, table = best_time(lambda: build_lalr_table(load_grammar()), repeat)
+    print(f'LALR(1) table with {table.n_states()} states generated in {elapsed * 1000:.1f}ms')
+    elapsed, _ = best_time(lalr_description_table, repeat)
+    print(f'LALR(1) table loaded from the cache in {elapsed * 1000:.1f}ms')
+
+
+def bench_parallel(code):
+    """
+     Speedup of ParallelParser over OldParser for every worker count up to the number of cores.
+     With a single core only the overhead of the pool is measured.
+    """
+    n_cores = os.cpu_count() or 1
+    tokens = Lexer().analyze(code)
+    serial, _ = best_time(lambda: OldParser().parse(tokens), 3)
+    print(f'Parallel parsing of {len(tokens)} tokens on {n_cores} cores; OldParser: {serial:.3f}s')
+
+    worker_counts = sorted({2, *[2 ** i for i in range(1, n_cores.bit_length())], max(2, n_cores)})
+    for workers in worker_counts:
+        parser = ParallelParser(workers=workers, min_parallel_tokens=0)
+        elapsed, _ = best_time(lambda: parser.parse(tokens), 3)
+        print(f'  {workers:>3} workers: {elapsed:.3f}s, speedup {serial / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench_table_generation()
+    bench_parsers(generate_source(size))
+    bench_parsers(generate_flat_source(size * 10))
+    bench_parsers(generate_expression_source(size * 2))
+    bench_parallel(generate_source(size * 5))
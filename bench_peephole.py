@@ -0,0 +1,46 @@
+"""
+ Optimization benchmarks: instructions emitted and executed for a few programs, compiled with
+ and without optimizations, and the hits of each peephole rule; then the time to load and run a
+ program of many functions that are mostly never called. Run as a script:
+ `python bench_peephole.py [n]`, where n scales the loops of the programs and the number of
+ functions (default 1000).
+"""
+import sys
+
+from bench_lexer import best_time
+from input_generators import count_instructions, generate_programs, generate_source
+from compiler import Compiler
+from my_parser import OldParser
+from virtual_machine import VirtualMachine, preprocess_code
+
+
+def bench_optimizations(programs):
+    total_hits = {}
+    for name, src in programs.items():
+        compiler = Compiler(OldParser(), optimize=True)
+        n_static, n_executed = count_instructions(Compiler(OldParser(), optimize=False).compile(src))
+        n_static_opt, n_executed_opt = count_instructions(compiler.compile(src))
+        print(f'{name:>10}: {n_static} -> {n_static_opt} instructions, '
+              f'{n_executed} -> {n_executed_opt} executed ({1 - n_executed_opt / n_executed:.0%} fewer)')
+        for rule, hits in compiler.peephole_hits.items():
+            total_hits[rule] = total_hits.get(rule, 0) + hits
+    print('Peephole rule hits:', ', '.join(f'{rule}={hits}' for rule, hits in total_hits.items()))
+
+
+def bench_dead_code(n_functions, repeat=3):
+    """
+     Loading and running a program of `n_functions` functions, of which it calls one.
+    """
+    src = generate_source(n_functions)
+    for optimize in [False, True]:
+        code = Compiler(OldParser(), optimize=optimize).compile(src)
+        load_time, (program, _) = best_time(lambda: preprocess_code(code), repeat)
+        run_time, _ = best_time(lambda: VirtualMachine().run_code(code), repeat)
+        print(f'{"optimized" if optimize else "plain":>10}: {len(program)} instructions, '
+              f'loaded in {load_time * 1000:.1f}ms, loaded and run in {run_time * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    bench_optimizations(generate_programs(n))
+    bench_dead_code(n)
@@ -0,0 +1,132 @@
+from ast_visitor import AstVisitor
+from emitter import Emitter
+from errors import CompileError
+from my_lexer import TokenType
+
+
+binary_op_map = {TokenType.PLUS: 'add', TokenType.MINUS: 'sub', TokenType.MUL: 'mul', TokenType.DIV: 'div',
+                 TokenType.LE: 'lt', TokenType.GE: 'gt', TokenType.EQUAL: 'eq', TokenType.NOT_EQUAL: 'neq'}
+
+
+class CodeGenerator(AstVisitor):
+    """
+     Writes the instructions of an AST into an `Emitter`, as `AstVisitor.walk` goes through it,
+     so a tree of any depth can be emitted. The context of the nodes must have been resolved by
+     `ASTNode.resolve_context`.
+
+     What a node emits before its children is written by its `visit_*` handler, what it emits
+     between them (the jump after a condition) by `between_*` and what it emits after them by
+     `leave_*`. Addresses are given to variables as their declarations are met, in source order.
+    """
+
+    def __init__(self, out: Emitter):
+        self.out = out
+        self.emit = out.emit
+
+    def visit_id(self, node):
+        self.emit('load %d' % node.symbol.address)
+
+    def visit_num(self, node):
+        self.emit('push %d' % node.value)
+
+    def visit_expr(self, node):
+        if node.op in binary_op_map:
+            return None
+        if node.op == TokenType.ASSIGN:
+            # the target is stored to, not evaluated
+            return node.children[1:]
+        return ()
+
+    def leave_expr(self, node):
+        op = binary_op_map.get(node.op)
+        if op is not None:
+            self.emit(op)
+        elif node.op == TokenType.ASSIGN:
+            self.emit('store %d' % node.children[0].symbol.address)
+
+    def visit_entry_point(self, node):
+        self.out.label('program')
+
+    def visit_declaration(self, node):
+        self.emit('push 1')
+        self.emit('alloc')
+
+        block = node.parent
+        node.name.address = block.curr_mem_idx
+        block.curr_mem_idx += 1
+        block.memory_size += 1
+
+    def leave_declaration(self, node):
+        if node.children:
+            self.emit('store %d' % node.name.address)
+
+    def visit_if(self, node):
+        if len(node.children) < 2:
+            raise CompileError('Too few children for `if` statement')
+        return node.children[:2]
+
+    def between_if(self, node, idx):
+        self.emit('jz _if%d' % node.label_id)
+
+    def leave_if(self, node):
+        self.out.label('_if%d' % node.label_id)
+
+    def visit_while(self, node):
+        if len(node.children) < 2:
+            raise CompileError('Too few children for `while` statement')
+        self.out.label(node.cond_check_label)
+        return node.children[:2]
+
+    def between_while(self, node, idx):
+        self.emit('jz %s' % node.after_label)
+
+    def leave_while(self, node):
+        self.emit('jump %s' % node.cond_check_label)
+        self.out.label(node.after_label)
+
+    def visit_continue(self, node):
+        self.emit('jump %s' % node.loop.cond_check_label)
+
+    def visit_break(self, node):
+        self.emit('jump %s' % node.loop.after_label)
+
+    def visit_code_block(self, node):
+        if node.enclosing_block:
+            node.curr_mem_idx = node.enclosing_block.curr_mem_idx
+
+    def leave_code_block(self, node):
+        self.emit('push %d' % node.memory_size)
+        self.emit('dealloc')
+
+    def visit_function_definition(self, node):
+        if len(node.children) < 1 or node.children[0].kind != 'code_block':
+            raise ValueError('No code block for function:', node.func_symbol.name)
+
+        for var in node.arg_symbols:
+            var.address = node.curr_mem_idx
+            node.curr_mem_idx += 1
+            node.memory_size += 1
+
+        self.out.label(node.func_symbol.label)
+        for var in node.arg_symbols[::-1]:
+            self.emit('push 1')
+            self.emit('alloc')
+            self.emit('store %d' % var.address)
+        return node.children[:1]
+
+    def leave_function_definition(self, node):
+        self.emit('ret')
+
+    def visit_function_call(self, node):
+        if len(node.children) != len(node.func_symbol.args):
+            raise CompileError('Invalid arity in call to %s' % node.func_symbol.name)
+
+    def leave_function_call(self, node):
+        self.emit('push %d' % len(node.children))
+        self.emit('call %s' % node.func_symbol.label)
+
+    def visit_return(self, node):
+        return node.children[:1]
+
+    def leave_return(self, node):
+        self.emit('ret')
@@ -1,26 +1,78 @@
-from my_lexer import Lexer
+from constant_folding import ConstantFolder
+from dead_code import DeadCodeEliminator
+from emitter import Emitter
+from my_lexer import Lexer, map_source_file
 from parser import Parser
 from my_parser import OldParser
+from peephole import PeepholeOptimizer
 from virtual_machine import VirtualMachine
+import mmap
 
 
 class Compiler:
 
-    def __init__(self, parser: Parser, debug=False):
+    def __init__(self, parser: Parser, debug=False, optimize=True):
         self.parser = parser
         self.debug = debug
+        self.optimize = optimize
+
+        # instructions the optimizations removed from the last compiled program, and the hits of
+        # each peephole rule there
+        self.instructions_saved = 0
+        self.peephole_hits = {}
 
     def compile(self, code):
+        """
+         Compiles source given as a string, a bytes-like buffer or a text file object. Tokens
+         are pulled from the lexer by the parser as it goes, so the full token list is never built.
+         With `optimize`, expressions are simplified by `ConstantFolder` before emission, the
+         emitted instructions by `PeepholeOptimizer`, and `DeadCodeEliminator` drops those that
+         can never run, unused functions included.
+        """
         lex = Lexer()
-        tokens = lex.analyze(code)
+        tokens = lex.iter_tokens(code)
 
         ast = self.parser.parse(tokens)
 
-        cmd_list = ast.emit()
+        ast.resolve_context()
+        self.instructions_saved = 0
+        self.peephole_hits = {}
+        if self.optimize:
+            folder = ConstantFolder()
+            folder.walk(ast)
+            self.instructions_saved += folder.saved
+            if self.debug:
+                print(f'Constant folding saved {folder.saved} instructions')
+
+        out = Emitter()
+        ast.emit_to(out)
+        out.emit('halt')
+        if self.optimize:
+            peephole = PeepholeOptimizer()
+            n_emitted = len(out)
+            out.replace(peephole.optimize(out.instructions()))
+            self.instructions_saved += n_emitted - len(out)
+            self.peephole_hits = peephole.hits
+            if self.debug:
+                print(f'Peephole rules saved {n_emitted - len(out)} instructions:', peephole.hits)
+
+            eliminator = DeadCodeEliminator()
+            out.replace(eliminator.optimize(out.instructions()))
+            self.instructions_saved += eliminator.removed
+            if self.debug:
+                print(f'Dead code elimination removed {eliminator.removed} instructions')
+        return out.text()
 
-        code = ';\n'.join(cmd_list) + ';\nhalt;'
-        code = code.replace(':;', ':')
-        return code
+    def compile_file(self, file_path):
+        """
+         Compiles a source file through a read-only memory map, without a decoded copy of it.
+        """
+        source = map_source_file(file_path)
+        try:
+            return self.compile(source)
+        finally:
+            if isinstance(source, mmap.mmap):
+                source.close()
 
 
 if __name__ == '__main__':
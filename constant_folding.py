@@ -0,0 +1,169 @@
+import operator
+
+from ast_visitor import AstVisitor
+from code_generator import binary_op_map
+
+# what the virtual machine computes for the operators of `binary_op_map` that give an integer on
+# two integers; comparisons push 1 or 0. `div` is not there: the machine divides with `/`, whose
+# float result a `push` of a constant cannot stand for
+vm_operations = {'add': operator.add, 'sub': operator.sub, 'mul': operator.mul,
+                 'lt': lambda v1, v2: int(v1 < v2), 'gt': lambda v1, v2: int(v1 > v2),
+                 'eq': lambda v1, v2: int(v1 == v2), 'neq': lambda v1, v2: int(v1 != v2)}
+
+
+def fold(op, v1, v2):
+    """
+     Value of `v1 op v2` as the virtual machine computes it, `op` being an instruction such as
+     'add', or None when it cannot be pushed as a constant.
+    """
+    operation = vm_operations.get(op)
+    if operation is None:
+        return None
+    return operation(v1, v2)
+
+
+def droppable_size(node):
+    """
+     Number of instructions of expression `node` when `node * 0` can be replaced by the constant 0,
+     None otherwise. The expression must only load variables and constants and compute with them,
+     without a division that may fail, and its value must be an integer: the machine gives 0.0
+     for a float times 0. A variable or a quotient may hold a float, a comparison always gives an
+     integer, and `+`, `-` and `*` give one on integers.
+    """
+    size = 0
+    # (node, whether its value must be an integer)
+    stack = [(node, True)]
+    while stack:
+        node, integer = stack.pop()
+        size += 1
+        if node.kind == 'num':
+            continue
+        if node.kind == 'id':
+            if integer:
+                return None
+            continue
+        op = binary_op_map.get(node.op) if node.kind == 'expr' else None
+        if op is None:
+            return None
+        if op == 'div':
+            divisor = node.children[1]
+            if integer or divisor.kind != 'num' or divisor.value == 0:
+                return None
+        operands_integer = integer and op in ('add', 'sub', 'mul')
+        stack.extend((child, operands_integer) for child in node.children)
+    return size
+
+
+class ConstantFolder(AstVisitor):
+    """
+     Simplifies the expressions of an AST before emission, bottom-up as `walk` leaves each node:
+
+      - an operator on two constants is replaced by its value, unless it is a division (see
+        `vm_operations`);
+      - `x + 0`, `0 + x`, `x - 0`, `x * 1` and `1 * x` by `x`;
+      - `x * 0` and `0 * x` by 0 when `x` can be dropped (see `droppable_size`);
+      - `c + x` by `x + c` for a constant `c`, so that `PeepholeOptimizer` finds `x + 1` as
+        `push 1; add` and makes it `inc`, as it makes `x - 1` `dec`.
+
+     `saved` counts the instructions the rewrites removed from the emitted code.
+    """
+
+    def __init__(self):
+        self.saved = 0
+
+    def fold_children_(self, node):
+        children = node.children
+        for i, child in enumerate(children):
+            if child.kind == 'expr':
+                simplified = self.simplified_(child)
+                if simplified is not child:
+                    simplified.parent = node
+                    children[i] = simplified
+
+    def simplified_(self, node):
+        op = binary_op_map.get(node.op)
+        if op is None:
+            return node
+
+        left, right = node.children
+        left_value = left.value if left.kind == 'num' else None
+        right_value = right.value if right.kind == 'num' else None
+
+        if left_value is not None and right_value is not None:
+            value = fold(op, left_value, right_value)
+            if value is not None:
+                self.saved += 2
+                left.value = value
+                return left
+
+        if op == 'add' or op == 'sub':
+            if right_value == 0:
+                self.saved += 2
+                return left
+            if op == 'add' and left_value == 0:
+                self.saved += 2
+                return right
+            if op == 'add' and left_value is not None:
+                # `c + x` is emitted as `x + c`, which pushing a constant after `x` rather than
+                # before does not change; the peephole pass turns `x + 1` into `inc`
+                node.children = [right, left]
+                return node
+
+        elif op == 'mul':
+            if right_value == 1:
+                self.saved += 2
+                return left
+            if left_value == 1:
+                self.saved += 2
+                return right
+            if right_value == 0 or left_value == 0:
+                zero, other = (right, left) if right_value == 0 else (left, right)
+                size = droppable_size(other)
+                if size is not None:
+                    self.saved += size + 1
+                    return zero
+
+        return node
+
+    def visit_id(self, node):
+        pass
+
+    def visit_num(self, node):
+        pass
+
+    def visit_expr(self, node):
+        pass
+
+    def visit_entry_point(self, node):
+        pass
+
+    def visit_declaration(self, node):
+        pass
+
+    def visit_if(self, node):
+        pass
+
+    def visit_while(self, node):
+        pass
+
+    def visit_continue(self, node):
+        pass
+
+    def visit_break(self, node):
+        pass
+
+    def visit_code_block(self, node):
+        pass
+
+    def visit_function_definition(self, node):
+        pass
+
+    def visit_function_call(self, node):
+        pass
+
+    def visit_return(self, node):
+        pass
+
+    # expressions are simplified once their own operands are
+    leave_expr = leave_declaration = leave_if = leave_while = leave_code_block = leave_function_call = \
+        leave_return = fold_children_
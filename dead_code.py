@@ -0,0 +1,72 @@
+ENTRY_LABEL = 'program'
+
+# instructions never followed by the next one
+no_fallthrough_ops = {'jump', 'ret', 'halt'}
+# instructions whose argument is a label the program may go on at
+branch_ops = {'jump', 'jz', 'jnz', 'call'}
+
+
+class DeadCodeEliminator:
+    """
+     Removes the instructions that can never run. From the instruction at the `program:` label,
+     control goes on to the next instruction, except after `jump`, `ret` and `halt`, and to the
+     label of a jump, a conditional jump or a call. What cannot be reached so is dropped: the
+     functions the program never calls (the call graph is followed from the entry point, through
+     the functions it reaches only), the code after a `ret` or a `jump` that no jump lands on, and
+     the bodies of conditions made constant by the other optimizations.
+
+     A label is kept when a jump lands on it or control goes through it. Code without the entry
+     label is left as it is, since nothing tells where it starts, and so is code that branches to
+     a label it does not define, since nothing tells what runs there.
+
+     `removed` counts the instructions dropped and `called` holds the labels of the functions
+     that can be called.
+    """
+
+    def __init__(self, entry=ENTRY_LABEL):
+        self.entry = entry
+        self.removed = 0
+        self.called = set()
+
+    def optimize(self, code):
+        """
+         The instructions of `code`, a list as `Emitter.instructions` returns it, that can run, with
+         their labels.
+        """
+        labels = {}
+        for idx, cmd in enumerate(code):
+            if cmd[-1] == ':':
+                labels[cmd[:-1]] = idx
+        if self.entry not in labels:
+            return code
+
+        # one more flag for the end of the code, which control may run into
+        reachable = bytearray(len(code) + 1)
+        called = set()
+        stack = [labels[self.entry]]
+        while stack:
+            idx = stack.pop()
+            # runs of instructions are followed here, branches are put on the stack
+            while not reachable[idx]:
+                reachable[idx] = 1
+                if idx == len(code):
+                    break
+                cmd = code[idx]
+                if cmd[-1] != ':':
+                    op, _, arg = cmd.partition(' ')
+                    if op in branch_ops:
+                        target = labels.get(arg)
+                        if target is None:
+                            return code
+                        if op == 'call':
+                            called.add(arg)
+                        stack.append(target)
+                    if op in no_fallthrough_ops:
+                        break
+                idx += 1
+
+        self.called |= called
+        # a label is reached when control goes through it, on its way to the instruction it stands on
+        out = [cmd for idx, cmd in enumerate(code) if reachable[idx]]
+        self.removed += sum(1 for idx, cmd in enumerate(code) if not reachable[idx] and cmd[-1] != ':')
+        return out
@@ -0,0 +1,43 @@
+class Emitter:
+    """
+     Append-only sink for the bytecode of a program. Every node of the AST writes its
+     instructions into the same emitter as it is visited, so each instruction is written once,
+     however deep the node is, instead of being copied into the list of every enclosing node.
+
+     Instructions are kept in order as strings such as 'push 1'; a label is kept as its name
+     followed by ':' and stands on the instruction after it.
+    """
+
+    def __init__(self):
+        self.code = []
+        # `emit(cmd)` appends an instruction; it is the bound `append` of the list itself, as it
+        # is called for every instruction
+        self.emit = self.code.append
+
+    def label(self, name):
+        self.code.append(name + ':')
+
+    def instructions(self):
+        return self.code
+
+    def replace(self, code):
+        """
+         Replaces the instructions emitted so far, by optimized ones for example.
+        """
+        # in place, as `emit` is bound to the list
+        self.code[:] = code
+
+    def __len__(self):
+        return len(self.code)
+
+    def text(self):
+        """
+         The program as text for `VirtualMachine.run_code`: one instruction per line, each ended
+         by ';' and each label by ':'.
+        """
+        if not self.code:
+            return ''
+        lines = [cmd + '\n' if cmd[-1] == ':' else cmd + ';\n' for cmd in self.code]
+        # no line break after the last line
+        lines[-1] = lines[-1][:-1]
+        return ''.join(lines)
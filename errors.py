@@ -33,3 +33,23 @@ class LoopError(CompileError):
 
     def __str__(self):
         return f'<{self.name}> statement at pos {self.pos} is outside a loop'
+
+
+class UnexpectedCharacterError(CompileError):
+
+    def __init__(self, char, location):
+        self.char = char
+        self.location = location
+
+    def __str__(self):
+        return f'Unexpected character <{self.char}> at {self.location}'
+
+
+class UnsupportedSyntaxError(CompileError):
+
+    def __init__(self, what, tok):
+        self.what = what
+        self.tok = tok
+
+    def __str__(self):
+        return f'{self.what} not implemented, at {self.tok.location}'
@@ -1,9 +1,12 @@
+import os
+from dataclasses import dataclass
 
-GRAMMAR_PATH = './grammar_description.txt'
-EPSILON = "e"
+from grammar import Grammar
+from table_cache import CACHE_DIR, cached, content_key, read_bytes
 
-desc = [line.strip() for line in open(GRAMMAR_PATH, 'r')]
-desc = [line for line in desc if len(line) > 0 and not line.startswith('#')]
+GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar_description.txt')
+EPSILON = "e"
+END_MARKER = '$'
 
 
 def is_epsilon(s):
@@ -27,6 +30,15 @@ def lts(s):
     return '[' + ','.join(s) + ']'
 
 
+def read_description(path=GRAMMAR_PATH):
+    """
+     Lines of a grammar description file, without blank lines and comments.
+    """
+    with open(path, 'r') as grammar_file:
+        desc = [line.strip() for line in grammar_file]
+    return [line for line in desc if len(line) > 0 and not line.startswith('#')]
+
+
 def parse_description(desc, verbose=False):
     grammar = {}
 
@@ -60,223 +72,283 @@ def parse_description(desc, verbose=False):
     return grammar
 
 
-S = desc[0].split('=')[0].strip()
-grammar = parse_description(desc)
-
-max_nterm_name_len = max(list(map(len, list(grammar.keys()))))
-
-
-# for k,v in list(grammar.items()):
-#     print(k)
-#     for rule in v:
-#         print(lts(rule),':',list(map(is_terminal,rule)))
-
-
-def First(symbols):
-    global grammar
-
-    if isinstance(symbols, str):
-        symbols = [symbols]
-
-    # print 'In first at', symbols
-    first = set()
-    if len(symbols) == 1:
-        # print 'Single symbol'
-        X = symbols[0]
-        if is_terminal(X):
-            return {X}
-        if is_epsilon(X):
-            # raise ValueError('WTF on X = '+X)
-            return {X}
-
-        for rule in grammar[X]:
-            # print 'Processing rule',rule
-            if len(rule) == 1 and is_epsilon(rule[0]):
-                first.add(EPSILON)
-            else:
-                first.update(First(rule))
+@dataclass
+class LL1Conflict:
+    """
+     Several alternatives of `nonterminal` predicted on `terminal`. `kind` is 'first/first' when
+     the terminal is in the FIRST set of two of them, 'first/follow' when it is in the FIRST set
+     of one and in the FOLLOW set of the nonterminal with another one nullable, and
+     'follow/follow' when two of them are nullable.
+    """
+    nonterminal: str
+    terminal: str
+    kind: str
+    alternatives: tuple
+
+    def __str__(self):
+        alternatives = ', '.join(map(str, self.alternatives))
+        return f'{self.kind} conflict in {self.nonterminal} on {self.terminal} between alternatives {alternatives}'
+
+
+class GrammarAnalysis:
+    """
+     FIRST, FOLLOW and nullable sets of a grammar.
+
+     `grammar` is a `grammar.Grammar`, or maps every nonterminal to the list of its alternatives
+     as `parse_description` returns them, with epsilon written out; it is then copied into a
+     `Grammar`, whose indexes the analysis relies on. Any symbol without productions is a
+     terminal. `start` defaults to the first nonterminal, and its FOLLOW set holds `END_MARKER`.
+
+     Each set is the least fixed point of its equations, found with a worklist so that a symbol
+     is only revisited when something it depends on has changed:
+
+      - a nonterminal is nullable once one of its alternatives has no symbol left that is not
+        known to be nullable; each alternative keeps that count, and a symbol turning nullable
+        decrements the counts of the alternatives it occurs in;
+      - FIRST(A) holds the terminals starting an alternative of A past a nullable prefix, and
+        FIRST(B) for each nonterminal B found there; changes spread along these inclusions;
+      - FOLLOW(B) holds FIRST of what follows B in each alternative, and FOLLOW(A) of the
+        nonterminal A of the alternative when that rest is nullable.
+
+     The work is linear in the size of the grammar plus the propagation of the sets.
+
+     `first` and `follow` map nonterminals to sets of terminals; `first` never holds epsilon,
+     which `nullable` stands for.
+    """
+
+    def __init__(self, grammar, start=None):
+        if not isinstance(grammar, Grammar):
+            indexed = Grammar()
+            for nt, alternatives in grammar.items():
+                for symbols in alternatives:
+                    indexed.add_prod(nt, [s for s in symbols if s != EPSILON])
+            grammar = indexed
+        self.grammar = grammar
+        self.start = start if start is not None else next(iter(grammar))
+
+        self.nonterminals = list(grammar.keys())
+        self.productions = grammar.productions
+        self.terminals = grammar.terminals()
+
+        self.nullable = self.nullable_()
+        self.first = self.first_()
+        self.follow = self.follow_()
+
+    def nullable_(self):
+        nullable = dict.fromkeys(self.nonterminals, False)
+        # number of symbols of each production not known to be nullable
+        remaining = []
+        work = []
+        for nt, _, symbols in self.productions:
+            remaining.append(len(symbols))
+            if not symbols and not nullable[nt]:
+                nullable[nt] = True
+                work.append(nt)
+
+        while work:
+            s = work.pop()
+            for prod in self.grammar.uses[s]:
+                remaining[prod] -= 1
+                nt = self.productions[prod][0]
+                if remaining[prod] == 0 and not nullable[nt]:
+                    nullable[nt] = True
+                    work.append(nt)
+        return nullable
+
+    def first_(self):
+        nullable = self.nullable
+        first = {nt: set() for nt in self.nonterminals}
+        # nonterminal -> nonterminals whose FIRST sets its FIRST set includes
+        includes = {nt: set() for nt in self.nonterminals}
+        for nt, _, symbols in self.productions:
+            for s in symbols:
+                if s not in first:
+                    first[nt].add(s)
+                    break
+                if s != nt:
+                    includes[nt].add(s)
+                if not nullable[s]:
+                    break
+
+        self.propagate_(first, includes)
         return first
-    else:
-        # print 'Multiple symbols'
-        y1 = symbols[0]
-        # print 'Leading symbol:',y1
-        leading_first = First([y1])
-        # print 'Leading first:',leading_first
-        if EPSILON not in leading_first:
-            first = leading_first
-            return first
-        else:
-            leading_first.remove(EPSILON)
-            rest_first = First(symbols[1:])
-
-            first = leading_first | rest_first
-
-            if all([EPSILON in First(s) for s in symbols[1:]]):
-                first.add(EPSILON)
-            return first
-
-
-follow = {}
-for k in list(grammar.keys()):
-    follow[k] = None
-
-# print('Start symbol:',S)
-follow[S] = {'$'}
-
-
-def Follow(grammar, follow, nonterminal, verbose=False):
-    rules = []
-    for k, prod_list in list(grammar.items()):
-
-        for prod in prod_list:
-            if nonterminal in prod:
-                rules.append((k, prod))
-
-    if verbose:
-        print('Computing for', nonterminal)
-        print('List of productions:')
-        for r in rules:
-            print('\t', r[0], '->', lts(r[1]))
-
-    if follow[nonterminal] is None:
-        follow[nonterminal] = set()
-
-    for k, prod in rules:
-
-        idx = prod.index(nonterminal)
-        if idx == len(prod) - 1:
-            if follow[k] is None:
-                Follow(grammar, follow, k, verbose)
-            follow[nonterminal].update(follow[k])
-        else:
-            first = First(prod[idx + 1:])
-            if EPSILON in first:
-                if verbose:
-                    print('Epsilon in suffix')
-                if follow[k] is None:
-                    Follow(grammar, follow, k)
-                follow[nonterminal].update(follow[k])
-            resid = first - {EPSILON}
-            if verbose:
-                print('To be added (rule: %s -> %s: %s) RESID:' % (k, lts(prod), sts(first)), sts(resid))
-            follow[nonterminal].update(resid)
-    if verbose:
-        print('Result:', sts(follow[nonterminal]))
-
-
-def has_epsilon_production(nonterminal):
-    global grammar
-
-    for prod in grammar[nonterminal]:
-        if len(prod) == 1 and is_epsilon(prod[0]):
-            return True
-    return False
 
-
-def can_produce_epsilon(nonterminal):
-    global grammar
-
-    if has_epsilon_production(nonterminal):
-        return True
-
-    for prod in grammar[nonterminal]:
-
-        if any(map(is_terminal, prod)):
-            continue
-
-        if all([can_produce_epsilon(s) for s in prod if s != nonterminal]):
-            return True
-        # for sym in prod:
-        #     if sym == nonterminal:
-        #         continue
-
-        #     if not can_produce_epsilon(sym):
-        #         break
-
-    return False
-
-
-def can_string_produce_epsilon(symbols):
-    global grammar
-
-    if len(symbols) == 1 and is_epsilon(symbols[0]):
-        return True
-
-    if any(map(is_terminal, symbols)):
-        return False
-
-    return all(map(can_produce_epsilon, symbols))
-
-
-dfs_marks = {}
-for nterm in grammar:
-    dfs_marks[nterm] = 0
-
-
-def DFS_FOLLOW(nonterminal, verbose=False):
-    global grammar, follow
-
-    dfs_marks[nonterminal] = 1
-
-    Follow(grammar, follow, nonterminal, verbose)
-
-    for prod in grammar[nonterminal]:
-        for sym in prod:
-            if not is_nonterminal(sym):
+    def follow_(self):
+        nullable, first = self.nullable, self.first
+        follow = {nt: set() for nt in self.nonterminals}
+        follow[self.start].add(END_MARKER)
+        includes = {nt: set() for nt in self.nonterminals}
+        for nt, _, symbols in self.productions:
+            # FIRST of the symbols after the current one, and whether they are all nullable
+            rest_first = set()
+            rest_nullable = True
+            for s in reversed(symbols):
+                if s not in first:
+                    rest_first = {s}
+                    rest_nullable = False
+                    continue
+                follow[s] |= rest_first
+                if rest_nullable and s != nt:
+                    includes[s].add(nt)
+                if nullable[s]:
+                    rest_first = rest_first | first[s]
+                else:
+                    rest_first = first[s]
+                    rest_nullable = False
+
+        self.propagate_(follow, includes)
+        return follow
+
+    @staticmethod
+    def propagate_(sets, includes):
+        """
+         Adds to each set the sets it includes, directly or not (the digraph algorithm of DeRemer
+         and Pennello). A depth-first traversal finds the strongly connected components of the
+         inclusion graph, which share one set, and finishes each component after all those it
+         includes, so every inclusion is applied once.
+        """
+        done = len(sets) + 1
+        depth = dict.fromkeys(sets, 0)
+        stack = []
+        for root in sets:
+            if depth[root]:
                 continue
-            # print sym
-            if dfs_marks[sym] != 0:
-                continue
-
-            DFS_FOLLOW(sym, verbose)
-
-
-DFS_FOLLOW(S)
-
-first = {}
-for nterm in grammar:
-    first[nterm] = First(nterm)
-
-sorted_nterms = sorted(grammar.keys())
-
-for nterm in sorted_nterms:
-    print('FOLLOW(%s) is:' % nterm.ljust(max_nterm_name_len), sts(follow[nterm]))
-
-for nterm in sorted_nterms:
-    print('FIRST(%s) is:' % nterm.ljust(max_nterm_name_len), sts(first[nterm]))
-
-for nterm in sorted_nterms:
-    print('Can \"%s\" produce epsilon:' % nterm.ljust(max_nterm_name_len), can_produce_epsilon(nterm))
-
-# LL(1) criterion check
-is_LL1 = True
-for nterm, prod_list in list(grammar.items()):
-
-    fs = list(map(First, prod_list))
-    nprods = len(prod_list)
-    for i in range(nprods):
-        alpha = prod_list[i]
-        for j in range(nprods):
-            if j == i:
+            stack.append(root)
+            depth[root] = len(stack)
+            # (node, its children still to visit, its depth on the stack)
+            path = [(root, iter(includes[root]), len(stack))]
+            while path:
+                node, children, node_depth = path[-1]
+                for child in children:
+                    if not depth[child]:
+                        stack.append(child)
+                        depth[child] = len(stack)
+                        path.append((child, iter(includes[child]), len(stack)))
+                        break
+                    depth[node] = min(depth[node], depth[child])
+                    sets[node] |= sets[child]
+                else:
+                    path.pop()
+                    if depth[node] == node_depth:
+                        # `node` is the first of its component to be visited
+                        items = sets[node]
+                        while True:
+                            member = stack.pop()
+                            depth[member] = done
+                            if member is node:
+                                break
+                            sets[member] = set(items)
+                    if path:
+                        parent = path[-1][0]
+                        depth[parent] = min(depth[parent], depth[node])
+                        sets[parent] |= sets[node]
+
+    def first_of(self, symbols):
+        """
+         FIRST of a list of symbols, with EPSILON in it when they can derive the empty string.
+        """
+        out = set()
+        for s in symbols:
+            if s == EPSILON:
                 continue
-            beta = prod_list[j]
-
-            intersection = fs[i] & fs[j]
-            if len(intersection) > 0:
-                is_LL1 = False
-                print('GRAMMAR IS NOT LL(1)!!!!1 FIRST sets intersection')
-                print(nterm)
-                print('\t', lts(alpha), lts(beta))
-                print('\t', sts(fs[i]), sts(fs[j]))
-
-            if can_string_produce_epsilon(alpha):
-                if len(fs[j] & follow[nterm]) > 0:
-                    is_LL1 = False
-                    print('GRAMMAR IS NOT LL(1)!!!!1 FIRST-FOLLOW intersection')
-                    print(nterm)
-                    print('\t', lts(alpha), lts(beta))
-                    print('\t', sts(fs[i]), sts(fs[j]))
-                    print('FOLLOW(%s):' % nterm, sts(follow[nterm]))
-
-if is_LL1:
-    print('SUCCESS!!! GRAMMAR IS LL(1)')
+            if s not in self.first:
+                out.add(s)
+                return out
+            out |= self.first[s]
+            if not self.nullable[s]:
+                return out
+        out.add(EPSILON)
+        return out
+
+    def conflicts(self):
+        """
+         The `LL1Conflict`s of the grammar, one per nonterminal and terminal predicting more than
+         one alternative.
+        """
+        out = []
+        for nt in self.nonterminals:
+            # terminal -> alternatives predicted on it from FIRST and from FOLLOW
+            by_first = {}
+            by_follow = []
+            for alt, symbols in enumerate(self.grammar[nt]):
+                prod_first = self.first_of(symbols)
+                for t in prod_first:
+                    if t != EPSILON:
+                        by_first.setdefault(t, []).append(alt)
+                if EPSILON in prod_first:
+                    by_follow.append(alt)
+
+            terminals = set(by_first)
+            if by_follow:
+                terminals |= self.follow[nt]
+            for t in sorted(terminals):
+                first_alts = by_first.get(t, [])
+                follow_alts = by_follow if t in self.follow[nt] else []
+                if len(first_alts) > 1:
+                    kind = 'first/first'
+                elif len(follow_alts) > 1:
+                    kind = 'follow/follow'
+                elif first_alts and follow_alts and follow_alts != first_alts:
+                    kind = 'first/follow'
+                else:
+                    continue
+                out.append(LL1Conflict(nt, t, kind, tuple(sorted(set(first_alts + follow_alts)))))
+        return out
+
+    def is_ll1(self):
+        return not self.conflicts()
+
+
+def load_description(path=GRAMMAR_PATH):
+    """
+     Reads a grammar description. Returns the grammar and its start symbol, the first
+     nonterminal.
+    """
+    desc = read_description(path)
+    return parse_description(desc), desc[0].split('=')[0].strip()
+
+
+def analyze_description(path=GRAMMAR_PATH, cache_dir=CACHE_DIR):
+    """
+     Analysis of a grammar description file, loaded from the table cache if the same text was
+     analyzed before.
+    """
+    def build():
+        grammar, start = load_description(path)
+        return GrammarAnalysis(grammar, start)
+
+    return cached('analysis', content_key(read_bytes(path)), build, cache_dir)
+
+
+_description_analysis = None
+
+
+def description_analysis():
+    """
+     Analysis of grammar_description.txt, computed or loaded on first use.
+    """
+    global _description_analysis
+    if _description_analysis is None:
+        _description_analysis = analyze_description()
+    return _description_analysis
+
+
+if __name__ == '__main__':
+    analysis = description_analysis()
+    sorted_nterms = sorted(analysis.nonterminals)
+    max_nterm_name_len = max(map(len, sorted_nterms))
+
+    for nterm in sorted_nterms:
+        print('FOLLOW(%s) is:' % nterm.ljust(max_nterm_name_len), sts(analysis.follow[nterm]))
+
+    for nterm in sorted_nterms:
+        print('FIRST(%s) is:' % nterm.ljust(max_nterm_name_len), sts(analysis.first[nterm]))
+
+    for nterm in sorted_nterms:
+        print('Can \"%s\" produce epsilon:' % nterm.ljust(max_nterm_name_len), analysis.nullable[nterm])
+
+    conflicts = analysis.conflicts()
+    for conflict in conflicts:
+        print(conflict)
+    if not conflicts:
+        print('SUCCESS!!! GRAMMAR IS LL(1)')
@@ -1,27 +1,56 @@
-def is_uppercase(s):
-    return s == s.upper()
+class Grammar(dict):
+    """
+     Productions by nonterminal: `grammar[A]` is the list of the alternatives of A, each a list of
+     symbols, with an empty list for an empty production. The nonterminals are the symbols that
+     have productions; any other symbol is a terminal.
 
+     Productions are added with `add_prod`, which keeps these indexes up to date, so that no
+     query has to scan the productions:
 
-class Grammar(dict):
+      - `productions[p]` is the production with id `p`, as (nonterminal, alternative, symbols),
+        with ids in the order the productions were added;
+      - `prod_ids[A]` are the ids of the productions of A;
+      - `uses[s]` are the ids of the productions that use symbol `s`, once per occurrence;
+      - the sets of all symbols, of terminals and of nonterminals.
+    """
 
     def __init__(self):
         dict.__init__(self)
 
-    def all_symbols(self):
-        out = set()
-        for prod_list in list(self.values()):
-            for prod in prod_list:
-                tmp = set(prod)
-                out.update(tmp)
+        self.productions = []
+        self.prod_ids = {}
+        # every symbol of the grammar is a key, nonterminals without uses included
+        self.uses = {}
+        self.terminal_set = set()
+        # frozen copy of `terminal_set` given out by `terminals`, until the next production
+        self.frozen_terminals_ = None
 
-        out.update(set(self.keys()))
-        return out
+    def all_symbols(self):
+        return self.uses.keys()
 
     def add_prod(self, nterminal, prod):
-        if nterminal in list(self.keys()):
-            self[nterminal].append(prod)
-        else:
-            self[nterminal] = [prod]
+        """
+         Adds production `nterminal` -> `prod`. Returns its id.
+        """
+        prod_id = len(self.productions)
+        self.frozen_terminals_ = None
+        alternatives = self.get(nterminal)
+        if alternatives is None:
+            alternatives = self[nterminal] = []
+            self.prod_ids[nterminal] = []
+            self.terminal_set.discard(nterminal)
+            self.uses.setdefault(nterminal, [])
+
+        self.productions.append((nterminal, len(alternatives), tuple(prod)))
+        alternatives.append(prod)
+        self.prod_ids[nterminal].append(prod_id)
+        for s in prod:
+            uses = self.uses.get(s)
+            if uses is None:
+                uses = self.uses[s] = []
+                self.terminal_set.add(s)
+            uses.append(prod_id)
+        return prod_id
 
     def add_prod_str(self, inp):
         parts = inp.split('->')
@@ -30,30 +59,18 @@ class Grammar(dict):
 
         nterminal = parts[0].strip()
         prod = parts[1].strip().split(' ')
-        self.add_prod(nterminal, prod)
+        return self.add_prod(nterminal, prod)
 
     def is_nonterminal(self, s):
-        return is_uppercase(s) and s.isalpha()
+        return s in self
 
     def non_terminals(self):
-        return list(filter(self.is_nonterminal, self.all_symbols()))
+        return self.keys()
 
     def terminals(self):
-        return [s for s in self.all_symbols() if not self.is_nonterminal(s)]
-
-    # def first(self,s):
-
-    #     out = set()
-    #     for sym in s:
-    #         if self.is_nonterminal(sym):
-    #             for prod in self[sym]:
-    #                 out |= self.first(prod)
-    #             break
-
-    #         out.add(sym)
-    #         break
-
-    #     return out
+        if self.frozen_terminals_ is None:
+            self.frozen_terminals_ = frozenset(self.terminal_set)
+        return self.frozen_terminals_
 
 
 if __name__ == '__main__':
@@ -64,3 +81,5 @@ if __name__ == '__main__':
     gr.add_prod_str('TERM -> id')
 
     print(gr)
+    print('Nonterminals:', list(gr.non_terminals()))
+    print('Terminals:', gr.terminals())
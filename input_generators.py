@@ -0,0 +1,173 @@
+"""
+ Generated inputs shared by the tests and the benchmarks: programs, grammars, and the count of
+ instructions a program runs.
+"""
+import random
+
+from virtual_machine import VirtualMachine, preprocess_code
+
+
+def generate_source(n_functions):
+    parts = ['{']
+    for i in range(n_functions):
+        parts.append(f'''
+    // helper number {i}
+    func int helper{i}(int arg) {{
+        var int acc = 0;
+        var int k = {i};
+        while (k > 0) {{
+            acc = acc + arg * (k - 1) / 2;
+            if (acc == 1000) {{ break; }}
+            k = k - 1;
+        }}
+        return acc;
+    }}''')
+    parts.append('\n    entry\n    helper0(1);\n}\n')
+    return ''.join(parts)
+
+
+def generate_flat_source(n_statements):
+    """
+     One block with `n_statements` statements.
+    """
+    return '{ var int x = 0;\n' + 'x = x + 1 * (x - 2);\n' * n_statements + '}'
+
+
+def generate_expression_source(n_statements):
+    """
+     Expression-heavy code: every statement is an assignment with a dozen operands over all
+     precedence levels, parentheses and calls.
+    """
+    lines = ['{ func int f(int a, int b) { return a - b; }', 'var int x = 1;', 'var int y = 2;']
+    for i in range(n_statements):
+        lines.append(f'x = (x + {i}) * y - f(y, x / 3) + x * x / (y - 1) < {i} == (y + x * 2 > 7) != x;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def generate_nested_source(depth):
+    """
+     `depth` while loops nested in each other, with a statement at every level.
+    """
+    lines = ['{ var int x = 0;']
+    for i in range(depth):
+        lines.append(f'while (x < {i}) {{ x = x + 1;')
+    lines.append('}' * depth + '}')
+    return '\n'.join(lines)
+
+
+def generate_nested_jumps_source(depth):
+    """
+     A loop in a function, with `depth` `if` statements nested in it and a `return` and a
+     `break` at every level: each of them is as deep as its level.
+    """
+    lines = ['{ func int f(int x) { while (x) {']
+    for i in range(depth):
+        lines.append(f'if (x > {i}) {{ if (x == {i}) {{ return x; }} if (x < {i}) {{ break; }}')
+    lines.append('}' * depth + '} return 0; } }')
+    return '\n'.join(lines)
+
+
+def generate_chain_source(n_operands):
+    """
+     One expression `x + 1 + 1 + ...`, a tree as deep as it has operands.
+    """
+    return '{ var int x = 0; x = x' + ' + 1' * n_operands + '; }'
+
+
+def generate_programs(n):
+    """
+     Name -> source of programs with loops running about `n` times.
+    """
+    return {
+        'sum': f'''{{ entry
+            var int total = 0;
+            var int i = {n};
+            while (i > 0) {{ total = total + i; i = i - 1; }}
+        }}''',
+        'fibonacci': f'''{{ entry
+            var int n = {n};
+            var int prev1 = 1;
+            var int prev2 = 1;
+            while (n > 2) {{
+                var int tmp = prev1;
+                var int unused;
+                prev1 = prev1 + prev2;
+                prev2 = tmp;
+                n = n - 1;
+            }}
+        }}''',
+        'calls': f'''{{
+            func int step(int x) {{
+                var int a;
+                var int b;
+                a = x * 1 + 0;
+                b = a - 1;
+                if (b > 0) {{ return b; }}
+                return 0;
+            }}
+            entry
+            var int k = {n};
+            while (k > 0) {{ k = step(k); }}
+        }}''',
+    }
+
+
+def generate_chain_grammar(depth):
+    """
+     Nested nullable chain `a0 -> a1 a1 | 'x0' | e`, ...: FIRST of `a0` depends on every level
+     through both occurrences, which a recursive FIRST without memoization revisits 3^depth times.
+    """
+    grammar = {f'a{i}': [[f'a{i + 1}', f'a{i + 1}'], [f"'x{i}'"], ['e']] for i in range(depth)}
+    grammar[f'a{depth}'] = [["'y'"], ['e']]
+    return grammar
+
+
+def generate_expression_grammar(n_levels, n_ops=4):
+    """
+     Precedence levels `e0 -> e1 e0_rest`, `e0_rest -> 'op' e1 e0_rest | ... | e`, like the
+     expression part of grammar_description.txt but `n_levels` deep.
+    """
+    grammar = {}
+    for i in range(n_levels):
+        grammar[f'e{i}'] = [[f'e{i + 1}', f'e{i}_rest']]
+        grammar[f'e{i}_rest'] = [[f"'op{i}_{k}'", f'e{i + 1}', f'e{i}_rest'] for k in range(n_ops)] + [['e']]
+    grammar[f'e{n_levels}'] = [["'id'"], ["'('", 'e0', "')'"]]
+    return grammar
+
+
+def generate_random_grammar(n_nonterminals, n_terminals=50, alternatives=4, length=5, seed=0):
+    """
+     Random grammar: each alternative is a sequence of random symbols, and one in five
+     nonterminals has an empty alternative.
+    """
+    rnd = random.Random(seed)
+    nonterminals = [f'n{i}' for i in range(n_nonterminals)]
+    terminals = [f"'t{i}'" for i in range(n_terminals)]
+    grammar = {}
+    for i, nt in enumerate(nonterminals):
+        grammar[nt] = [[rnd.choice(nonterminals) if rnd.random() < 0.6 else rnd.choice(terminals)
+                        for _ in range(rnd.randint(1, length))] for _ in range(alternatives)]
+        if i % 5 == 0:
+            grammar[nt].append(['e'])
+    return grammar
+
+
+class CountingVirtualMachine(VirtualMachine):
+    """
+     Virtual machine counting the instructions it executes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executed = 0
+
+    def execute(self, op, arg=None):
+        self.executed += 1
+        super().execute(op, arg)
+
+
+def count_instructions(code):
+    vm = CountingVirtualMachine()
+    vm.run_code(code)
+    return len(preprocess_code(code)[0]), vm.executed
@@ -0,0 +1,233 @@
+from parser import Parser
+
+from symbol_table import SymbolTable
+
+from token_source import TokenSource
+
+from my_ast import ASTDeclaration, ASTNumber
+
+from errors import UnexpectedTokenError, UnsupportedSyntaxError
+from semantic_actions import SemanticActions, binary_expr
+from lalr_table import LRTable, lalr_description_table
+
+
+class LRParser(Parser):
+    """
+     Shift-reduce parser driven by an `LRTable`.
+
+     The parser keeps a stack of states and a stack of values. A shift pushes the token; a
+     reduction by a production pops the values of its symbols and pushes the value of the
+     production. The loop does constant work per shift and per reduction and never recurses,
+     so neither long lists nor deeply nested expressions are limited by the recursion limit.
+
+     Actions are named like in `LL1Parser`: the value of a production of `nonterminal` is given
+     by the method `on_<nonterminal>(alt, values)`. Without such a method, a production with a
+     single symbol passes its value on and any other production gives the list of its values.
+     Empty productions give None without calling the action. An action runs when its production
+     is reduced, with the token after the production as the current token.
+
+     `passed_on` holds the (nonterminal, alt) of single-symbol productions that pass their value
+     on although the nonterminal has an action, such as `comparison = additive_expr`. Their
+     reduction only changes the state on top of the stack.
+    """
+
+    passed_on = set()
+
+    def __init__(self, table: LRTable):
+        self.table = table
+
+        self.curr_sym = None
+        self.idx = -1
+        self.source = TokenSource([])
+
+        nonterminals = table.nonterminals
+        # (nonterminal index, number of values, action, alternative) of each production
+        self.reductions = [(-1, 1, None, 0)]
+        for nonterminal, alt, symbols in table.productions[1:]:
+            reduce = getattr(self, 'on_' + nonterminal, None)
+            if len(symbols) == 1 and (nonterminal, alt) in self.passed_on:
+                reduce = None
+            elif reduce is None and len(symbols) != 1:
+                reduce = self.default_action_
+            self.reductions.append((nonterminals.index(nonterminal), len(symbols), reduce, alt))
+
+    @staticmethod
+    def default_action_(alt, values):
+        return values
+
+    def _reset(self):
+        self.curr_sym = None
+        self.idx = -1
+
+    def error_(self):
+        raise UnexpectedTokenError(self.sym(), self.idx)
+
+    def sym(self):
+        return self.curr_sym
+
+    def advance(self):
+        self.idx += 1
+        self.curr_sym = self.source.next()
+
+    def parse(self, tokens):
+        self.source = TokenSource(tokens)
+        self._reset()
+        self.advance()
+
+        actions = self.table.actions
+        gotos = self.table.gotos
+        reductions = self.reductions
+        next_token = self.source.next
+
+        states = [0]
+        values = []
+        push_state, push_value = states.append, values.append
+
+        tok = self.curr_sym
+        tok_type = tok.type._value_
+        state = 0
+        while True:
+            act = actions[state][tok_type]
+            if act > 0:
+                push_state(act)
+                push_value(tok)
+                state = act
+                self.idx += 1
+                tok = self.curr_sym = next_token()
+                tok_type = tok.type._value_
+            elif act < 0:
+                prod = ~act
+                if prod == 0:
+                    return values[0]
+                lhs, n_values, reduce, alt = reductions[prod]
+                if reduce is None:
+                    # a single symbol passing its value on: only its state changes
+                    state = states[-1] = gotos[states[-2]][lhs]
+                    continue
+                if n_values:
+                    args = values[-n_values:]
+                    del values[-n_values:]
+                    del states[-n_values:]
+                else:
+                    args = []
+                state = gotos[states[-1]][lhs]
+                push_state(state)
+                push_value(reduce(alt, args) if n_values else None)
+            else:
+                self.error_()
+
+
+class LALRParser(SemanticActions, LRParser):
+    """
+     LALR(1) parser generated from lr_grammar_description.txt. It builds the same AST as
+     `TableParser`, with symbols resolved in scoped symbol tables while parsing.
+
+     The grammar is left recursive: statement lists and argument lists grow by appending to the
+     list of the items before them, and binary operators are reduced as soon as both operands
+     are, so they come out left associative. Where a scope has to be opened or a name declared
+     before the rest of a construct is parsed, the grammar has a nonterminal ending there
+     (`block_start`, `declarator`, `function_name`, `function_header`), whose reduction does it.
+    """
+
+    passed_on = {
+        ('statement', 1), ('statement', 3), ('statement', 4), ('statement', 8),
+        ('assignment_expr', 1), ('comparison', 1), ('additive_expr', 2), ('multiplicative_expr', 2),
+        ('postfix_expression', 2),
+    }
+
+    # generated (or loaded from the cache) once and shared by all instances
+    description_table = None
+
+    def __init__(self):
+        if LALRParser.description_table is None:
+            LALRParser.description_table = lalr_description_table()
+        super().__init__(LALRParser.description_table)
+
+        self.reset_scope_()
+
+    def _reset(self):
+        super()._reset()
+
+        self.reset_scope_()
+
+    @staticmethod
+    def binary_expr_(values):
+        return binary_expr(values[1].type, values[0], values[2])
+
+    def on_code_block(self, alt, values):
+        return self.code_block_(values[1] or ())
+
+    def on_block_start(self, alt, values):
+        self.symtable = SymbolTable(self.symtable)
+
+    def on_statement_list(self, alt, values):
+        if values[0] is None:
+            return [values[1]]
+        values[0].append(values[1])
+        return values[0]
+
+    def on_variable_declaration(self, alt, values):
+        tp, var = values[0]
+        decl_node = ASTDeclaration(tp, var)
+        if values[1] is not None:
+            decl_node.add_child(values[1])
+        return decl_node
+
+    def on_declarator(self, alt, values):
+        return self.new_variable_(values[1], values[2])
+
+    def on_function_definition(self, alt, values):
+        f = values[0]
+        f.add_child(values[1])
+        self.symtable = self.symtable.parent
+        return f
+
+    def on_function_header(self, alt, values):
+        ret_type, func_name, name_id = values[0]
+        return self.new_function_(ret_type, func_name, name_id, values[2] or [])
+
+    def on_function_name(self, alt, values):
+        return self.identifier_type(values[1]), self.get_name(values[2]), values[2].name_id
+
+    def on_arg_list_def_items(self, alt, values):
+        if alt == 1:
+            return [values[0]]
+        values[0].append(values[2])
+        return values[0]
+
+    def on_assignment_expr(self, alt, values):
+        return self.binary_expr_(values)
+
+    def on_comparison(self, alt, values):
+        return self.binary_expr_(values)
+
+    def on_additive_expr(self, alt, values):
+        return self.binary_expr_(values)
+
+    def on_multiplicative_expr(self, alt, values):
+        return self.binary_expr_(values)
+
+    def on_postfix_expression(self, alt, values):
+        if alt == 0:
+            raise UnsupportedSyntaxError('Array subscript', values[1])
+        lhs = values[0]
+        if values[2] is not None:
+            for arg in values[2]:
+                lhs.add_child(arg)
+        return lhs
+
+    def on_primary_expression(self, alt, values):
+        s = values[0]
+        if alt == 0:
+            return ASTNumber(s.value)
+        if alt == 2:
+            return values[1]
+        if alt == 3:
+            raise UnsupportedSyntaxError('Pointer dereference', s)
+        return self.identifier_expr_(s)
+
+    def on_arg_list_items(self, alt, values):
+        if alt == 1:
+            return [values[0]]
+        values[0].append(values[2])
+        return values[0]
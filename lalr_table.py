@@ -0,0 +1,239 @@
+import os
+
+from my_lexer import TokenType
+from first_and_follow import EPSILON, GrammarAnalysis, parse_description, read_description
+from grammar import Grammar
+from ll1_table import terminal_types, terminal_types_key
+from table_cache import CACHE_DIR, cached, content_key, read_bytes
+
+LR_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lr_grammar_description.txt')
+# lookahead standing for "whatever follows the kernel item" while lookaheads are propagated
+PROPAGATE = -1
+
+
+class LRTable:
+    """
+     LALR(1) parse table.
+
+     `productions[p]` is a tuple (nonterminal, alternative, symbols) like in `ParseTable`;
+     production 0 is the augmented start production, whose reduction accepts the input.
+     `actions[s][t]` says what to do in state `s` on a token whose type has value `t`: a positive
+     number shifts and goes to that state, a negative number `~p` reduces by production `p`, and
+     0 is an error. `gotos[s][n]` is the state entered after reducing to nonterminal `n` in
+     state `s`; state 0 is the initial state and never the target of a transition.
+    """
+
+    def __init__(self, start, nonterminals, productions, actions, gotos, conflicts):
+        self.start = start
+        self.nonterminals = nonterminals
+        self.productions = productions
+        self.actions = actions
+        self.gotos = gotos
+        # shift/reduce conflicts resolved in favour of the shift, as (state, terminal, production)
+        self.conflicts = conflicts
+
+    def n_states(self):
+        return len(self.actions)
+
+
+def load_grammar(path=LR_GRAMMAR_PATH):
+    """
+     Reads a grammar description (see grammar_description.txt) into a `Grammar`. Epsilon is left
+     out, so an empty production is an empty list; the start symbol is the first nonterminal.
+    """
+    out = Grammar()
+    for nonterminal, alternatives in parse_description(read_description(path)).items():
+        for symbols in alternatives:
+            out.add_prod(nonterminal, [s for s in symbols if s != EPSILON])
+    return out
+
+
+def build_lalr_table(grammar: Grammar, start=None):
+    """
+     Builds the LALR(1) table of `grammar`. Every key of `grammar` is a nonterminal, any other
+     symbol is a terminal of the grammar description (see `ll1_table.terminal_types`); `start`
+     defaults to the first nonterminal. The end of input is the EOF token.
+
+     The LR(0) automaton is built first. Lookaheads of its kernel items are then found by
+     propagation, as in the dragon book: the LR(1) closure of each kernel item with a dummy
+     lookahead tells which lookaheads arise spontaneously in the successor states and which
+     are passed on from the kernel item, and the passed-on ones are propagated to a fixed point.
+
+     Shift/reduce conflicts are resolved like yacc does, by shifting, and recorded in
+     `LRTable.conflicts`; a reduce/reduce conflict raises ValueError.
+    """
+    types = terminal_types()
+    nonterminals = list(grammar.keys())
+    if start is None:
+        start = nonterminals[0]
+    n_terminals = len(TokenType)
+    n_nonterminals = len(nonterminals)
+    eof = TokenType.EOF.value
+    index_of = {nonterminal: i for i, nonterminal in enumerate(nonterminals)}
+
+    def item_of(s):
+        if s in index_of:
+            return n_terminals + index_of[s]
+        if s not in types:
+            raise ValueError(f'Unknown terminal {s} in grammar')
+        return types[s].value
+
+    # production 0 is S' -> start; its nonterminal is not numbered
+    productions = [(None, 0, (start,))]
+    rules = [(-1, (item_of(start),))]
+    prods_of = [[] for _ in nonterminals]
+    for nonterminal in nonterminals:
+        for alt, symbols in enumerate(grammar[nonterminal]):
+            symbols = tuple(s for s in symbols if s != EPSILON)
+            prods_of[index_of[nonterminal]].append(len(rules))
+            productions.append((nonterminal, alt, symbols))
+            rules.append((index_of[nonterminal], tuple(item_of(s) for s in symbols)))
+
+    analysis = GrammarAnalysis(grammar, start)
+    nullable = [analysis.nullable[nonterminal] for nonterminal in nonterminals]
+    first = [{item_of(s) for s in analysis.first[nonterminal]} for nonterminal in nonterminals]
+
+    def first_of(symbols, lookahead):
+        out = set()
+        for s in symbols:
+            if s < n_terminals:
+                out.add(s)
+                return out
+            out |= first[s - n_terminals]
+            if not nullable[s - n_terminals]:
+                return out
+        out.add(lookahead)
+        return out
+
+    # LR(0) automaton; items are (production, dot) pairs
+    def closure0(kernel):
+        out = list(kernel)
+        seen = set()
+        for prod, dot in out:
+            rhs = rules[prod][1]
+            if dot < len(rhs) and rhs[dot] >= n_terminals and rhs[dot] not in seen:
+                seen.add(rhs[dot])
+                out.extend((p, 0) for p in prods_of[rhs[dot] - n_terminals])
+        return out
+
+    kernels = [((0, 0),)]
+    state_of = {kernels[0]: 0}
+    transitions = []
+    for kernel in kernels:
+        successors = {}
+        for prod, dot in closure0(kernel):
+            rhs = rules[prod][1]
+            if dot < len(rhs):
+                successors.setdefault(rhs[dot], []).append((prod, dot + 1))
+        moves = {}
+        for symbol, items in successors.items():
+            target = tuple(sorted(set(items)))
+            if target not in state_of:
+                state_of[target] = len(kernels)
+                kernels.append(target)
+            moves[symbol] = state_of[target]
+        transitions.append(moves)
+
+    # LR(1) closure of a single item with the dummy lookahead; it does not depend on the state
+    closures = {}
+
+    def closure1(item):
+        if item in closures:
+            return closures[item]
+        out = {(item[0], item[1], PROPAGATE)}
+        work = list(out)
+        while work:
+            prod, dot, lookahead = work.pop()
+            rhs = rules[prod][1]
+            if dot == len(rhs) or rhs[dot] < n_terminals:
+                continue
+            for b in first_of(rhs[dot + 1:], lookahead):
+                for p in prods_of[rhs[dot] - n_terminals]:
+                    new = (p, 0, b)
+                    if new not in out:
+                        out.add(new)
+                        work.append(new)
+        closures[item] = out
+        return out
+
+    lookaheads = {(s, item): set() for s, kernel in enumerate(kernels) for item in kernel}
+    lookaheads[0, (0, 0)].add(eof)
+    propagation = {}
+    for s, kernel in enumerate(kernels):
+        for item in kernel:
+            targets = propagation[s, item] = []
+            for prod, dot, b in closure1(item):
+                rhs = rules[prod][1]
+                if dot == len(rhs):
+                    continue
+                target = (transitions[s][rhs[dot]], (prod, dot + 1))
+                if b == PROPAGATE:
+                    targets.append(target)
+                else:
+                    lookaheads[target].add(b)
+
+    work = [key for key, las in lookaheads.items() if las]
+    while work:
+        key = work.pop()
+        for target in propagation[key]:
+            target_las = lookaheads[target]
+            size = len(target_las)
+            target_las |= lookaheads[key]
+            if len(target_las) != size:
+                work.append(target)
+
+    actions = []
+    gotos = []
+    conflicts = []
+    for s, kernel in enumerate(kernels):
+        row = [0] * n_terminals
+        goto_row = [0] * n_nonterminals
+        for symbol, target in transitions[s].items():
+            if symbol < n_terminals:
+                row[symbol] = target
+            else:
+                goto_row[symbol - n_terminals] = target
+
+        for item in kernel:
+            for prod, dot, b in closure1(item):
+                if dot != len(rules[prod][1]):
+                    continue
+                for t in (lookaheads[s, item] if b == PROPAGATE else (b,)):
+                    other = row[t]
+                    if other == 0 or other == ~prod:
+                        row[t] = ~prod
+                    elif other > 0:
+                        conflicts.append((s, TokenType(t).name, prod))
+                    else:
+                        raise ValueError(f'Grammar is not LALR(1): reduce/reduce conflict on {TokenType(t).name} '
+                                         f'between {productions[~other][0]} and {productions[prod][0]}')
+        actions.append(row)
+        gotos.append(goto_row)
+
+    return LRTable(start, nonterminals, productions, actions, gotos, conflicts)
+
+
+def grammar_key(grammar: Grammar, start):
+    """
+     Hash of the content of `grammar`, naming its file in the table cache.
+    """
+    return content_key(repr((start, list(grammar.items()))), terminal_types_key())
+
+
+def cached_lalr_table(grammar: Grammar, start=None, cache_dir=CACHE_DIR):
+    """
+     Like `build_lalr_table`, but keeps the table in the table cache under `cache_dir`, keyed on
+     the content of the grammar.
+    """
+    if start is None:
+        start = next(iter(grammar))
+    return cached('lalr', grammar_key(grammar, start), lambda: build_lalr_table(grammar, start), cache_dir)
+
+
+def lalr_description_table(path=LR_GRAMMAR_PATH, cache_dir=CACHE_DIR):
+    """
+     LALR(1) table of a grammar description file, lr_grammar_description.txt by default. It is
+     keyed on the text of the file, so a table in the cache is loaded without parsing the grammar.
+    """
+    key = content_key(read_bytes(path), terminal_types_key())
+    return cached('lalr', key, lambda: build_lalr_table(load_grammar(path)), cache_dir)
@@ -0,0 +1,140 @@
+from my_lexer import Lexer, TokenType
+from first_and_follow import EPSILON, GRAMMAR_PATH, analyze_description, is_terminal
+from table_cache import CACHE_DIR, cached, content_key, read_bytes
+
+# terminals of grammar_description.txt that are not spelled like their lexeme
+named_terminals = {
+    "'id'": TokenType.ID,
+    "'number'": TokenType.NUM,
+    "'comma'": TokenType.COMMA,
+    "'$'": TokenType.EOF,
+    '$': TokenType.EOF,
+}
+
+
+def terminal_types():
+    """
+     Maps terminals of the grammar description (quoted lexemes such as `'while'` or `'=='`) to
+     the token types produced by the lexer.
+    """
+    out = dict(named_terminals)
+    for keyword, token_type in Lexer.keywords.items():
+        out[f"'{keyword}'"] = token_type
+    for table in (Lexer.punctuation, Lexer.operators, Lexer.operators_two_symbols):
+        for pat, token_type in table.items():
+            out["'%s'" % pat.replace('\\', '')] = token_type
+    return out
+
+
+def terminal_types_key():
+    """
+     The mapping of `terminal_types` as text, for the keys of cached tables.
+    """
+    return repr(sorted((s, tp.value) for s, tp in terminal_types().items()))
+
+
+class ParseTable:
+    """
+     Predictive parse table of an LL(1) grammar.
+
+     Nonterminals are numbered in the order they appear in the grammar, and productions in the
+     order of their nonterminals and alternatives. `productions[p]` is a tuple
+     (nonterminal, alternative, symbols) with epsilon left out of `symbols`; `rows[n][t]` is the
+     production to expand nonterminal `n` with on a token whose type has value `t`, or -1.
+    """
+
+    def __init__(self, start, nonterminals, productions, rows, conflicts):
+        self.start = start
+        self.nonterminals = nonterminals
+        self.productions = productions
+        self.rows = rows
+        # FIRST/FOLLOW conflicts resolved in favour of the non-empty alternative
+        self.conflicts = conflicts
+
+    def predict(self, nonterminal, token_type: TokenType):
+        prod = self.rows[self.nonterminals.index(nonterminal)][token_type.value]
+        return self.productions[prod] if prod >= 0 else None
+
+
+def build_parse_table(grammar, first, follow, start):
+    """
+     Builds the predictive parse table of `grammar` (nonterminal -> list of alternatives, as
+     parsed by `first_and_follow.parse_description`). `first` computes FIRST of a list of
+     symbols, with epsilon in it when they can derive the empty string, and `follow` maps
+     nonterminals to their FOLLOW sets; see `first_and_follow.GrammarAnalysis`.
+
+     Production A -> alpha goes to cell [A, a] for each terminal a in FIRST(alpha), and, when
+     alpha can derive epsilon, to [A, b] for each b in FOLLOW(A). Two alternatives sharing a
+     FIRST terminal make the grammar unusable and raise ValueError. A clash between an
+     alternative's FIRST and the FOLLOW of an empty alternative is the dangling-suffix case
+     (`*p(x)` can be `*(p(x))` or `(*p)(x)`) and is resolved like a shift, by taking the
+     non-empty alternative; such clashes are recorded in `ParseTable.conflicts`.
+    """
+    types = terminal_types()
+    for nonterminal, alternatives in grammar.items():
+        for symbols in alternatives:
+            for s in symbols:
+                if s != EPSILON and is_terminal(s) and s not in types:
+                    raise ValueError(f'Unknown terminal {s} in production of {nonterminal}')
+
+    nonterminals = list(grammar.keys())
+    n_columns = len(TokenType)
+
+    productions = []
+    rows = []
+    conflicts = []
+    for nonterminal in nonterminals:
+        row = [-1] * n_columns
+        from_follow = set()
+        for alt, symbols in enumerate(grammar[nonterminal]):
+            prod = len(productions)
+            productions.append((nonterminal, alt, tuple(s for s in symbols if s != EPSILON)))
+
+            prod_first = first(symbols)
+            lookaheads = [(s, False) for s in prod_first if s != EPSILON]
+            if EPSILON in prod_first:
+                lookaheads += [(s, True) for s in follow[nonterminal]]
+
+            for terminal, is_follow in lookaheads:
+                column = types[terminal].value
+                other = row[column]
+                if other < 0 or other == prod:
+                    row[column] = prod
+                    if is_follow:
+                        from_follow.add(column)
+                elif column in from_follow and not is_follow:
+                    conflicts.append((nonterminal, terminal, prod, other))
+                    row[column] = prod
+                    from_follow.discard(column)
+                elif is_follow and column not in from_follow:
+                    conflicts.append((nonterminal, terminal, other, prod))
+                else:
+                    raise ValueError(f'Grammar is not LL(1): {nonterminal} has two alternatives for {terminal}')
+        rows.append(row)
+
+    return ParseTable(start, nonterminals, productions, rows, conflicts)
+
+
+def build_description_table(path=GRAMMAR_PATH, cache_dir=CACHE_DIR):
+    """
+     Parse table of a grammar description file, loaded from the table cache if it was built from
+     the same text before. Only then is the file parsed and analyzed.
+    """
+    def build():
+        analysis = analyze_description(path, cache_dir)
+        return build_parse_table(analysis.grammar, analysis.first_of, analysis.follow, analysis.start)
+
+    return cached('ll1', content_key(read_bytes(path), terminal_types_key()), build, cache_dir)
+
+
+_description_table = None
+
+
+def description_table():
+    """
+     Parse table of grammar_description.txt, built or loaded on first use and shared after.
+    """
+    global _description_table
+    if _description_table is None:
+        _description_table = build_description_table()
+    return _description_table
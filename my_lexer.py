@@ -1,6 +1,12 @@
 from preprocessing import remove_comments
+from errors import UnexpectedCharacterError
+from name_pool import names
 from enum import Enum
+import mmap
+import os
 import re
+from array import array
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
 
 
@@ -10,7 +16,15 @@ class TokenType(Enum):
         LEFT_CURL, RIGHT_CURL, LEFT_BRACKET, RIGHT_BRACKET, LEFT_PARENTHESIS, RIGHT_PARENTHESIS, \
         PLUS, MINUS, MUL, DIV, ASSIGN, \
         LESS, EQUAL, NOT_EQUAL, GE, LE, \
-        SEMICOLON, COMMA, EOF, WHITESPACE = range(31)
+        SEMICOLON, COMMA, EOF, WHITESPACE, COMMENT = range(32)
+
+    # members are singletons, equal only to themselves, so they hash by identity, in C, instead of
+    # through the Python-level `Enum.__hash__`: tables keyed by token types are looked up for
+    # every expression that is emitted
+    __hash__ = object.__hash__
+
+    # the code of a member is its plain `_value_` attribute, which the parsing loops read per
+    # token rather than the `value` property, a descriptor call
 
 
 @dataclass
@@ -29,6 +43,9 @@ class Token:
         self.type = tp
         self.value = value
 
+        # interned id of identifiers and keywords, see `name_pool`
+        self.name_id = None
+
         self.location = None
 
     def set_location(self, line_no, line_pos):
@@ -39,6 +56,281 @@ class Token:
         return f'Token(\"{self.lexeme}\",{self.type},{v}, at {self.location})'
 
 
+newline_bytes_re = re.compile(rb'\n')
+
+# sources that are scanned whole, as opposed to files read line by line
+source_types = (str, bytes, bytearray, memoryview, mmap.mmap)
+
+
+def decode(text):
+    if isinstance(text, str):
+        return text
+    return str(text, 'ascii')
+
+
+def char_at(code, pos):
+    """
+     The character at offset `pos` of `code`, for an error message. A byte of a buffer that is
+     not ASCII cannot be decoded, and is written escaped, as `\\xe9`.
+    """
+    if isinstance(code, str):
+        return code[pos]
+    return str(code[pos:pos + 1], 'ascii', 'backslashreplace')
+
+
+def map_source_file(file_path):
+    """
+     Memory-maps a source file read-only. The result can be given to the lexer in place of a
+     string, so a large file is never read and decoded as a whole. An empty file gives empty
+     bytes, since it cannot be mapped; the caller closes a map.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def find_line_starts(text):
+    """
+     Returns an array of the offsets at which lines of `text` begin.
+     `text` is a string or a bytes-like buffer (bytes, memoryview, mmap).
+    """
+    if not isinstance(text, str):
+        return array('q', [0] + [m.end() for m in newline_bytes_re.finditer(text)])
+
+    line_starts = array('q', [0])
+    pos = text.find('\n')
+    while pos >= 0:
+        line_starts.append(pos + 1)
+        pos = text.find('\n', pos + 1)
+    return line_starts
+
+
+def split_lines(text):
+    """
+     The lines of `text`, a string or bytes, each with its line break, as `find_line_starts`
+     delimits them: a text that ends with a line break ends with an empty line.
+    """
+    newline = '\n' if isinstance(text, str) else b'\n'
+    lines = text.split(newline)
+    last = lines.pop()
+    lines = [line + newline for line in lines]
+    lines.append(last)
+    return lines
+
+
+class LineBuffer:
+    """
+     Lines of an edited text, with a gap at the last edit: lines before the gap are kept in
+     `before`, the others in `after`, last line first. Replacing lines next to the gap changes
+     only them, and moving the gap to the next edit costs only the distance between the two.
+    """
+    __slots__ = ('before', 'after')
+
+    def __init__(self, lines):
+        self.before = lines
+        self.after = []
+
+    def __len__(self):
+        return len(self.before) + len(self.after)
+
+    def line(self, idx):
+        if idx < len(self.before):
+            return self.before[idx]
+        return self.after[len(self) - 1 - idx]
+
+    def move_gap_(self, idx):
+        before, after = self.before, self.after
+        if idx < len(before):
+            after.extend(reversed(before[idx:]))
+            del before[idx:]
+        elif idx > len(before):
+            n = idx - len(before)
+            before.extend(reversed(after[-n:]))
+            del after[-n:]
+
+    def splice(self, lo, hi, lines):
+        """
+         Replaces lines [lo, hi) with `lines`.
+        """
+        self.move_gap_(hi)
+        self.before[lo:] = lines
+
+    def text(self, empty):
+        return empty.join(self.before) + empty.join(reversed(self.after))
+
+
+class OffsetColumn:
+    """
+     Ascending offsets stored in an array('q'). After an edit, entries from `gap` on are kept
+     unshifted and `delta` is added when they are read, so shifting everything after an edit
+     is O(1). Moving the gap to the next edit costs only the distance between the two edits.
+    """
+    __slots__ = ('data', 'gap', 'delta')
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else array('q')
+        self.gap = len(self.data)
+        self.delta = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, idx):
+        if idx >= self.gap:
+            return self.data[idx] + self.delta
+        return self.data[idx]
+
+    def append(self, offset):
+        self.data.append(offset - self.delta)
+
+    def move_gap_(self, idx):
+        data, delta = self.data, self.delta
+        if delta == 0:
+            self.gap = idx
+            return
+        for i in range(self.gap, idx):
+            data[i] += delta
+        for i in range(idx, self.gap):
+            data[i] -= delta
+        self.gap = idx
+
+    def splice(self, lo, hi, offsets, shift):
+        """
+         Replaces entries [lo, hi) with `offsets` and shifts every entry after them by `shift`.
+        """
+        self.move_gap_(hi)
+        self.data[lo:hi] = array('q', offsets)
+        self.gap = lo + len(offsets)
+        self.delta += shift
+
+
+class TokenStream:
+    """
+     Compact token storage. Token types, start offsets and lengths are kept in `array` columns
+     over the scanned source; lexemes, values and locations are computed on demand.
+     Indexing and iteration give `TokenView` objects that the parsers use like `Token`.
+
+     Once the stream is edited, its source is kept in a `LineBuffer`, and the text is joined
+     again only when it is read, on the first lexeme asked for after a run of edits.
+    """
+    token_types = list(TokenType)
+
+    def __init__(self, source, types=None, starts=None, lengths=None):
+        self._source = source
+        self._lines = None
+        self.is_text = isinstance(source, str)
+
+        self.types = types if types is not None else array('B')
+        self.starts = OffsetColumn(starts)
+        self.lengths = lengths if lengths is not None else array('I')
+
+        self._line_starts = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, idx):
+        n = len(self.types)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError('TokenStream index out of range')
+        return TokenView(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self.types)):
+            yield TokenView(self, idx)
+
+    def append(self, token_type: TokenType, start, length):
+        self.types.append(token_type.value)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def type(self, idx):
+        return self.token_types[self.types[idx]]
+
+    def lexeme(self, idx):
+        start = self.starts[idx]
+        return decode(self.source[start:start + self.lengths[idx]])
+
+    def value(self, idx):
+        if self.types[idx] == TokenType.NUM.value:
+            return int(self.lexeme(idx))
+        return None
+
+    def name_id(self, idx):
+        if self.type(idx) not in Lexer.name_types:
+            return None
+        return names.intern(self.lexeme(idx))
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = self._lines.text('' if self.is_text else b'')
+        return self._source
+
+    def lines(self):
+        if self._lines is None:
+            self._lines = LineBuffer(split_lines(self.source if self.is_text else bytes(self.source)))
+        return self._lines
+
+    def line_starts(self):
+        if self._line_starts is None:
+            self._line_starts = OffsetColumn(find_line_starts(self.source))
+        return self._line_starts
+
+    def location_at(self, offset):
+        line_starts = self.line_starts()
+        line_no = bisect_right(line_starts, offset) - 1
+        return TokenLocation(line_no, offset - line_starts[line_no])
+
+    def location(self, idx):
+        return self.location_at(self.starts[idx])
+
+    def update_line_starts_(self, offset, removed, inserted):
+        line_starts = self.line_starts()
+        lo = bisect_right(line_starts, offset)
+        hi = bisect_right(line_starts, offset + removed)
+        new_line_starts = [offset + start for start in find_line_starts(inserted)[1:]]
+        line_starts.splice(lo, hi, new_line_starts, len(inserted) - removed)
+
+
+class TokenView:
+    """
+     `Token`-compatible view of a single token in a TokenStream.
+    """
+    __slots__ = ('stream', 'idx')
+
+    def __init__(self, stream, idx):
+        self.stream = stream
+        self.idx = idx
+
+    @property
+    def lexeme(self):
+        return self.stream.lexeme(self.idx)
+
+    @property
+    def type(self):
+        return self.stream.type(self.idx)
+
+    @property
+    def value(self):
+        return self.stream.value(self.idx)
+
+    @property
+    def name_id(self):
+        return self.stream.name_id(self.idx)
+
+    @property
+    def location(self):
+        return self.stream.location(self.idx)
+
+    def __str__(self):
+        v = str(self.value) if self.value is not None else 'None'
+        return f'Token(\"{self.lexeme}\",{self.type},{v}, at {self.location})'
+
+
 class LexerState(Enum):
     START_TOKEN = 0
     CONTINUE_TOKEN = 1
@@ -83,19 +375,31 @@ class Lexer:
         '!=': TokenType.NOT_EQUAL
     }
 
+    # token types that carry an interned name
+    name_types = frozenset([TokenType.ID, *keywords.values()])
+
     def __init__(self, comment_mark='//'):
 
         self.comment_mark = comment_mark
-        self.lex_begin = 0
-        self.curr_pos = 0
-        self.code = ''
-
-        self.state = LexerState.START_TOKEN
-
-        self.curr_line_no = 0
-        self.curr_pos_in_line = 0
 
         self.generic_tests = []
+        # NOTE: keywords must be added before identifier test
+        for keyword, token_type in self.keywords.items():
+            self.add_regex_test(token_type, keyword + r'\b')
+        self.add_regex_test(TokenType.COMMENT, re.escape(comment_mark) + r'[^\n]*')
+        self.add_token_tests()
+
+        self.scanner, self.group_types = self.build_scanner()
+        self.bytes_scanner = re.compile(self.scanner.pattern.encode('ascii'))
+
+        # lexemes of tokens other than identifiers and numbers are known from their type
+        self.fixed_lexemes = {token_type: keyword for keyword, token_type in self.keywords.items()}
+        for table in (self.punctuation, self.operators_two_symbols, self.operators):
+            for pat, token_type in table.items():
+                self.fixed_lexemes[token_type] = pat.replace('\\', '')
+        self.keyword_ids = {token_type: names.intern(keyword) for keyword, token_type in self.keywords.items()}
+
+    def add_token_tests(self):
         self.add_regex_test(TokenType.ID, r'[a-zA-Z_]\w*')
         self.add_regex_test(TokenType.NUM, r'\d+')
         self.add_regex_test(TokenType.WHITESPACE, r'\s+', False)
@@ -107,6 +411,245 @@ class Lexer:
         for pat, token_type in self.operators.items():
             self.add_regex_test(token_type, pat)
 
+    def add_regex_test(self, token_type: TokenType, pattern: str, use_eol=True):
+        self.generic_tests.append((token_type, re.compile(pattern, re.ASCII), use_eol))
+
+    def build_scanner(self):
+        """
+         Combines all tests into one alternation of named groups. Alternatives are tried
+         left to right, so the first test that matches wins, as when the tests were tried
+         one by one. `use_eol` needs no special handling: only whitespace can span lines.
+         Returns the compiled pattern and a list mapping group index to token type.
+
+         Every token is matched from the first test on. `OldLexer` goes on after a match with
+         the tests after it instead, so right after `+`, `-`, `*`, `/`, `==` or `!=` it tries `=`
+         and never `==`: it reads `a*==b` as `*`, `=`, `=`, where this scanner gives `*`, `==`.
+        """
+        groups = [f'(?P<{token_type.name}>{pattern.pattern})' for token_type, pattern, _ in self.generic_tests]
+        group_types = [None] + [token_type for token_type, _, _ in self.generic_tests]
+        return re.compile('|'.join(groups), re.ASCII), group_types
+
+    def scanner_for(self, code):
+        if isinstance(code, str):
+            return self.scanner
+        return self.bytes_scanner
+
+    def analyze(self, code):
+        return list(self.iter_tokens(code))
+
+    def iter_tokens(self, source_or_file):
+        """
+         Generates tokens one at a time. Accepts source code as a string, a bytes-like buffer
+         (bytes, memoryview, mmap) or a text file object; a file is consumed line by line,
+         so only the current line is kept in memory.
+        """
+        if isinstance(source_or_file, source_types):
+            yield from self.scan(source_or_file)
+            return
+
+        for line_no, line in enumerate(source_or_file):
+            yield from self.scan(line, line_no)
+
+    def tokenize(self, code):
+        """
+         Scans `code` into a TokenStream. Comments are skipped by the scanner instead of being
+         removed beforehand, so token offsets refer to `code` itself. `code` may be a string or
+         a bytes-like buffer; lexemes of a buffer are decoded only when they are asked for.
+        """
+        types, starts, lengths = array('B'), array('q'), array('I')
+        append_type = types.append
+        append_start = starts.append
+        append_length = lengths.append
+
+        match = self.scanner_for(code).match
+        skipped = (TokenType.WHITESPACE, TokenType.COMMENT)
+        type_codes = [None] + [tp.value if tp not in skipped else None for tp in self.group_types[1:]]
+
+        curr_pos = 0
+        code_len = len(code)
+        while curr_pos < code_len:
+            m = match(code, curr_pos)
+            if m is None:
+                raise UnexpectedCharacterError(char_at(code, curr_pos), TokenStream(code).location_at(curr_pos))
+
+            lex_end = m.end()
+            type_code = type_codes[m.lastindex]
+            if type_code is not None:
+                append_type(type_code)
+                append_start(curr_pos)
+                append_length(lex_end - curr_pos)
+            curr_pos = lex_end
+
+        return TokenStream(code, types, starts, lengths)
+
+    def relex(self, stream: TokenStream, offset, removed, inserted):
+        """
+         Updates `stream` in place after replacing `removed` characters at `offset` with `inserted`.
+         A stream of a bytes-like source is edited in bytes, with `inserted` encoded as UTF-8.
+         Only the lines the edit touches are rebuilt, in the `LineBuffer` of the stream.
+         Scanning restarts at the beginning of the edited line, since no token crosses a line
+         break, goes on a line at a time past the edit, and stops as soon as a new token starts
+         where an old, shifted, token started after the edit: from there on the old tokens are
+         still valid.
+        """
+        newline = '\n' if stream.is_text else b'\n'
+        if not stream.is_text and isinstance(inserted, str):
+            inserted = inserted.encode('utf-8')
+        old_starts = stream.starts
+        edit_end = offset + removed
+        delta = len(inserted) - removed
+
+        line_starts = stream.line_starts()
+        lines = stream.lines()
+        first_line = bisect_right(line_starts, offset) - 1
+        last_line = bisect_right(line_starts, edit_end) - 1
+        line_start = line_starts[first_line]
+        first_idx = bisect_left(old_starts, line_start)
+        resync_idx = bisect_left(old_starts, edit_end)
+        num_tokens = len(stream)
+        inserted_end = offset + len(inserted)
+
+        code = newline[:0].join([lines.line(i) for i in range(first_line, last_line + 1)])
+        code = code[:offset - line_start] + inserted + code[edit_end - line_start:]
+        new_lines = split_lines(code)
+        if last_line + 1 < len(lines):
+            # the empty line after the last line break is the start of the next line
+            new_lines.pop()
+
+        match = self.scanner_for(code).match
+        skipped = (TokenType.WHITESPACE, TokenType.COMMENT)
+        type_codes = [None] + [tp.value if tp not in skipped else None for tp in self.group_types[1:]]
+
+        types, starts, lengths = array('B'), [], array('I')
+        # `code` is the text scanned, at `base` in the edited source and from line `line_no` on:
+        # the edited lines, then each line after them
+        base, line_no, next_line = line_start, first_line, last_line + 1
+        curr_pos = 0
+        while True:
+            if curr_pos == len(code):
+                if next_line == len(lines):
+                    resync_idx = num_tokens
+                    break
+                base += len(code)
+                line_no += code.count(newline)
+                code = lines.line(next_line)
+                next_line += 1
+                curr_pos = 0
+
+            m = match(code, curr_pos)
+            if m is None:
+                location = TokenLocation(line_no + code.count(newline, 0, curr_pos),
+                                         curr_pos - code.rfind(newline, 0, curr_pos) - 1)
+                raise UnexpectedCharacterError(char_at(code, curr_pos), location)
+
+            lex_end = m.end()
+            type_code = type_codes[m.lastindex]
+            if type_code is not None:
+                pos = base + curr_pos
+                if pos >= inserted_end:
+                    old_pos = pos - delta
+                    while resync_idx < num_tokens and old_starts[resync_idx] < old_pos:
+                        resync_idx += 1
+                    if resync_idx < num_tokens and old_starts[resync_idx] == old_pos:
+                        break
+                types.append(type_code)
+                starts.append(pos)
+                lengths.append(lex_end - curr_pos)
+            curr_pos = lex_end
+
+        stream.types[first_idx:resync_idx] = types
+        stream.lengths[first_idx:resync_idx] = lengths
+        old_starts.splice(first_idx, resync_idx, starts, delta)
+        stream.update_line_starts_(offset, removed, inserted)
+        lines.splice(first_line, last_line + 1, new_lines)
+        stream._source = None
+        return stream
+
+    def scan(self, code, first_line_no=0, start=0):
+        """
+         Generates tokens of `code`, skipping whitespace and comments. Locations come from the
+         line index of `code`: tokens arrive in order, so the current line is found by walking
+         the index forward. `first_line_no` is the number of the first line of `code`; scanning
+         begins at offset `start`.
+        """
+        code_len = len(code)
+        line_starts = find_line_starts(code)
+        line_starts.append(code_len + 1)
+        line_no = bisect_right(line_starts, start) - 1
+
+        match = self.scanner_for(code).match
+        group_types = self.group_types
+        whitespace, comment, num, ident = TokenType.WHITESPACE, TokenType.COMMENT, TokenType.NUM, TokenType.ID
+        is_text = isinstance(code, str)
+        fixed_lexemes = self.fixed_lexemes
+        keyword_ids = self.keyword_ids
+        name_ids, intern, pooled_names = names.ids, names.intern, names.names
+
+        curr_pos = start
+
+        while curr_pos < code_len:
+            m = match(code, curr_pos)
+            if m is None:
+                line_no = bisect_right(line_starts, curr_pos) - 1
+                location = TokenLocation(first_line_no + line_no, curr_pos - line_starts[line_no])
+                raise UnexpectedCharacterError(char_at(code, curr_pos), location)
+
+            lex_end = m.end()
+            token_type = group_types[m.lastindex]
+
+            if token_type is whitespace or token_type is comment:
+                curr_pos = lex_end
+                continue
+
+            name_id = None
+            if token_type is ident or token_type is num:
+                lexeme = code[curr_pos:lex_end]
+                if not is_text:
+                    lexeme = str(lexeme, 'ascii')
+                if token_type is ident:
+                    name_id = name_ids.get(lexeme)
+                    if name_id is None:
+                        name_id = intern(lexeme)
+                    lexeme = pooled_names[name_id]
+            else:
+                lexeme = fixed_lexemes[token_type]
+                name_id = keyword_ids.get(token_type)
+
+            while line_starts[line_no + 1] <= curr_pos:
+                line_no += 1
+            token = Token(lexeme, token_type)
+            token.name_id = name_id
+            token.location = TokenLocation(first_line_no + line_no, curr_pos - line_starts[line_no])
+
+            if token_type is num:
+                token.value = int(lexeme)
+
+            yield token
+            curr_pos = lex_end
+
+
+class OldLexer(Lexer):
+    """
+     Previous scanning engine: tries every test of `generic_tests` in turn at the current position
+     and advances character by character. Kept as a reference for `Lexer` and for benchmarks.
+    """
+
+    def __init__(self, comment_mark='//'):
+
+        self.comment_mark = comment_mark
+
+        self.generic_tests = []
+        self.add_token_tests()
+
+        self.lex_begin = 0
+        self.curr_pos = 0
+        self.code = ''
+
+        self.state = LexerState.START_TOKEN
+
+        self.curr_line_no = 0
+        self.curr_pos_in_line = 0
+
     def move_adv(self, st):
         self.state = st
         self.adv()
@@ -133,9 +676,6 @@ class Lexer:
             return True
         return False
 
-    def add_regex_test(self, token_type: TokenType, pattern: str, use_eol=True):
-        self.generic_tests.append((token_type, re.compile(pattern, re.ASCII), use_eol))
-
     def get_lexeme(self):
         return self.code[self.lex_begin:self.curr_pos]
 
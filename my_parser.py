@@ -1,10 +1,11 @@
-from parser import Parser
+from pratt import PrattParser
 
 from symbol_table import Symbol, SymbolTable, SymbolType, SymbolFunction, SymbolId
 
 from my_lexer import TokenType
+from token_source import TokenSource
 
-from my_ast import ASTDeclaration, ASTExpr, ASTId, ASTNumber, ASTCodeBlock, ASTFunctionDefinition, ASTIfStatement, \
+from my_ast import ASTDeclaration, ASTId, ASTNumber, ASTCodeBlock, ASTFunctionDefinition, ASTIfStatement, \
     ASTWhileStatement, ASTBreakStatement, ASTContinueStatement, ASTReturnStatement, ASTFunctionCall, ASTEntryPoint
 
 from errors import UnexpectedTokenError, CompileError
@@ -39,16 +40,15 @@ primary_expression -> number | ( expr )
 '''
 
 
-class OldParser(Parser):
+class OldParser(PrattParser):
+
+    def __init__(self, tokens=None, debug=False):
+        self.debug = debug
 
-    def __init__(self, tokens=None):
         self.curr_sym = None
         self.idx = -1
 
-        self.tokens = tokens
-        if tokens is None:
-            self.tokens = []
-        self.num_tokens = len(self.tokens)
+        self.source = TokenSource(tokens if tokens is not None else [])
 
         self.curr_label_id = 0
 
@@ -64,8 +64,6 @@ class OldParser(Parser):
         self.curr_sym = None
         self.idx = -1
 
-        self.num_tokens = len(self.tokens)
-
         self.curr_label_id = 0
 
         self.root = None
@@ -75,7 +73,7 @@ class OldParser(Parser):
         self.init_types()
 
     def parse(self, tokens):
-        self.tokens = tokens
+        self.source = TokenSource(tokens)
         self._reset()
         self.advance()
         return self.program()
@@ -90,26 +88,22 @@ class OldParser(Parser):
         # raise SyntaxError('Unexpected token %s at position %d' % (self.sym(),self.idx))
 
     def eof(self):
-        return self.idx == self.num_tokens
+        return self.curr_sym.type == TokenType.EOF
 
     def sym(self):
         return self.curr_sym
 
     def expect(self, tp: TokenType, match=False):
-        s = self.sym()
-        if tp != s.type:
+        if tp is not self.curr_sym.type:
             return False
 
         if match:
-            self.match(tp)
+            self.advance()
         return True
 
     def expect_many(self, tps):
-
-        for s in tps:
-            if self.expect(s):
-                return True
-        return False
+        # `in` compares by identity first, which is all token types need
+        return self.curr_sym.type in tps
 
     def match(self, tp: TokenType):
         s = self.sym()
@@ -120,10 +114,11 @@ class OldParser(Parser):
 
     def advance(self):
         self.idx += 1
+        self.curr_sym = self.source.next()
         if self.eof():
-            print('finish parsing')
+            if self.debug:
+                print('finish parsing')
             return False
-        self.curr_sym = self.tokens[self.idx]
         return True
 
     def program(self):
@@ -140,8 +135,9 @@ class OldParser(Parser):
         self.match(TokenType.LEFT_CURL)
 
         self.symtable = SymbolTable(self.symtable)
-        print('Code block table:')
-        print(self.symtable.show())
+        if self.debug:
+            print('Code block table:')
+            print(self.symtable.show())
         stmt_nodes = self.statement_list()
 
         curr_node = ASTCodeBlock(self.symtable)
@@ -163,13 +159,15 @@ class OldParser(Parser):
                            TokenType.ID, TokenType.WHILE, TokenType.CONTINUE, TokenType.BREAK,
                            TokenType.NUM, TokenType.ENTRY]
 
-        print('Current symbol:', self.sym())
+        # statement statement_list is parsed as a loop, so the number of statements is not
+        # bounded by the recursion limit
         nodes = []
-        if self.expect_many(possible_tokens):
-            curr_node = self.statement()
-
-            nodes.append(curr_node)
-            nodes += self.statement_list()
+        while True:
+            if self.debug:
+                print('Current symbol:', self.sym())
+            if not self.expect_many(possible_tokens):
+                break
+            nodes.append(self.statement())
 
         # Do nothing for epsilon production
         return nodes
@@ -195,21 +193,25 @@ class OldParser(Parser):
             return expr
 
         if self.expect(TokenType.IF):
-            print('IF statement')
+            if self.debug:
+                print('IF statement')
             return self.if_statement()
 
         if self.expect(TokenType.WHILE):
-            print('WHILE statement')
+            if self.debug:
+                print('WHILE statement')
             return self.while_statement()
 
         if self.expect(TokenType.CONTINUE):
-            print('Continue')
+            if self.debug:
+                print('Continue')
             cont = self.continue_statement()
             self.match(TokenType.SEMICOLON)
             return cont
 
         if self.expect(TokenType.BREAK):
-            print('Break')
+            if self.debug:
+                print('Break')
             br = self.break_statement()
             self.match(TokenType.SEMICOLON)
             return br
@@ -248,14 +250,18 @@ class OldParser(Parser):
         for tp, name in arg_list:
             var = SymbolId(name, tp, None)
             f.symtable.add(var)
+            f.arg_symbols.append(var)
 
-        func_body = self.code_block()
-        f.add_child(func_body)
+        self.function_body(f)
 
         self.symtable = self.symtable.parent
 
         return f
 
+    def function_body(self, f):
+        func_body = self.code_block()
+        f.add_child(func_body)
+
     def func_arg_list_def(self):
         arg_list = []
         if self.expect(TokenType.ID):
@@ -268,10 +274,8 @@ class OldParser(Parser):
 
     def func_arg_list_def_rest(self):
         out = []
-        if self.expect(TokenType.COMMA, True):
-            # TODO: function calls?
-            self.func_arg()
-            out += self.func_arg_list_def_rest()
+        while self.expect(TokenType.COMMA, True):
+            out.append(self.func_arg())
 
         # Do nothing for epsilon production
         return out
@@ -330,101 +334,6 @@ class OldParser(Parser):
 
         return decl_node
 
-    def expression(self):
-
-        return self.assignment_expr()
-
-    def assignment_expr(self):
-
-        cmp_node = self.comparison()
-        return self.assignment_expr_rhs(cmp_node)
-
-    def assignment_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.ASSIGN, True):
-            rhs = self.comparison()
-            node = ASTExpr(TokenType.ASSIGN)
-            node.add_child(lhs)
-            node.add_child(rhs)
-            return self.assignment_expr_rhs(node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def comparison(self):
-
-        lhs = self.additive_expr()
-        return self.comparison_rhs(lhs)
-
-    def comparison_rhs(self, lhs):
-
-        if self.expect_many([TokenType.LE, TokenType.GE, TokenType.EQUAL, TokenType.NOT_EQUAL]):
-            op = self.sym().type
-            self.advance()
-            rhs = self.additive_expr()
-            node = ASTExpr(op)
-            node.add_child(lhs)
-            node.add_child(rhs)
-            return self.comparison_rhs(node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def additive_expr(self):
-
-        lhs = self.multiplicative_expr()
-        return self.additive_expr_rhs(lhs)
-
-    def additive_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.PLUS, True):
-            rhs = self.multiplicative_expr()
-            curr_node = ASTExpr(TokenType.PLUS)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.additive_expr_rhs(curr_node)
-
-        if self.expect(TokenType.MINUS, True):
-            rhs = self.multiplicative_expr()
-            curr_node = ASTExpr(TokenType.MINUS)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.additive_expr_rhs(curr_node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def multiplicative_expr(self):
-
-        lhs = self.postfix_expression()
-        return self.multiplicative_expr_rhs(lhs)
-
-    def multiplicative_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.MUL, True):
-            rhs = self.postfix_expression()
-            curr_node = ASTExpr(TokenType.MUL)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.multiplicative_expr_rhs(curr_node)
-
-        if self.expect(TokenType.DIV, True):
-            rhs = self.postfix_expression()
-            curr_node = ASTExpr(TokenType.DIV)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.multiplicative_expr_rhs(curr_node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def postfix_expression(self):
-
-        print('In postfix_expression: curr token=', self.sym())
-
-        lhs = self.primary_expression()
-        return self.postfix_expression_rest(lhs)
-
     def func_call_arg_list(self):
 
         nodes = []
@@ -438,10 +347,9 @@ class OldParser(Parser):
     def func_call_arg_list_rest(self):
 
         nodes = []
-        if self.expect(TokenType.COMMA, True):
+        while self.expect(TokenType.COMMA, True):
             expr = self.expression()
             nodes.append(expr)
-            nodes += self.func_call_arg_list_rest()
         return nodes
 
     def postfix_expression_rest(self, lhs):
@@ -467,25 +375,28 @@ class OldParser(Parser):
     def primary_expression(self):
 
         s = self.sym()
-        print('In primary_expression: current token:%s' % str(s))
+        if self.debug:
+            print('In primary_expression: current token:%s' % str(s))
 
         if self.expect(TokenType.NUM, True):
-            print('Number')
+            if self.debug:
+                print('Number')
             return ASTNumber(s.value)
 
         if self.expect(TokenType.ID, True):
-            print('Identifier', s.lexeme)
-            var_entry = self.symtable.find(s.lexeme)
-            print(s, var_entry)
-            is_id_or_func = var_entry.symbol_type in [Symbol.Id, Symbol.Function]
-            if var_entry is None or not is_id_or_func:
+            if self.debug:
+                print('Identifier', s.lexeme)
+            var_entry = self.symtable.find(s.name_id)
+            if self.debug:
+                print(s, var_entry)
+            if var_entry is None or var_entry.symbol_type not in [Symbol.Id, Symbol.Function]:
                 raise ValueError('Undeclared identifier:', s.lexeme)
             if self.expect(TokenType.LEFT_PARENTHESIS):
                 if var_entry.symbol_type != Symbol.Function:
                     raise CompileError(f'Expected function call, but got different kind of symbol: {var_entry}')
-                return ASTFunctionCall(var_entry, s.lexeme)
+                return ASTFunctionCall(var_entry, s.lexeme, s.name_id)
 
-            return ASTId(var_entry, s.lexeme)
+            return ASTId(var_entry, s.lexeme, s.name_id)
 
         self.match(TokenType.LEFT_PARENTHESIS)
         curr_node = self.expression()
@@ -495,7 +406,7 @@ class OldParser(Parser):
 
     def get_name(self):
         n = self.sym().lexeme
-        _s = self.symtable.find(n)
+        _s = self.symtable.find(self.sym().name_id)
         if _s:
             raise CompileError(f'Symbol with name {n} already exists: {_s}')
         self.advance()
@@ -505,7 +416,7 @@ class OldParser(Parser):
 
         tp_name = self.sym().lexeme
 
-        tp_entry = self.symtable.find(tp_name)
+        tp_entry = self.symtable.find(self.sym().name_id)
         if tp_entry is None or tp_entry.symbol_type != Symbol.Type:
             raise ValueError('%s does not name a type' % tp_name)
 
@@ -515,10 +426,11 @@ class OldParser(Parser):
 
     def identifier_var(self, tp):
         var_name = self.sym().lexeme
-        print('Variable name: "%s"' % var_name)
-        print(tp)
+        if self.debug:
+            print('Variable name: "%s"' % var_name)
+            print(tp)
 
-        var_entry = self.symtable.add(SymbolId(var_name, tp, None))
+        var_entry = self.symtable.add(SymbolId(var_name, tp, None, self.sym().name_id))
         self.advance()
 
         return var_entry
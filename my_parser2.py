@@ -1,8 +1,9 @@
-from parser import Parser
+from pratt import PrattParser
 
 from my_lexer import TokenType, Token
+from token_source import TokenSource
 
-from my_ast import ASTDeclaration, ASTExpr, ASTId, ASTNumber, ASTCodeBlock, ASTFunctionDefinition, ASTIfStatement, \
+from my_ast import ASTDeclaration, ASTId, ASTNumber, ASTCodeBlock, ASTFunctionDefinition, ASTIfStatement, \
     ASTWhileStatement, ASTBreakStatement, ASTContinueStatement, ASTReturnStatement, ASTFunctionCall, ASTEntryPoint
 
 from errors import UnexpectedTokenError
@@ -38,13 +39,15 @@ primary_expression -> number | ( expr )
 '''
 
 
-class NewParser(Parser):
+class NewParser(PrattParser):
+
+    def __init__(self, debug=False):
+        self.debug = debug
 
-    def __init__(self, ):
         self.curr_sym = None
         self.idx = -1
 
-        self.tokens = []
+        self.source = TokenSource([])
 
         self.root = None
 
@@ -55,7 +58,7 @@ class NewParser(Parser):
         self.root = None
 
     def parse(self, tokens):
-        self.tokens = tokens
+        self.source = TokenSource(tokens)
         self._reset()
         self.advance()
         return self.program()
@@ -64,26 +67,22 @@ class NewParser(Parser):
         raise UnexpectedTokenError(self.sym(), self.idx)
 
     def eof(self):
-        return self.idx == len(self.tokens)
+        return self.curr_sym.type == TokenType.EOF
 
     def sym(self) -> Token:
         return self.curr_sym
 
     def expect(self, tp: TokenType, match=False):
-        s = self.sym()
-        if tp != s.type:
+        if tp is not self.curr_sym.type:
             return False
 
         if match:
-            self.match(tp)
+            self.advance()
         return True
 
     def expect_many(self, tps):
-
-        for s in tps:
-            if self.expect(s):
-                return True
-        return False
+        # `in` compares by identity first, which is all token types need
+        return self.curr_sym.type in tps
 
     def match(self, tp: TokenType):
         s = self.sym()
@@ -94,11 +93,13 @@ class NewParser(Parser):
 
     def advance(self):
         self.idx += 1
+        self.curr_sym = self.source.next()
         if self.eof():
-            print('finish parsing')
+            if self.debug:
+                print('finish parsing')
             return False
-        self.curr_sym = self.tokens[self.idx]
-        print(f'Advanced to symbol {self.curr_sym}')
+        if self.debug:
+            print(f'Advanced to symbol {self.curr_sym}')
         return True
 
     def program(self):
@@ -132,13 +133,15 @@ class NewParser(Parser):
                            TokenType.ID, TokenType.WHILE, TokenType.CONTINUE, TokenType.BREAK,
                            TokenType.NUM, TokenType.ENTRY]
 
-        print('Current token:', self.sym())
+        # statement statement_list is parsed as a loop, so the number of statements is not
+        # bounded by the recursion limit
         nodes = []
-        if self.expect_many(possible_tokens):
-            curr_node = self.statement()
-
-            nodes.append(curr_node)
-            nodes += self.statement_list()
+        while True:
+            if self.debug:
+                print('Current token:', self.sym())
+            if not self.expect_many(possible_tokens):
+                break
+            nodes.append(self.statement())
 
         # Do nothing for epsilon production
         return nodes
@@ -164,21 +167,25 @@ class NewParser(Parser):
             return expr
 
         if self.expect(TokenType.IF):
-            print('IF statement')
+            if self.debug:
+                print('IF statement')
             return self.if_statement()
 
         if self.expect(TokenType.WHILE):
-            print('WHILE statement')
+            if self.debug:
+                print('WHILE statement')
             return self.while_statement()
 
         if self.expect(TokenType.CONTINUE):
-            print('Continue')
+            if self.debug:
+                print('Continue')
             cont = self.continue_statement()
             self.match(TokenType.SEMICOLON)
             return cont
 
         if self.expect(TokenType.BREAK):
-            print('Break')
+            if self.debug:
+                print('Break')
             br = self.break_statement()
             self.match(TokenType.SEMICOLON)
             return br
@@ -226,9 +233,8 @@ class NewParser(Parser):
 
     def func_arg_list_def_rest(self):
         out = []
-        if self.expect(TokenType.COMMA, True):
+        while self.expect(TokenType.COMMA, True):
             out.append(self.func_arg())
-            out += self.func_arg_list_def_rest()
 
         # Do nothing for epsilon production
         return out
@@ -284,101 +290,6 @@ class NewParser(Parser):
 
         return decl_node
 
-    def expression(self):
-
-        return self.assignment_expr()
-
-    def assignment_expr(self):
-
-        cmp_node = self.comparison()
-        return self.assignment_expr_rhs(cmp_node)
-
-    def assignment_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.ASSIGN, True):
-            rhs = self.comparison()
-            node = ASTExpr(TokenType.ASSIGN)
-            node.add_child(lhs)
-            node.add_child(rhs)
-            return self.assignment_expr_rhs(node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def comparison(self):
-
-        lhs = self.additive_expr()
-        return self.comparison_rhs(lhs)
-
-    def comparison_rhs(self, lhs):
-
-        if self.expect_many([TokenType.LE, TokenType.GE, TokenType.EQUAL, TokenType.NOT_EQUAL]):
-            op = self.sym().type
-            self.advance()
-            rhs = self.additive_expr()
-            node = ASTExpr(op)
-            node.add_child(lhs)
-            node.add_child(rhs)
-            return self.comparison_rhs(node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def additive_expr(self):
-
-        lhs = self.multiplicative_expr()
-        return self.additive_expr_rhs(lhs)
-
-    def additive_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.PLUS, True):
-            rhs = self.multiplicative_expr()
-            curr_node = ASTExpr(TokenType.PLUS)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.additive_expr_rhs(curr_node)
-
-        if self.expect(TokenType.MINUS, True):
-            rhs = self.multiplicative_expr()
-            curr_node = ASTExpr(TokenType.MINUS)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.additive_expr_rhs(curr_node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def multiplicative_expr(self):
-
-        lhs = self.postfix_expression()
-        return self.multiplicative_expr_rhs(lhs)
-
-    def multiplicative_expr_rhs(self, lhs):
-
-        if self.expect(TokenType.MUL, True):
-            rhs = self.postfix_expression()
-            curr_node = ASTExpr(TokenType.MUL)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.multiplicative_expr_rhs(curr_node)
-
-        if self.expect(TokenType.DIV, True):
-            rhs = self.postfix_expression()
-            curr_node = ASTExpr(TokenType.DIV)
-            curr_node.add_child(lhs)
-            curr_node.add_child(rhs)
-            return self.multiplicative_expr_rhs(curr_node)
-
-        # Do nothing for epsilon production
-        return lhs
-
-    def postfix_expression(self):
-
-        print('In postfix_expression: curr token: ', self.sym())
-
-        lhs = self.primary_expression()
-        return self.postfix_expression_rest(lhs)
-
     def func_call_arg_list(self):
 
         nodes = []
@@ -392,10 +303,9 @@ class NewParser(Parser):
     def func_call_arg_list_rest(self):
 
         nodes = []
-        if self.expect(TokenType.COMMA, True):
+        while self.expect(TokenType.COMMA, True):
             expr = self.expression()
             nodes.append(expr)
-            nodes += self.func_call_arg_list_rest()
         return nodes
 
     def postfix_expression_rest(self, lhs):
@@ -421,19 +331,22 @@ class NewParser(Parser):
     def primary_expression(self):
 
         s = self.sym()
-        print('In primary_expression: current token:%s' % str(s))
+        if self.debug:
+            print('In primary_expression: current token:%s' % str(s))
 
         if self.expect(TokenType.NUM, True):
-            print('Number')
+            if self.debug:
+                print('Number')
             return ASTNumber(s.value)
 
         if self.expect(TokenType.ID, True):
-            print('Identifier')
+            if self.debug:
+                print('Identifier')
 
             if self.expect(TokenType.LEFT_PARENTHESIS):
-                return ASTFunctionCall(None, s.lexeme)
+                return ASTFunctionCall(None, s.lexeme, s.name_id)
 
-            return ASTId(None, s.lexeme)
+            return ASTId(None, s.lexeme, s.name_id)
 
         self.match(TokenType.LEFT_PARENTHESIS)
         curr_node = self.expression()
@@ -442,7 +355,7 @@ class NewParser(Parser):
         return curr_node
 
     def identifier(self):
-        node = ASTId(None, self.sym().lexeme)
+        node = ASTId(None, self.sym().lexeme, self.sym().name_id)
         self.advance()
         return node
 
@@ -459,5 +372,4 @@ if __name__ == '__main__':
     tokens = lex.analyze(code)
     parser = NewParser()
     ast = parser.parse(tokens)
-    visitor = PrintVisitor()
-    ast.accept(visitor)
+    PrintVisitor().walk(ast)
@@ -0,0 +1,36 @@
+class NamePool:
+    """
+     Interning pool for identifier and keyword names. Every distinct name gets a dense integer
+     id and is stored once; the lexer tags name tokens with these ids and symbol tables are
+     keyed on them, so a name is hashed once when it is scanned and never again.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.ids[name] = name_id
+            self.names.append(name)
+        return name_id
+
+    def name(self, name_id):
+        return self.names[name_id]
+
+    def replace(self, pooled_names):
+        """
+         Makes this pool a copy of another one given by its `names`, so that names get the same
+         ids in both, as in a worker process that handles tokens of the main process.
+        """
+        self.names = list(pooled_names)
+        self.ids = {name: name_id for name_id, name in enumerate(self.names)}
+
+
+# The pool shared by the lexer and the symbol tables
+names = NamePool()
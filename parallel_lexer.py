@@ -0,0 +1,155 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from errors import UnexpectedCharacterError
+from my_lexer import Lexer, TokenStream, newline_bytes_re, source_types
+from name_pool import names
+
+# lexer of a worker process, created once by `init_worker_`
+worker_lexer = None
+
+
+def init_worker_(comment_mark):
+    global worker_lexer
+    worker_lexer = Lexer(comment_mark)
+
+
+def tokenize_chunk_(chunk, offset):
+    """
+     Tokenizes one chunk in a worker and returns its columns, with starts shifted to offsets in
+     the whole source.
+    """
+    stream = worker_lexer.tokenize(chunk)
+    return stream.types, array('q', [start + offset for start in stream.starts.data]), stream.lengths
+
+
+def scan_chunk_(chunk, first_line_no):
+    return list(worker_lexer.scan(chunk, first_line_no))
+
+
+class ParallelLexer(Lexer):
+    """
+     Lexer that splits large sources into line-aligned chunks and lexes them in a process pool.
+
+     Only whitespace can span lines, so a chunk that starts at the beginning of a line is lexed
+     exactly as it would be inside the whole source; a token cut in two by a chunk boundary would
+     have to contain a newline. The results of the chunks are merged in order, with offsets and
+     line numbers shifted to those of the whole source.
+
+     Sources shorter than `min_parallel_size` characters, or a single worker, use the serial
+     lexer: for them starting the pool and sending the chunks costs more than lexing.
+    """
+
+    def __init__(self, comment_mark='//', workers=None, min_parallel_size=1 << 20, chunks_per_worker=4):
+        super().__init__(comment_mark)
+
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_size = min_parallel_size
+        self.chunks_per_worker = chunks_per_worker
+
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def get_pool_(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker_, initargs=(self.comment_mark,))
+        return self.pool
+
+    def use_serial_(self, code):
+        return self.workers < 2 or len(code) < self.min_parallel_size
+
+    def split_lines(self, code, n_chunks):
+        """
+         Returns (start, end, first_line_no) of up to `n_chunks` chunks of `code` of about the same
+         size. Every chunk but the first starts right after a newline.
+        """
+        code_len = len(code)
+        is_text = isinstance(code, str)
+
+        chunks = []
+        start = 0
+        line_no = 0
+        for i in range(1, n_chunks + 1):
+            if start >= code_len:
+                break
+            end = code_len
+            if i < n_chunks:
+                target = max(start, code_len * i // n_chunks)
+                if is_text:
+                    newline = code.find('\n', target)
+                else:
+                    m = newline_bytes_re.search(code, target)
+                    newline = m.start() if m else -1
+                if newline >= 0:
+                    end = newline + 1
+            chunks.append((start, end, line_no))
+            if is_text:
+                line_no += code.count('\n', start, end)
+            else:
+                line_no += len(newline_bytes_re.findall(code, start, end))
+            start = end
+        return chunks
+
+    def chunks_(self, code):
+        chunks = self.split_lines(code, self.workers * self.chunks_per_worker)
+        if isinstance(code, str):
+            return [code[start:end] for start, end, _ in chunks], chunks
+        # slices of a memoryview cannot be pickled; bytes slices are not copied again
+        return [bytes(code[start:end]) for start, end, _ in chunks], chunks
+
+    def tokenize(self, code):
+        if self.use_serial_(code):
+            return super().tokenize(code)
+
+        texts, chunks = self.chunks_(code)
+        offsets = [start for start, _, _ in chunks]
+
+        types, starts, lengths = array('B'), array('q'), array('I')
+        results = self.get_pool_().map(tokenize_chunk_, texts, offsets)
+        chunk_idx = 0
+        try:
+            for chunk_types, chunk_starts, chunk_lengths in results:
+                types.extend(chunk_types)
+                starts.extend(chunk_starts)
+                lengths.extend(chunk_lengths)
+                chunk_idx += 1
+        except UnexpectedCharacterError as e:
+            e.location.line_no += chunks[chunk_idx][2]
+            raise
+
+        return TokenStream(code, types, starts, lengths)
+
+    def iter_tokens(self, source_or_file):
+        """
+         Like `Lexer.iter_tokens`, but a large source is scanned in the pool. Chunks are yielded
+         in order as soon as they are ready, so a parser can start on the first chunk while the
+         rest are being lexed. Files are always read line by line in this process.
+        """
+        if isinstance(source_or_file, source_types) and not self.use_serial_(source_or_file):
+            yield from self.scan_parallel_(source_or_file)
+            return
+        yield from super().iter_tokens(source_or_file)
+
+    def scan_parallel_(self, code):
+        texts, chunks = self.chunks_(code)
+        first_lines = [line_no for _, _, line_no in chunks]
+
+        intern, pooled_names = names.intern, names.names
+        for tokens in self.get_pool_().map(scan_chunk_, texts, first_lines):
+            for token in tokens:
+                # ids are interned in the pool of the worker and are rebound to the pool of this process
+                if token.name_id is not None:
+                    token.name_id = intern(token.lexeme)
+                    token.lexeme = pooled_names[token.name_id]
+            yield from tokens
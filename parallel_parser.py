@@ -0,0 +1,323 @@
+import gc
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from my_lexer import Token, TokenLocation, TokenType
+from my_parser import OldParser
+from name_pool import names
+from symbol_table import SymbolTable
+from token_source import TokenSource
+
+# token types indexed by value
+token_types = list(TokenType)
+
+# parser of a worker process, created once by `init_worker_`
+worker_parser = None
+
+
+@contextmanager
+def gc_paused():
+    """
+     Turns the cyclic garbage collector off. Parsing and unpickling create many objects and no
+     garbage, so the collections that the allocations would trigger find nothing to free.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def init_worker_(pooled_names):
+    global worker_parser
+    # tokens come with ids of the pool of the main process
+    names.replace(pooled_names)
+    worker_parser = OldParser()
+
+
+def pack_tokens_(tokens):
+    """
+     Tuples of plain values that pickle faster than the tokens themselves.
+    """
+    out = []
+    for tok in tokens:
+        location = tok.location
+        if location is None:
+            out.append((tok.type._value_, tok.lexeme, tok.value, tok.name_id, None, None))
+        else:
+            out.append((tok.type._value_, tok.lexeme, tok.value, tok.name_id, location.line_no, location.line_pos))
+    return out
+
+
+def unpack_tokens_(packed):
+    tokens = []
+    for type_value, lexeme, value, name_id, line_no, line_pos in packed:
+        tok = Token(lexeme, token_types[type_value], value)
+        tok.name_id = name_id
+        if line_no is not None:
+            tok.location = TokenLocation(line_no, line_pos)
+        tokens.append(tok)
+    return tokens
+
+
+# token types are pickled by name, which is much faster to load than calling the enum
+token_type_refs = {id(tp): tp.name for tp in TokenType}
+token_types_by_name = {tp.name: tp for tp in TokenType}
+
+
+class ScopePickler(pickle.Pickler):
+    """
+     Pickles the function bodies of a batch parsed in a worker. The symbols of the enclosing
+     scopes are copies of those of the main process; they are pickled as references and bound
+     back to the originals by `ScopeUnpickler`. Symbols of the global scope and the root block
+     are referred to by their index among them, and the argument tables and argument symbols of
+     the functions by negative indices into the list of them.
+    """
+
+    def __init__(self, file, refs):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.refs = refs
+
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+
+
+class ScopeUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, outer_symbols, functions):
+        super().__init__(file)
+        self.outer_symbols = outer_symbols
+        self.local_symbols = []
+        for f in functions:
+            self.local_symbols.append(f.symtable)
+            self.local_symbols.extend(f.arg_symbols)
+
+    def persistent_load(self, pid):
+        if pid.__class__ is str:
+            return token_types_by_name[pid]
+        if pid < 0:
+            return self.local_symbols[-1 - pid]
+        return self.outer_symbols[pid]
+
+
+def parse_bodies_(outer_symbols, jobs):
+    """
+     Parses the function bodies of a batch in a worker. `outer_symbols` are the symbols of the
+     global scope followed by those of the root block; each job is
+     (packed tokens, index of the first token, label id before the body, number of visible root
+     block symbols, argument symbols). Returns the pickled list of bodies, or None if any of them
+     fails to parse: the error is then reported by a serial parse.
+    """
+    with gc_paused():
+        return parse_batch_(outer_symbols, jobs)
+
+
+def parse_batch_(outer_symbols, jobs):
+    parser = worker_parser
+    n_global, root_symbols = outer_symbols
+    refs = {id(sym): i for i, sym in enumerate(root_symbols)}
+    refs.update(token_type_refs)
+
+    global_table = SymbolTable()
+    for sym in root_symbols[:n_global]:
+        global_table.add(sym)
+    # jobs come in source order, so the root block only grows from one job to the next
+    root_table = SymbolTable(global_table)
+    n_declared = n_global
+    # argument tables are kept alive until pickling, so their ids stay unique
+    local_symbols = []
+    bodies = []
+    try:
+        for packed, first_idx, label_id, n_visible, arg_symbols in jobs:
+            for sym in root_symbols[n_declared:n_global + n_visible]:
+                root_table.add(sym)
+            n_declared = n_global + n_visible
+            arg_table = SymbolTable(root_table)
+            for sym in arg_symbols:
+                arg_table.add(sym)
+            local_symbols.append(arg_table)
+            local_symbols.extend(arg_symbols)
+
+            parser.source = TokenSource(unpack_tokens_(packed))
+            parser.idx = first_idx - 1
+            parser.curr_label_id = label_id
+            parser.symtable = arg_table
+            parser.advance()
+            bodies.append(parser.code_block())
+            if not parser.eof():
+                return None
+    except Exception:
+        return None
+
+    refs.update((id(sym), -1 - i) for i, sym in enumerate(local_symbols))
+    f = io.BytesIO()
+    ScopePickler(f, refs).dump(bodies)
+    return f.getvalue()
+
+
+class ParallelParser(OldParser):
+    """
+     Parser that parses the bodies of top-level functions in a process pool.
+
+     A skim over the tokens first finds the bodies of the functions defined in the root block by
+     brace matching, and counts the `if` and `while` statements in each. The parse of this
+     process then runs as usual, so top-level statements and function signatures are declared
+     in order, but it jumps over those bodies: it hands each one to the pool together with the
+     symbols visible at that point, and moves `curr_label_id` past the labels the body will take.
+     Labels are therefore numbered exactly as in a serial parse. The bodies parsed by the workers
+     are stitched back into their `ASTFunctionDefinition` nodes, with references to outer symbols
+     bound to the symbols of this process.
+
+     On any error the input is parsed again serially, so the error reported is the first one in
+     source order, as with `OldParser`. Inputs shorter than `min_parallel_tokens`, or with fewer
+     than two top-level functions, or a single worker, are parsed serially.
+    """
+
+    def __init__(self, workers=None, min_parallel_tokens=100000, batches_per_worker=4, debug=False):
+        super().__init__(debug=debug)
+
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_tokens = min_parallel_tokens
+        self.batches_per_worker = batches_per_worker
+
+        self.tokens = []
+        # index of the opening brace of each body -> (index of its closing brace, number of labels)
+        self.bodies = {}
+        self.pool = None
+        self.batch = []
+        self.batch_size = 0
+        self.batch_tokens = 0
+        self.pending = []
+
+    def skim(self, tokens):
+        """
+         Finds the bodies of the functions defined in the root block. Returns a dict mapping the
+         index of the opening brace of each body to the index of its closing brace and the number
+         of `if` and `while` tokens between them.
+        """
+        left, right, func = TokenType.LEFT_CURL, TokenType.RIGHT_CURL, TokenType.FUNC
+        labelled = (TokenType.IF, TokenType.WHILE)
+
+        bodies = {}
+        depth = 0
+        idx = 0
+        n_tokens = len(tokens)
+        while idx < n_tokens:
+            tp = tokens[idx].type
+            if tp is left:
+                depth += 1
+            elif tp is right:
+                depth -= 1
+            elif tp is func and depth == 1:
+                open_idx = idx + 1
+                while open_idx < n_tokens and tokens[open_idx].type not in (left, right):
+                    open_idx += 1
+                if open_idx == n_tokens or tokens[open_idx].type is right:
+                    break
+
+                body_depth = 0
+                n_labels = 0
+                idx = open_idx
+                while idx < n_tokens:
+                    tp = tokens[idx].type
+                    if tp is left:
+                        body_depth += 1
+                    elif tp is right:
+                        body_depth -= 1
+                        if body_depth == 0:
+                            break
+                    elif tp in labelled:
+                        n_labels += 1
+                    idx += 1
+                else:
+                    break
+                bodies[open_idx] = (idx, n_labels)
+            idx += 1
+        return bodies
+
+    def parse(self, tokens):
+        if not isinstance(tokens, list):
+            tokens = list(tokens)
+        if self.workers < 2 or len(tokens) < self.min_parallel_tokens:
+            return super().parse(tokens)
+
+        bodies = self.skim(tokens)
+        if len(bodies) < 2:
+            return super().parse(tokens)
+
+        self.tokens = tokens
+        self.bodies = bodies
+        body_tokens = sum(close - open_idx + 1 for open_idx, (close, _) in bodies.items())
+        self.batch_size = max(1, body_tokens // (self.workers * self.batches_per_worker))
+        self.batch = []
+        self.batch_tokens = 0
+        self.pending = []
+        try:
+            with gc_paused():
+                return self.parse_parallel_(tokens)
+        except Exception:
+            # the first error in source order is found by parsing serially
+            self.bodies = {}
+            return super().parse(tokens)
+        finally:
+            self.pool = None
+            self.tokens = []
+            self.bodies = {}
+            self.pending = []
+
+    def parse_parallel_(self, tokens):
+        with ProcessPoolExecutor(self.workers, initializer=init_worker_, initargs=(names.names,)) as pool:
+            self.pool = pool
+            root = super().parse(tokens)
+            self.submit_batch_()
+
+            outer_symbols = None
+            for functions, future in self.pending:
+                pickled_bodies = future.result()
+                if pickled_bodies is None:
+                    raise ValueError('Function body failed to parse')
+                if outer_symbols is None:
+                    outer_symbols = self.outer_symbols_(functions[0])
+                bodies = ScopeUnpickler(io.BytesIO(pickled_bodies), outer_symbols, functions).load()
+                for f, body in zip(functions, bodies):
+                    f.add_child(body)
+        return root
+
+    @staticmethod
+    def outer_symbols_(f):
+        root_table = f.symtable.parent
+        return list(root_table.parent.table.values()) + list(root_table.table.values())
+
+    def function_body(self, f):
+        body = self.bodies.get(self.idx)
+        if body is None or self.pool is None:
+            return super().function_body(f)
+
+        close_idx, n_labels = body
+        root_table = f.symtable.parent
+        packed = pack_tokens_(self.tokens[self.idx:close_idx + 1])
+        self.batch.append((f, (packed, self.idx, self.curr_label_id, len(root_table.table), list(f.arg_symbols))))
+        self.batch_tokens += len(packed)
+        if self.batch_tokens >= self.batch_size:
+            self.submit_batch_()
+
+        self.curr_label_id += n_labels
+        self.source.skip(close_idx - self.idx)
+        self.idx = close_idx
+        self.advance()
+
+    def submit_batch_(self):
+        if not self.batch:
+            return
+        functions = [f for f, _ in self.batch]
+        jobs = [job for _, job in self.batch]
+        global_symbols = list(functions[0].symtable.parent.parent.table.values())
+        outer_symbols = (len(global_symbols), self.outer_symbols_(functions[0]))
+        self.pending.append((functions, self.pool.submit(parse_bodies_, outer_symbols, jobs)))
+        self.batch = []
+        self.batch_tokens = 0
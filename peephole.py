@@ -0,0 +1,134 @@
+def push_arg(cmd):
+    """
+     Argument of a `push` instruction, None for any other instruction.
+    """
+    if cmd.startswith('push '):
+        return int(cmd[5:])
+    return None
+
+
+def drop_empty_dealloc(window):
+    # push 0; dealloc
+    if window[0] == 'push 0':
+        return []
+    return None
+
+
+def merge_deallocs(window):
+    # push a; dealloc; push b; dealloc
+    a, b = push_arg(window[0]), push_arg(window[2])
+    if a is None or b is None or window[1] != 'dealloc':
+        return None
+    return ['push %d' % (a + b), 'dealloc']
+
+
+def merge_allocs(window):
+    # push a; alloc; push b; alloc
+    a, b = push_arg(window[0]), push_arg(window[2])
+    if a is None or b is None or window[1] != 'alloc':
+        return None
+    return ['push %d' % (a + b), 'alloc']
+
+
+def store_load(window):
+    # store k; load k: the value stored stays on the stack
+    store, load = window
+    if store[:6] != 'store ' or store[6:] != load[5:]:
+        return None
+    return ['dup', store]
+
+
+def drop_zero_step(window):
+    # push 0; add and push 0; sub
+    if window[0] == 'push 0':
+        return []
+    return None
+
+
+def increment(window):
+    # push 1; add
+    if window[0] == 'push 1':
+        return ['inc']
+    return None
+
+
+def decrement(window):
+    # push 1; sub
+    if window[0] == 'push 1':
+        return ['dec']
+    return None
+
+
+def constant_branch(window):
+    # push c; jz label and push c; jnz label: the jump is always or never taken
+    value = push_arg(window[0])
+    if value is None:
+        return None
+    op, target = window[1].split(' ')
+    if (value == 0) == (op == 'jz'):
+        return ['jump ' + target]
+    return []
+
+
+# opcode -> (name, window size, rewrite) of the rules whose window ends with that opcode, tried in
+# order. A rewrite takes the last instructions of the code and returns what replaces them, or None
+# when they do not match.
+peephole_rules = {
+    'dealloc': [('drop_empty_dealloc', 2, drop_empty_dealloc), ('merge_deallocs', 4, merge_deallocs)],
+    'alloc': [('merge_allocs', 4, merge_allocs)],
+    'load': [('store_load', 2, store_load)],
+    'add': [('drop_zero_step', 2, drop_zero_step), ('increment', 2, increment)],
+    'sub': [('drop_zero_step', 2, drop_zero_step), ('decrement', 2, decrement)],
+    'jz': [('constant_branch', 2, constant_branch)],
+    'jnz': [('constant_branch', 2, constant_branch)],
+}
+
+
+class PeepholeOptimizer:
+    """
+     Rewrites short sequences of emitted instructions into shorter or cheaper ones, by the rules of
+     `peephole_rules`.
+
+     The instructions are copied one at a time; after each, the rules for its opcode are tried on
+     the window of the last instructions, and a rewrite is tried again on what it leaves, so
+     that, for example, a run of allocations merges into one. A window never holds a label: a jump
+     may land on the instruction after it, which must stay as it is.
+
+     `hits` counts the rewrites made by each rule.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else peephole_rules
+        self.hits = {name: 0 for rules in self.rules.values() for name, _, _ in rules}
+
+    def optimize(self, code):
+        """
+         The instructions of `code`, a list as `Emitter.instructions` returns it, rewritten.
+        """
+        out = []
+        # windows start at or after this index, past the last label
+        start = 0
+        for cmd in code:
+            out.append(cmd)
+            if cmd[-1] == ':':
+                start = len(out)
+            else:
+                self.rewrite_tail_(out, start)
+        return out
+
+    def rewrite_tail_(self, out, start):
+        while len(out) > start:
+            rules = self.rules.get(out[-1].split(' ', 1)[0])
+            if rules is None:
+                return
+            for name, size, rewrite in rules:
+                if len(out) - start < size:
+                    continue
+                replacement = rewrite(out[-size:])
+                if replacement is not None:
+                    del out[-size:]
+                    out.extend(replacement)
+                    self.hits[name] += 1
+                    break
+            else:
+                return
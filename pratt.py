@@ -0,0 +1,66 @@
+from parser import Parser
+
+from my_lexer import TokenType
+
+from my_ast import ASTExpr
+
+# Binding powers of the binary operators, from the loosest to the tightest. All of them are left
+# associative: `a - b - c` is `(a - b) - c` and `a = b = c` is `(a = b) = c`.
+binary_operators = {
+    TokenType.ASSIGN: 1,
+    TokenType.LE: 2, TokenType.GE: 2, TokenType.EQUAL: 2, TokenType.NOT_EQUAL: 2,
+    TokenType.PLUS: 3, TokenType.MINUS: 3,
+    TokenType.MUL: 4, TokenType.DIV: 4,
+}
+
+# Postfix operators (call, index) bind tighter than any binary operator and follow a primary expression
+postfix_operators = [TokenType.LEFT_PARENTHESIS, TokenType.LEFT_BRACKET]
+
+# binding power indexed by token type value, 0 for tokens that are no binary operator
+binding_powers = [0] * len(TokenType)
+for op, power in binary_operators.items():
+    binding_powers[op.value] = power
+
+
+class PrattParser(Parser):
+    """
+     Base of the recursive-descent parsers that parses expressions by precedence climbing
+     instead of one method per precedence level.
+
+     An operand is a primary expression with its postfix operators. Subclasses provide
+     `primary_expression()`, `postfix_expression_rest(lhs)`, `sym()`, `advance()` and `debug`,
+     and keep the current token in `curr_sym`. The operators between operands are looked up in
+     `binding_powers`. A chain of operators of one level is a loop, and only an operator binding
+     tighter than the one before it goes one call deeper, so the depth is bounded by the number
+     of levels.
+    """
+
+    def expression(self):
+
+        return self.binary_expression_(1)
+
+    def binary_expression_(self, min_power):
+
+        lhs = self.postfix_expression()
+        while True:
+            op = self.curr_sym.type
+            power = binding_powers[op._value_]
+            if power < min_power:
+                return lhs
+
+            self.advance()
+            rhs = self.binary_expression_(power + 1)
+            node = ASTExpr(op)
+            node.add_child(lhs)
+            node.add_child(rhs)
+            lhs = node
+
+    def postfix_expression(self):
+
+        if self.debug:
+            print('In postfix_expression: curr token=', self.sym())
+
+        lhs = self.primary_expression()
+        if self.curr_sym.type in postfix_operators:
+            lhs = self.postfix_expression_rest(lhs)
+        return lhs
@@ -0,0 +1,158 @@
+import sys
+
+from emitter import Emitter
+from errors import CompileError
+from my_ast import ASTCodeBlock, ASTFunctionDefinition
+from my_lexer import Lexer
+from my_parser import OldParser
+from symbol_table import SymbolTable
+from token_source import TokenSource
+from virtual_machine import VirtualMachine
+
+
+class SessionParser(OldParser):
+    """
+     OldParser for the inputs of a session. Each input is a list of statements, parsed into the
+     session scope, which lives on from one input to the next. Label ids keep counting up, so
+     labels of different inputs never clash.
+    """
+
+    def __init__(self, debug=False):
+        super().__init__(debug=debug)
+        # the session scope, on top of the one with the types
+        self.symtable = SymbolTable(self.symtable)
+
+    def parse(self, tokens):
+        self.source = TokenSource(tokens)
+        self.idx = -1
+        self.advance()
+
+        stmts = self.statement_list()
+        if not self.eof():
+            self.error_()
+        return stmts
+
+
+class Session:
+    """
+     Compiles and runs code input by input, as a REPL does.
+
+     The symbol table, the labels of the program and a virtual machine are kept between inputs.
+     An input is a list of statements: it is parsed in the session scope, compiled on its own and
+     appended to the loaded program, then run. Function definitions are placed before the
+     statements of the input, so that running it starts at its first statement and never enters
+     a function body. Variables of the session live in the bottom frame of the machine. The work
+     for an input depends only on the input, not on how long the session has been running.
+
+     An input that fails to compile or to run leaves the session as it was before it, values of
+     the variables included.
+    """
+
+    def __init__(self, debug=False):
+        self.lexer = Lexer()
+        self.parser = SessionParser(debug)
+        self.vm = VirtualMachine(debug=debug)
+        self.vm.sp = -1
+
+        # stands for the block of the session: declarations take their addresses from it
+        self.root = ASTCodeBlock(self.parser.symtable)
+
+    def compile(self, code):
+        """
+         Returns the bytecode of the function definitions of an input and that of its other
+         statements.
+        """
+        stmts = self.parser.parse(self.lexer.analyze(code))
+
+        functions, statements = Emitter(), Emitter()
+        for stmt in stmts:
+            # not added as a child: the AST of an input is dropped once it is compiled
+            stmt.parent = self.root
+            stmt.resolve_context()
+            # emitted in source order, which gives the variables their addresses
+            stmt.emit_to(functions if isinstance(stmt, ASTFunctionDefinition) else statements)
+        # a label at the end of the input needs an instruction to stand on
+        statements.emit('nop')
+        return functions.text(), statements.text()
+
+    def execute(self, code):
+        """
+         Compiles and runs an input. Returns the values its expression statements left on the
+         stack, such as the value of `f(2);`.
+        """
+        parser, root, vm = self.parser, self.root, self.vm
+        scope = parser.symtable
+        n_symbols = len(scope.table)
+        label_id = parser.curr_label_id
+        curr_mem_idx, memory_size = root.curr_mem_idx, root.memory_size
+        program_size = len(vm.program)
+        sp, mem_end = vm.sp, vm.frame.mem_end
+        # values of the variables the input stores to, which it may change before it fails
+        saved = {}
+
+        try:
+            function_code, code = self.compile(code)
+            vm.append_code(function_code)
+            start = vm.append_code(code)
+            # functions run in frames of their own: only the statements of the input, in the
+            # bottom frame, reach the variables of the session
+            saved = {arg: vm.memory[arg] for op, arg in vm.program[start:] if op == 'store' and arg < mem_end}
+            vm.run(start)
+        except Exception:
+            # symbols are added in order, so the ones of this input are the last ones
+            for name_id in list(scope.table)[n_symbols:]:
+                del scope.table[name_id]
+            parser.symtable = scope
+            parser.curr_label_id = label_id
+            root.curr_mem_idx, root.memory_size = curr_mem_idx, memory_size
+            vm.truncate(program_size)
+            del vm.call_stack[1:]
+            vm.sp, vm.frame.mem_end = sp, mem_end
+            for address, value in saved.items():
+                vm.memory[address] = value
+            raise
+
+        values = vm.stack[sp + 1:vm.sp + 1]
+        vm.sp = sp
+        return values
+
+    def value_of(self, name):
+        """
+         Current value of a variable of the session.
+        """
+        sym = self.parser.symtable.find_name(name)
+        if sym is None or sym.address is None:
+            raise CompileError(f'No variable <{name}> in the session')
+        return self.vm.memory[sym.address]
+
+
+def repl(session=None, prompt='>>> ', more_prompt='... '):
+    """
+     Reads inputs from stdin and runs them in `session`. Lines are collected until their braces
+     are balanced, so a function or a loop can span several lines.
+    """
+    session = session or Session()
+    lines = []
+    while True:
+        try:
+            line = input(more_prompt if lines else prompt)
+        except EOFError:
+            print()
+            return session
+        lines.append(line)
+        code = '\n'.join(lines)
+        if code.count('{') > code.count('}'):
+            continue
+        lines = []
+        if not code.strip():
+            continue
+
+        try:
+            for value in session.execute(code):
+                print(value)
+        except Exception as e:
+            print(f'{e.__class__.__name__}: {e}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    repl()
@@ -0,0 +1,130 @@
+from symbol_table import Symbol, SymbolTable, SymbolType, SymbolFunction, SymbolId
+
+from my_lexer import TokenType
+
+from my_ast import ASTExpr, ASTId, ASTCodeBlock, ASTFunctionDefinition, ASTIfStatement, ASTWhileStatement, \
+    ASTBreakStatement, ASTContinueStatement, ASTReturnStatement, ASTFunctionCall, ASTEntryPoint
+
+from errors import CompileError
+
+
+def binary_expr(op, lhs, rhs):
+    node = ASTExpr(op)
+    node.add_child(lhs)
+    node.add_child(rhs)
+    return node
+
+
+class SemanticActions:
+    """
+     Semantic actions shared by the table-driven parsers, `TableParser` and `LALRParser`. Their
+     grammars differ in shape, so they collect the values of a construct differently, but they
+     build the same AST with symbols resolved in scoped symbol tables while parsing.
+
+     The `on_*` actions here are for the productions the two grammars have in common, with the
+     same symbols and alternatives; the other helpers build a node or declare a symbol from the
+     values each parser has collected.
+    """
+
+    def reset_scope_(self):
+        self.curr_label_id = 0
+        self.symtable = SymbolTable()
+        self.init_types()
+
+    def init_types(self):
+
+        self.symtable.add(SymbolType('int', 1))
+        self.symtable.add(SymbolType('float', 1))
+
+    def identifier_type(self, tok):
+        tp_entry = self.symtable.find(tok.name_id)
+        if tp_entry is None or tp_entry.symbol_type != Symbol.Type:
+            raise ValueError('%s does not name a type' % tok.lexeme)
+        return tp_entry
+
+    def get_name(self, tok):
+        _s = self.symtable.find(tok.name_id)
+        if _s:
+            raise CompileError(f'Symbol with name {tok.lexeme} already exists: {_s}')
+        return tok.lexeme
+
+    def new_variable_(self, type_tok, name_tok):
+        tp = self.identifier_type(type_tok)
+        var = self.symtable.add(SymbolId(name_tok.lexeme, tp, None, name_tok.name_id))
+        return tp, var
+
+    def new_function_(self, ret_type, func_name, name_id, arg_list):
+        """
+         Declares a function and opens the scope of its body, with its arguments in it.
+        """
+        f_sym = self.symtable.add(SymbolFunction(func_name, ret_type, arg_list, name_id))
+
+        f = ASTFunctionDefinition(f_sym, func_name, ret_type, arg_list)
+        f.symtable = SymbolTable(self.symtable)
+        self.symtable = f.symtable
+
+        for tp, name in arg_list:
+            var = SymbolId(name, tp, None)
+            f.symtable.add(var)
+            f.arg_symbols.append(var)
+        return f
+
+    def code_block_(self, stmts):
+        """
+         The block of `stmts`, in the scope opened for it, which is closed.
+        """
+        curr_node = ASTCodeBlock(self.symtable)
+        for stmt in stmts:
+            curr_node.add_child(stmt)
+
+        if self.symtable.parent:
+            self.symtable = self.symtable.parent
+        return curr_node
+
+    def on_statement(self, alt, values):
+        if alt == 5:
+            return ASTBreakStatement()
+        if alt == 6:
+            return ASTContinueStatement()
+        if alt == 7:
+            s = ASTReturnStatement()
+            s.add_child(values[1])
+            return s
+        if alt == 9:
+            return ASTEntryPoint()
+        return values[0]
+
+    def on_if_statement(self, alt, values):
+        self.curr_label_id += 1
+        stmt = ASTIfStatement(self.curr_label_id)
+        stmt.add_child(values[2])
+        stmt.add_child(values[4])
+        return stmt
+
+    def on_while_loop_statement(self, alt, values):
+        self.curr_label_id += 1
+        w = ASTWhileStatement(self.curr_label_id)
+        w.add_child(values[2])
+        w.add_child(values[4])
+        return w
+
+    def on_initializer(self, alt, values):
+        return values[1]
+
+    def on_arg(self, alt, values):
+        return self.identifier_type(values[0]), self.get_name(values[1])
+
+    def identifier_expr_(self, tok):
+        """
+         The variable or, when the current token opens its arguments, the function call `tok` names.
+        """
+        var_entry = self.symtable.find(tok.name_id)
+        if var_entry is None or var_entry.symbol_type not in [Symbol.Id, Symbol.Function]:
+            raise ValueError('Undeclared identifier:', tok.lexeme)
+        # the current token is the one after the identifier
+        if self.sym().type == TokenType.LEFT_PARENTHESIS:
+            if var_entry.symbol_type != Symbol.Function:
+                raise CompileError(f'Expected function call, but got different kind of symbol: {var_entry}')
+            return ASTFunctionCall(var_entry, tok.lexeme, tok.name_id)
+
+        return ASTId(var_entry, tok.lexeme, tok.name_id)
@@ -1,9 +1,13 @@
+from name_pool import names
+
+
 class Symbol:
     Id, Type, Function = 0, 1, 2
 
-    def __init__(self, _name, tp):
+    def __init__(self, _name, tp, name_id=None):
         self.name = _name
         self.symbol_type = tp
+        self.name_id = name_id if name_id is not None else names.intern(_name)
 
     def __str__(self):
         raise NotImplementedError()
@@ -11,8 +15,8 @@ class Symbol:
 
 class SymbolId(Symbol):
 
-    def __init__(self, _name, tp, address):
-        super().__init__(_name, Symbol.Id)
+    def __init__(self, _name, tp, address, name_id=None):
+        super().__init__(_name, Symbol.Id, name_id)
         self.type = tp
         self.address = address
 
@@ -21,20 +25,20 @@ class SymbolId(Symbol):
 
 
 class SymbolType(Symbol):
-    def __init__(self, _name, _size):
-        super().__init__(_name, Symbol.Type)
+    def __init__(self, _name, _size, name_id=None):
+        super().__init__(_name, Symbol.Type, name_id)
 
     def __str__(self):
         return f'SymbolType: <{self.name}>'
 
 
 class SymbolFunction(Symbol):
-    def __init__(self, _name, _ret_type, args):
+    def __init__(self, _name, _ret_type, args, name_id=None):
         """
          args = [(type_symbol,name),(type_symbol,name)...]
          e.g. args = [SymbolType('int',1),'arg1',SymbolType('float',4),'arg2']
         """
-        super().__init__(_name, Symbol.Function)
+        super().__init__(_name, Symbol.Function, name_id)
 
         self.ret_type = _ret_type
 
@@ -48,27 +52,38 @@ class SymbolFunction(Symbol):
 
 
 class SymbolTable:
+    """
+     Scoped symbol table keyed on interned name ids (see `name_pool`).
+    """
 
     def __init__(self, p=None):
 
         self.table = {}
         self.parent = p
 
-    def find(self, name):
+    def find(self, name_id):
 
         curr_table = self
         while curr_table is not None:
-            if name in curr_table.table:
-                return curr_table.table[name]
+            sym = curr_table.table.get(name_id)
+            if sym is not None:
+                return sym
 
             curr_table = curr_table.parent
         return None
 
+    def find_name(self, name):
+        # a name that was never interned names no symbol; looking it up does not intern it
+        name_id = names.ids.get(name)
+        if name_id is None:
+            return None
+        return self.find(name_id)
+
     def add(self, sym):
 
-        if sym.name not in self.table:
-            self.table[sym.name] = sym
-            return self.table[sym.name]
+        if sym.name_id not in self.table:
+            self.table[sym.name_id] = sym
+            return sym
         else:
             raise KeyError('Symbol %s already present in current level table.' % sym.name)
 
@@ -94,24 +109,24 @@ if __name__ == '__main__':
         table.add(SymbolType('bool', 1))
         table.add(SymbolType('float', 1))
 
-        itype = table.find('int')
-        btype = table.find('bool')
-        ftype = table.find('float')
+        itype = table.find_name('int')
+        btype = table.find_name('bool')
+        ftype = table.find_name('float')
 
         table.add(SymbolId('x', itype, 0))
         table.add(SymbolId('y', btype, 1))
 
-        print(table.find('x'))
-        print(table.find('y'))
+        print(table.find_name('x'))
+        print(table.find_name('y'))
 
         block = SymbolTable(table)
 
         block.add(SymbolId('x', ftype, 2))
 
-        s = block.find('x')
+        s = block.find_name('x')
         s.value = 100
 
-        print(block.find('x'))
+        print(block.find_name('x'))
 
         args = [(itype, 'a1'), (ftype, 'a2')]
 
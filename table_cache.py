@@ -0,0 +1,55 @@
+import hashlib
+import os
+import pickle
+
+from my_lexer import TokenType
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.table_cache')
+
+# bumped whenever a generator or the layout of what it produces changes, so stale files are not loaded
+GENERATOR_VERSION = 2
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def content_key(*parts):
+    """
+     Hash of `parts` (strings or bytes), of the generator version and of the token types, which
+     tables refer to by value. It names a file in the cache.
+    """
+    h = hashlib.sha256()
+    h.update(repr((GENERATOR_VERSION, [(tp.name, tp.value) for tp in TokenType])).encode())
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else part.encode())
+        # keeps ('ab', 'c') and ('a', 'bc') apart
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def cached(kind, key, build, cache_dir=CACHE_DIR):
+    """
+     Returns what `build()` returns, kept in a pickle named after `kind` and `key` under
+     `cache_dir` and loaded from there when it was built before. A cache that cannot be read or
+     written is ignored.
+    """
+    path = os.path.join(cache_dir, f'{kind}-{key}.pickle')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+
+    value = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # written under a temporary name first, so a concurrent reader never sees half a file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return value
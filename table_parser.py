@@ -0,0 +1,339 @@
+from parser import Parser
+
+from symbol_table import SymbolTable
+
+from my_lexer import TokenType
+from token_source import TokenSource
+
+from my_ast import ASTDeclaration, ASTNumber
+
+from errors import UnexpectedTokenError, UnsupportedSyntaxError
+from semantic_actions import SemanticActions, binary_expr
+from ll1_table import ParseTable, description_table, terminal_types
+
+
+class LL1Parser(Parser):
+    """
+     Non-recursive predictive parser driven by a `ParseTable`.
+
+     The parser keeps an explicit stack of grammar symbols. A nonterminal on top is replaced by
+     the symbols of the production the table predicts for the current token; a terminal on top
+     is matched against the token. Values are kept on a second stack: a matched terminal pushes
+     its token, and once all symbols of a production have been parsed, its action pops their
+     values and pushes the value of the production.
+
+     The action of a production of `nonterminal` is the method `on_<nonterminal>(alt, values)`,
+     where `alt` is the number of the alternative. Without such a method, a production with a
+     single symbol passes its value on and any other production gives the list of its values.
+     Empty productions give None without calling the action.
+
+     `mid_actions` maps (nonterminal, alt, position) to the name of a method run as soon as the
+     first `position` symbols of that production have been parsed, as a mid-rule action in yacc.
+     It gets the values parsed so far and its result takes a place among the values of the
+     production, right after them.
+    """
+
+    mid_actions = {}
+
+    def __init__(self, table: ParseTable):
+        self.table = table
+
+        self.curr_sym = None
+        self.idx = -1
+        self.source = TokenSource([])
+
+        self.n_terminals = len(TokenType)
+        self.actions = []
+        types = terminal_types()
+        self.expansions = [self.compile_production_(types, *production) for production in table.productions]
+        self.predictions = self.fuse_predictions_()
+        self.start_item = self.n_terminals + table.nonterminals.index(table.start)
+
+    def compile_production_(self, types, nonterminal, alt, symbols):
+        """
+         Returns the stack items that replace `nonterminal` for this production, top of the stack
+         last. Terminals are items below `n_terminals` (their token type value), nonterminals are
+         items from `n_terminals` on, and actions are negative items `~idx` into `self.actions`.
+        """
+        nonterminals = self.table.nonterminals
+
+        items = []
+        n_values = 0
+        for position in range(len(symbols) + 1):
+            mid_action = self.mid_actions.get((nonterminal, alt, position))
+            if mid_action is not None:
+                items.append(self.add_action_(getattr(self, mid_action), alt, n_values, True))
+                n_values += 1
+            if position < len(symbols):
+                s = symbols[position]
+                if s in types:
+                    items.append(types[s].value)
+                else:
+                    items.append(self.n_terminals + nonterminals.index(s))
+                n_values += 1
+
+        reduce = getattr(self, 'on_' + nonterminal, None)
+        if n_values == 0:
+            items.append(self.add_action_(None, alt, 0, False))
+        elif reduce is not None or n_values > 1:
+            items.append(self.add_action_(reduce or self.default_action_, alt, n_values, False))
+        return items[::-1]
+
+    def fuse_predictions_(self):
+        """
+         Returns the stack items to push for each (nonterminal, token type) cell of the table.
+         While a nonterminal ends up on top of the stack no token is consumed, so it would be
+         expanded right away on the same token; the expansion of such a chain of leftmost
+         nonterminals is done here once, instead of one step at a time for every token.
+        """
+        n_terminals = self.n_terminals
+        rows = self.table.rows
+
+        predictions = []
+        for row in rows:
+            fused_row = []
+            for tok_type, prod in enumerate(row):
+                if prod < 0:
+                    fused_row.append(None)
+                    continue
+                items = list(self.expansions[prod])
+                while items[-1] >= n_terminals:
+                    next_prod = rows[items[-1] - n_terminals][tok_type]
+                    if next_prod < 0:
+                        break
+                    items[-1:] = self.expansions[next_prod]
+                if len(items) == 1 and items[0] < 0 and self.actions[~items[0]][0] is None:
+                    # an empty production: its None value is pushed right away
+                    items = ()
+                fused_row.append(items)
+            predictions.append(fused_row)
+        return predictions
+
+    def add_action_(self, fn, alt, n_values, is_mid):
+        self.actions.append((fn, alt, n_values, is_mid))
+        return ~(len(self.actions) - 1)
+
+    @staticmethod
+    def default_action_(alt, values):
+        if len(values) == 1:
+            return values[0]
+        return values
+
+    def _reset(self):
+        self.curr_sym = None
+        self.idx = -1
+
+    def error_(self):
+        raise UnexpectedTokenError(self.sym(), self.idx)
+
+    def sym(self):
+        return self.curr_sym
+
+    def advance(self):
+        self.idx += 1
+        self.curr_sym = self.source.next()
+
+    def parse(self, tokens):
+        self.source = TokenSource(tokens)
+        self._reset()
+        self.advance()
+
+        n_terminals = self.n_terminals
+        predictions = self.predictions
+        actions = self.actions
+        eof = TokenType.EOF.value
+        next_token = self.source.next
+
+        stack = [self.start_item]
+        values = []
+        pop, push, push_value = stack.pop, stack.extend, values.append
+
+        tok = self.curr_sym
+        tok_type = tok.type._value_
+        while stack:
+            item = pop()
+            if item >= n_terminals:
+                items = predictions[item - n_terminals][tok_type]
+                if items:
+                    push(items)
+                elif items is None:
+                    self.error_()
+                else:
+                    push_value(None)
+            elif item >= 0:
+                if item != tok_type:
+                    self.error_()
+                push_value(tok)
+                if tok_type != eof:
+                    self.idx += 1
+                    tok = self.curr_sym = next_token()
+                    tok_type = tok.type._value_
+            else:
+                fn, alt, n_values, is_mid = actions[~item]
+                if fn is None:
+                    push_value(None)
+                    continue
+                if n_values:
+                    args = values[-n_values:]
+                    if not is_mid:
+                        del values[-n_values:]
+                else:
+                    args = []
+                push_value(fn(alt, args))
+
+        return values[0]
+
+
+def push_front(item, reversed_rest):
+    """
+     Adds `item` in front of a list kept in reverse order; None is the empty list.
+    """
+    if reversed_rest is None:
+        return [item]
+    reversed_rest.append(item)
+    return reversed_rest
+
+
+def fold_left(lhs, reversed_tail):
+    """
+     Builds left-associative binary expressions from `lhs` and the (op, operand) pairs of a
+     `*_rhs` nonterminal, which are collected in reverse order.
+    """
+    if reversed_tail is None:
+        return lhs
+    for op, rhs in reversed(reversed_tail):
+        lhs = binary_expr(op, lhs, rhs)
+    return lhs
+
+
+class TableParser(SemanticActions, LL1Parser):
+    """
+     LL(1) parser generated from grammar_description.txt. It builds the same AST as `OldParser`,
+     with symbols resolved in scoped symbol tables while parsing.
+
+     Lists (`statement_list`, `*_rhs` tails, argument lists) are right recursive in the grammar;
+     their actions append to the list of the rest, so they come out reversed and are turned
+     around by the production that uses them. An empty list is None, the value of the empty
+     production.
+    """
+
+    mid_actions = {
+        ('code_block', 0, 1): 'begin_block_',
+        ('variable_declaration', 0, 3): 'declare_variable_',
+        ('function_definition', 0, 6): 'declare_function_',
+        ('postfix_expression_rest', 0, 1): 'subscript_',
+        ('primary_expression', 3, 1): 'dereference_',
+    }
+
+    # generated once and shared by all instances
+    description_table = None
+
+    def __init__(self):
+        if TableParser.description_table is None:
+            TableParser.description_table = description_table()
+        super().__init__(TableParser.description_table)
+
+        self.reset_scope_()
+
+    def _reset(self):
+        super()._reset()
+
+        self.reset_scope_()
+
+    # Mid-rule actions
+
+    def begin_block_(self, alt, values):
+        self.symtable = SymbolTable(self.symtable)
+
+    def declare_variable_(self, alt, values):
+        return self.new_variable_(values[1], values[2])
+
+    def declare_function_(self, alt, values):
+        ret_type = self.identifier_type(values[1])
+        func_name = self.get_name(values[2])
+        return self.new_function_(ret_type, func_name, values[2].name_id, values[4] or [])
+
+    def subscript_(self, alt, values):
+        raise UnsupportedSyntaxError('Array subscript', values[0])
+
+    def dereference_(self, alt, values):
+        raise UnsupportedSyntaxError('Pointer dereference', values[0])
+
+    # Productions
+
+    def on_program(self, alt, values):
+        return values[0]
+
+    def on_code_block(self, alt, values):
+        return self.code_block_(reversed(values[2] or ()))
+
+    def on_statement_list(self, alt, values):
+        return push_front(values[0], values[1])
+
+    def on_variable_declaration(self, alt, values):
+        tp, var = values[3]
+        decl_node = ASTDeclaration(tp, var)
+        if values[4] is not None:
+            decl_node.add_child(values[4])
+        return decl_node
+
+    def on_function_definition(self, alt, values):
+        f = values[6]
+        f.add_child(values[7])
+        self.symtable = self.symtable.parent
+        return f
+
+    def on_arg_list_def(self, alt, values):
+        return push_front(values[0], values[1])[::-1]
+
+    def on_arg_list_def_rest(self, alt, values):
+        return push_front(values[1], values[2])
+
+    def on_assignment_expr(self, alt, values):
+        return fold_left(values[0], values[1])
+
+    def on_assignment_expr_rhs(self, alt, values):
+        return push_front((TokenType.ASSIGN, values[1]), values[2])
+
+    def on_comparison(self, alt, values):
+        return fold_left(values[0], values[1])
+
+    def on_comparison_rhs(self, alt, values):
+        return push_front((values[0].type, values[1]), values[2])
+
+    def on_additive_expr(self, alt, values):
+        return fold_left(values[0], values[1])
+
+    def on_additive_expr_rhs(self, alt, values):
+        return push_front((values[0].type, values[1]), values[2])
+
+    def on_multiplicative_expr(self, alt, values):
+        return fold_left(values[0], values[1])
+
+    def on_multiplicative_expr_rhs(self, alt, values):
+        return push_front((values[0].type, values[1]), values[2])
+
+    def on_postfix_expression(self, alt, values):
+        lhs = values[0]
+        if values[1] is not None:
+            for arg_list in reversed(values[1]):
+                for arg in arg_list:
+                    lhs.add_child(arg)
+        return lhs
+
+    def on_postfix_expression_rest(self, alt, values):
+        return push_front(values[1] or [], values[3])
+
+    def on_primary_expression(self, alt, values):
+        s = values[0]
+        if alt == 0:
+            return ASTNumber(s.value)
+        if alt == 2:
+            return values[1]
+        return self.identifier_expr_(s)
+
+    def on_arg_list(self, alt, values):
+        return push_front(values[0], values[1])[::-1]
+
+    def on_arg_list_rest(self, alt, values):
+        return push_front(values[1], values[2])
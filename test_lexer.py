@@ -0,0 +1,221 @@
+import glob
+import os
+import random
+
+import pytest
+
+from errors import UnexpectedCharacterError
+from input_generators import generate_source
+from my_lexer import Lexer, OldLexer, TokenType, map_source_file
+from name_pool import names
+from parallel_lexer import ParallelLexer
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'parsing_test_data')
+
+
+def read_code(file_path):
+    with open(file_path, 'r') as f:
+        return f.read()
+
+
+def token_tuples(tokens):
+    return [(t.lexeme, t.type, t.value, t.location.line_no, t.location.line_pos) for t in tokens]
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_same_tokens_as_old_lexer(file_path):
+    code = read_code(file_path)
+    assert token_tuples(Lexer().analyze(code)) == token_tuples(OldLexer().analyze(code))
+
+
+def test_equal_after_operator():
+    # the one place where `Lexer` deliberately differs from `OldLexer`, see `Lexer.build_scanner`
+    cases = [('a*==b', ['a', '*', '==', 'b'], ['a', '*', '=', '=', 'b']),
+             ('a-==b', ['a', '-', '==', 'b'], ['a', '-', '=', '=', 'b']),
+             ('a!===b', ['a', '!=', '==', 'b'], ['a', '!=', '=', '=', 'b']),
+             ('a*====b', ['a', '*', '==', '==', 'b'], ['a', '*', '=', '==', '=', 'b']),
+             ('a<==b', ['a', '<', '==', 'b'], ['a', '<', '==', 'b'])]
+    for src, lexemes, old_lexemes in cases:
+        assert [t.lexeme for t in Lexer().analyze(src)] == lexemes
+        assert [t.lexeme for t in OldLexer().analyze(src)] == old_lexemes
+
+
+def test_keywords_and_operators():
+    tokens = Lexer().analyze('while (x != 10) { x = x + 1; } // x == 1')
+    assert [t.type for t in tokens] == [TokenType.WHILE, TokenType.LEFT_PARENTHESIS, TokenType.ID,
+                                        TokenType.NOT_EQUAL, TokenType.NUM, TokenType.RIGHT_PARENTHESIS,
+                                        TokenType.LEFT_CURL, TokenType.ID, TokenType.ASSIGN, TokenType.ID,
+                                        TokenType.PLUS, TokenType.NUM, TokenType.SEMICOLON, TokenType.RIGHT_CURL]
+    assert tokens[4].value == 10
+
+
+def test_unexpected_character():
+    with pytest.raises(UnexpectedCharacterError) as e:
+        Lexer().analyze('{\n  x = @;\n}')
+    assert e.value.location.line_no == 1
+    assert e.value.location.line_pos == 6
+
+
+def test_iter_tokens_from_file():
+    file_path = os.path.join(TEST_DATA_DIR, 'functions.prog')
+    with open(file_path, 'r') as f:
+        streamed = token_tuples(Lexer().iter_tokens(f))
+    assert streamed == token_tuples(Lexer().analyze(read_code(file_path)))
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_token_stream_matches_tokens(file_path):
+    code = read_code(file_path)
+    stream = Lexer().tokenize(code)
+    assert token_tuples(stream) == token_tuples(Lexer().analyze(code))
+    assert stream[-1].type == TokenType.RIGHT_CURL
+
+
+def test_token_stream_keeps_offsets_into_source():
+    code = 'x = 10; // comment\ny = x / 2;'
+    stream = Lexer().tokenize(code)
+    assert len(stream) == 10
+    assert stream.starts[4] == code.index('y')
+    assert stream[8].value == 2
+
+
+def stream_columns(stream):
+    return [(stream.type(i), stream.starts[i], stream.lengths[i]) for i in range(len(stream))]
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_relex_matches_full_scan(as_bytes):
+    lexer = Lexer()
+    code = read_code(os.path.join(TEST_DATA_DIR, 'functions.prog'))
+    if as_bytes:
+        code = code.encode('ascii')
+    stream = lexer.tokenize(code)
+    rnd = random.Random(0)
+    pieces = ['x', '12', '\n', '//', '/', ' ', '==', '=', '{', '}', 'while', 'a\n//b\n', '']
+    for _ in range(500):
+        offset = rnd.randrange(len(code) + 1)
+        removed = rnd.randrange(min(3, len(code) - offset) + 1)
+        inserted = rnd.choice(pieces)
+        lexer.relex(stream, offset, removed, inserted)
+        if as_bytes:
+            inserted = inserted.encode('ascii')
+        code = code[:offset] + inserted + code[offset + removed:]
+
+        expected = lexer.tokenize(code)
+        assert stream.source == code
+        assert stream_columns(stream) == stream_columns(expected)
+        assert token_tuples(stream) == token_tuples(expected)
+
+
+def test_relex_buffer_sources():
+    lexer = Lexer()
+    expected = token_tuples(lexer.tokenize('{ y = 1; }'))
+    for source in [b'{ x = 1; }', memoryview(b'{ x = 1; }')]:
+        stream = lexer.relex(lexer.tokenize(source), 2, 1, 'y')
+        assert stream.source == b'{ y = 1; }'
+        assert token_tuples(stream) == expected
+
+    file_path = os.path.join(TEST_DATA_DIR, 'functions.prog')
+    code = read_code(file_path)
+    with map_source_file(file_path) as mapped:
+        stream = lexer.relex(lexer.tokenize(mapped), 0, 0, 'x')
+    assert token_tuples(stream) == token_tuples(lexer.tokenize('x' + code))
+
+
+def test_relex_unexpected_character():
+    lexer = Lexer()
+    code = '{\n  x = 1;\n  y = 2;\n}'
+    for source in [code, code.encode('ascii')]:
+        stream = lexer.tokenize(source)
+        columns = stream_columns(stream)
+        with pytest.raises(UnexpectedCharacterError) as e:
+            lexer.relex(stream, code.index('2'), 1, '2 $')
+        assert (e.value.char, e.value.location.line_no, e.value.location.line_pos) == ('$', 2, 8)
+        # a failed edit leaves the stream as it was
+        assert stream.source == source and stream_columns(stream) == columns
+
+
+def test_bytes_sources(tmp_path):
+    file_path = os.path.join(TEST_DATA_DIR, 'functions.prog')
+    code = read_code(file_path)
+    data = code.encode('ascii')
+    expected = token_tuples(Lexer().analyze(code))
+
+    assert token_tuples(Lexer().analyze(data)) == expected
+    assert token_tuples(Lexer().analyze(memoryview(data))) == expected
+    assert token_tuples(Lexer().tokenize(memoryview(data))) == expected
+
+    with map_source_file(file_path) as mapped:
+        assert token_tuples(Lexer().tokenize(mapped)) == expected
+        assert token_tuples(Lexer().iter_tokens(mapped)) == expected
+
+    empty_path = tmp_path / 'empty.prog'
+    empty_path.write_bytes(b'')
+    assert Lexer().analyze(map_source_file(str(empty_path))) == []
+
+
+def test_unexpected_byte():
+    with pytest.raises(UnexpectedCharacterError) as e:
+        Lexer().tokenize(b'{ x = 1 $ 2; }')
+    assert e.value.char == '$'
+
+    for tokens in [Lexer().tokenize, Lexer().analyze]:
+        with pytest.raises(UnexpectedCharacterError) as e:
+            tokens('{ x = 1;\n  y = 2\u00e9; }'.encode('utf-8'))
+        assert e.value.char == '\\xc3'
+        assert (e.value.location.line_no, e.value.location.line_pos) == (1, 7)
+
+
+def test_identifiers_are_interned():
+    code = 'int foo(int x) { return x; }\n{ foo(1); }'
+    tokens = Lexer().analyze(code)
+    foo_a, foo_b = [t for t in tokens if t.lexeme == 'foo']
+    assert foo_a.lexeme is foo_b.lexeme
+    assert foo_a.name_id == foo_b.name_id == names.intern('foo')
+    assert names.name(foo_a.name_id) == 'foo'
+    assert tokens[0].name_id == names.intern('int')
+
+    stream = Lexer().tokenize(code)
+    assert [t.name_id for t in stream] == [t.name_id for t in tokens]
+
+
+def test_parallel_lexer_matches_serial():
+    code = generate_source(60)
+    expected = Lexer().tokenize(code)
+    with ParallelLexer(workers=3, min_parallel_size=0) as lexer:
+        for source in [code, code.encode('ascii'), memoryview(code.encode('ascii'))]:
+            stream = lexer.tokenize(source)
+            assert stream_columns(stream) == stream_columns(expected)
+            assert token_tuples(lexer.iter_tokens(source)) == token_tuples(expected)
+
+        ids = [t.name_id for t in lexer.analyze(code)]
+        assert ids == [t.name_id for t in Lexer().analyze(code)]
+
+
+def test_parallel_lexer_split_lines():
+    code = 'a\nbb\n\nccc\n' * 50
+    lexer = ParallelLexer(workers=4, min_parallel_size=0)
+    chunks = lexer.split_lines(code, 7)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(code)
+    for (_, end, _), (start, _, line_no) in zip(chunks, chunks[1:]):
+        assert end == start and code[start - 1] == '\n'
+        assert line_no == code.count('\n', 0, start)
+    assert lexer.split_lines('x', 4) == [(0, 1, 0)]
+
+
+def test_parallel_lexer_error_location():
+    code = generate_source(40)
+    bad_line = code.count('\n') - 3
+    lines = code.split('\n')
+    lines[bad_line] = '    $' + lines[bad_line]
+    with ParallelLexer(workers=2, min_parallel_size=0) as lexer:
+        for lex in [lexer.tokenize, lexer.analyze]:
+            with pytest.raises(UnexpectedCharacterError) as e:
+                lex('\n'.join(lines))
+            assert (e.value.location.line_no, e.value.location.line_pos) == (bad_line, 4)
+
+
+def test_parallel_lexer_small_source_is_serial():
+    lexer = ParallelLexer(workers=4)
+    assert token_tuples(lexer.tokenize('{ x = 1; }')) == token_tuples(Lexer().analyze('{ x = 1; }'))
+    assert lexer.pool is None
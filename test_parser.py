@@ -1,8 +1,37 @@
+import glob
+import os
+import pickle
+import sys
+
 import pytest
 
+from ast_print_visitor import PrintVisitor
+from compiler import Compiler
+from dead_code import DeadCodeEliminator
+from emitter import Emitter
+from errors import CompileError, InvalidReturnError, LoopError, UnexpectedTokenError, UnsupportedSyntaxError
+from first_and_follow import EPSILON, GRAMMAR_PATH, GrammarAnalysis, analyze_description, description_analysis
+from grammar import Grammar
+from input_generators import count_instructions, generate_chain_grammar, generate_chain_source, generate_nested_source, \
+    generate_programs, generate_random_grammar, generate_source
+from lalr_parser import LALRParser
+from lalr_table import build_lalr_table, cached_lalr_table, lalr_description_table, load_grammar
+from ll1_table import build_description_table, description_table
+from my_ast import ASTExpr, print_ast
 from my_lexer import Lexer
 from my_parser import OldParser
 from my_parser2 import NewParser
+from my_lexer import TokenType
+from name_pool import names
+from parallel_parser import ParallelParser
+from peephole import PeepholeOptimizer
+from symbol_table import SymbolId, SymbolTable, SymbolType
+from table_parser import TableParser
+from token_source import TokenSource
+from validator import SyntaxValidator, validate_directory
+from virtual_machine import VirtualMachine, preprocess_code
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'parsing_test_data')
 
 
 def parse(src_code, parser):
@@ -27,3 +56,598 @@ def test_empty_src():
     code = '''{}'''
     bytecode = parse(code, parser)
     assert bytecode == []
+
+
+def test_token_source_pulls_lazily():
+    pulled = []
+
+    def tokens():
+        for tok in Lexer().iter_tokens('{ var int x = 1; }'):
+            pulled.append(tok)
+            yield tok
+
+    source = TokenSource(tokens())
+    assert source.peek().type == TokenType.LEFT_CURL
+    assert source.next().type == TokenType.LEFT_CURL
+    assert source.next().type == TokenType.VAR
+    assert len(pulled) == 2
+    assert len(source.buffer) == 0
+
+
+def test_parse_from_token_generator():
+    src = '{ var int x = 1; x = x + 2; }'
+    streamed = OldParser().parse(Lexer().iter_tokens(src)).emit()
+    assert streamed == OldParser().parse(Lexer().analyze(src)).emit()
+
+
+def test_parse_token_stream():
+    src = '{ var int x = 1; while (x < 10) { x = x * 2; } }'
+    from_stream = OldParser().parse(Lexer().tokenize(src)).emit()
+    assert from_stream == OldParser().parse(Lexer().analyze(src)).emit()
+
+
+def test_symbol_table_keyed_on_name_ids():
+    outer = SymbolTable()
+    int_tp = outer.add(SymbolType('int', 1))
+    x = outer.add(SymbolId('x', int_tp, 0))
+    inner = SymbolTable(outer)
+    assert inner.find(names.intern('x')) is x
+    assert inner.find_name('int') is int_tp
+    assert inner.find_name('y') is None
+
+    n_names = len(names)
+    assert inner.find_name('never_interned_name') is None
+    assert len(names) == n_names
+
+
+def compile_or_error(parser, src_code):
+    try:
+        return parser.parse(Lexer().analyze(src_code)).emit()
+    except (CompileError, ValueError) as e:
+        return type(e), str(e)
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_table_parser_matches_old_parser(file_path):
+    with open(file_path, 'r') as f:
+        src = f.read()
+    assert compile_or_error(TableParser(), src) == compile_or_error(OldParser(), src)
+
+
+def test_table_parser_generated_source():
+    src = generate_source(30) + '''{
+        func int sum(int a, int b, int c) { return a + b * c - (a - b) / c; }
+        var int x = sum(1, 2, 3);
+        var int y = x = 4;
+        if (x == 1 != 0) { x = 2; }
+    }'''
+    src = '{' + src + '}'
+    assert compile_or_error(TableParser(), src) == compile_or_error(OldParser(), src)
+
+
+def test_table_parser_syntax_error():
+    for src in ['{ var int x }', '{ var int x; x = 1; } }', '{ if 1 { } }']:
+        with pytest.raises(UnexpectedTokenError):
+            TableParser().parse(Lexer().analyze(src))
+
+
+def test_description_table_conflicts():
+    table = description_table()
+    # `*p(x)` and `*p[x]`: the call or subscript binds to `p`
+    assert sorted((nt, terminal) for nt, terminal, _, _ in table.conflicts) == \
+        [('postfix_expression_rest', "'('"), ('postfix_expression_rest', "'['")]
+    assert table.predict('statement', TokenType.ENTRY)[2] == ("'entry'",)
+    assert table.predict('statement', TokenType.ELSE) is None
+
+
+def test_grammar_indexes():
+    gr = Grammar()
+    assert gr.add_prod_str('EXPR -> TERM + EXPR') == 0
+    terminals = gr.terminals()
+    assert terminals == {'TERM', '+'} and isinstance(terminals, frozenset)
+    gr.add_prod_str('EXPR -> TERM')
+    gr.add_prod_str('TERM -> id')
+    gr.add_prod('TERM', [])
+
+    assert set(gr.non_terminals()) == {'EXPR', 'TERM'}
+    assert set(gr.terminals()) == {'+', 'id'} and terminals == {'TERM', '+'}
+    assert set(gr.all_symbols()) == {'EXPR', 'TERM', '+', 'id'}
+    assert gr.productions[3] == ('TERM', 1, ())
+    assert gr.prod_ids == {'EXPR': [0, 1], 'TERM': [2, 3]}
+    assert gr.uses == {'EXPR': [0], 'TERM': [0, 1], '+': [0], 'id': [2]}
+    assert GrammarAnalysis(gr).follow['TERM'] == {'+', '$'}
+
+
+def test_grammar_analysis_description():
+    analysis = description_analysis()
+    assert analysis.nullable['statement_list'] and not analysis.nullable['statement']
+    assert analysis.first['code_block'] == {"'{'"}
+    assert analysis.follow['program'] == {'$'}
+    assert "')'" in analysis.follow['arg_list'] and "';'" in analysis.follow['initializer']
+    assert analysis.first_of(['initializer', "';'"]) == {"'='", "';'"}
+    assert analysis.first_of(['initializer']) == {"'='", EPSILON}
+
+    conflicts = analysis.conflicts()
+    assert [(c.nonterminal, c.terminal, c.kind) for c in conflicts] == \
+        [('postfix_expression_rest', "'('", 'first/follow'), ('postfix_expression_rest', "'['", 'first/follow')]
+    assert not analysis.is_ll1()
+
+
+def naive_analysis(grammar, start):
+    """
+     FIRST, FOLLOW and nullable by iterating over all productions until nothing changes.
+    """
+    nullable = dict.fromkeys(grammar, False)
+    first = {nt: set() for nt in grammar}
+    follow = {nt: set() for nt in grammar}
+    follow[start].add('$')
+
+    def first_of(symbols):
+        out = set()
+        for s in symbols:
+            if s not in grammar:
+                return out | {s}, False
+            out |= first[s]
+            if not nullable[s]:
+                return out, False
+        return out, True
+
+    changed = True
+    while changed:
+        changed = False
+        for nt, alternatives in grammar.items():
+            for symbols in alternatives:
+                symbols = [s for s in symbols if s != EPSILON]
+                prod_first, prod_nullable = first_of(symbols)
+                if not prod_first <= first[nt] or prod_nullable > nullable[nt]:
+                    first[nt] |= prod_first
+                    nullable[nt] = nullable[nt] or prod_nullable
+                    changed = True
+                for i, s in enumerate(symbols):
+                    if s not in grammar:
+                        continue
+                    rest_first, rest_nullable = first_of(symbols[i + 1:])
+                    if rest_nullable:
+                        rest_first = rest_first | follow[nt]
+                    if not rest_first <= follow[s]:
+                        follow[s] |= rest_first
+                        changed = True
+    return nullable, first, follow
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_grammar_analysis_matches_naive(seed):
+    grammar = generate_random_grammar(60, n_terminals=10, alternatives=3, length=4, seed=seed)
+    analysis = GrammarAnalysis(grammar)
+    assert (analysis.nullable, analysis.first, analysis.follow) == naive_analysis(grammar, 'n0')
+
+
+def test_grammar_analysis_nested_nullable_chain():
+    # FIRST computed recursively takes 3^depth steps here
+    analysis = GrammarAnalysis(generate_chain_grammar(2000))
+    assert analysis.nullable['a0']
+    assert analysis.first['a0'] == {f"'x{i}'" for i in range(2000)} | {"'y'"}
+    assert analysis.follow['a2000'] == analysis.first['a1'] | {'$'}
+
+
+def test_compile_million_statements():
+    n_statements = 1000000
+    code = Compiler(OldParser()).compile('{' + '1;\n' * n_statements + '}')
+    assert code.count('push 1;') == n_statements
+
+
+def test_emitter_text():
+    out = Emitter()
+    out.label('program')
+    out.emit('push 1')
+    out.label('_if1')
+    out.emit('halt')
+    assert out.instructions() == ['program:', 'push 1', '_if1:', 'halt']
+    assert out.text() == 'program:\npush 1;\n_if1:\nhalt;'
+
+
+def test_emit_deep_nesting():
+    for src in [generate_nested_source(150), generate_chain_source(500)]:
+        ast = OldParser().parse(Lexer().analyze(src))
+        ast.resolve_context()
+        out = Emitter()
+        ast.emit_to(out)
+        assert out.instructions() == OldParser().parse(Lexer().analyze(src)).emit()
+        assert Compiler(OldParser(), optimize=False).compile(src) == out.text() + '\nhalt;'
+
+
+def test_constant_folding():
+    src = '''{
+        func int f(int a) { return a * 1 + 0; }
+        entry
+        var int x = 60 * 60 * 24;
+        var int y = 0 + x - 0;
+        var int z = (y / 4) * 0 + 7 / 2 + 8 / 4 + (3 < 4) + (5 == 5) + (2 > 3) + (1 * 1 - 1) * (y < 2);
+        var int c = 0;
+        var int d = f(c + 1) * 0;
+        // the machine divides into floats, which are not exact past 2 ** 53
+        var int p = 9007199254740993 * 3 / 3;
+        var int q = 6 / 3;
+        var int r = (c / 2) * 0 + y * 0;
+        while (c < 10 - 1) { c = 1 + c; }
+        d = d + 1 - 1;
+    }'''
+    memory = []
+    sizes = []
+    for optimize in [False, True]:
+        compiler = Compiler(OldParser(), optimize=optimize)
+        code = compiler.compile(src)
+        vm = VirtualMachine()
+        vm.run_code(code)
+        # the values with their types: 2.0 == 2 but the machine may print either
+        memory.append([repr(value) for value in vm.memory])
+        sizes.append(len(preprocess_code(code)[0]))
+    assert memory[0] == memory[1] == ['86400', '86400', '7.5', '9', '0', '9007199254740992.0', '2.0', '0.0']
+    assert compiler.instructions_saved == sizes[0] - sizes[1] > 0
+    assert 'push 86400' in code and 'push 27021597764222979' in code and code.count('div') == 6
+    # `x * 0` is kept when `x` may be a float: a quotient or a variable
+    assert code.count('mul') == 4 and 'inc' in code and 'dec' in code
+
+    # operands that call, assign or may divide by zero are kept
+    code = Compiler(OldParser()).compile('{ entry var int x = 0; x = (4 / x) * 0 + (x = 2) * 0; }')
+    assert code.count('mul') == 2
+    with pytest.raises(ZeroDivisionError):
+        VirtualMachine().run_code(code)
+
+
+def test_peephole():
+    peephole = PeepholeOptimizer()
+    code = ['push 1', 'alloc', 'push 1', 'alloc', 'push 2', 'alloc', 'push 5', 'store 0', 'load 0', 'push 1', 'add',
+            'push 0', 'sub', 'push 0', 'dealloc', 'push 1', 'dealloc', 'push 3', 'dealloc',
+            # a jump may land after a label: nothing is rewritten across it
+            'store 1', '_if1:', 'load 1', 'push 1', '_if2:', 'sub', 'push 0', 'dealloc']
+    assert peephole.optimize(code) == ['push 4', 'alloc', 'push 5', 'dup', 'store 0', 'inc', 'push 4', 'dealloc',
+                                       'store 1', '_if1:', 'load 1', 'push 1', '_if2:', 'sub']
+    assert peephole.hits == {'drop_empty_dealloc': 2, 'merge_deallocs': 1, 'merge_allocs': 2, 'store_load': 1,
+                             'drop_zero_step': 1, 'increment': 1, 'decrement': 0, 'constant_branch': 0}
+
+    for src in generate_programs(20).values():
+        compiler = Compiler(OldParser())
+        runs = [count_instructions(Compiler(OldParser(), optimize=False).compile(src)),
+                count_instructions(compiler.compile(src))]
+        assert runs[1][1] < runs[0][1]
+        assert compiler.instructions_saved == runs[0][0] - runs[1][0]
+
+
+def test_dead_code_elimination():
+    src = '''{
+        func int used(int a) { if (a > 3) { return a; } return 0; }
+        func int unused(int a) { return a * 2; }
+        // only called from a function that is never called
+        func int also_unused() { return unused(1); }
+        entry
+        var int x = used(5);
+        if (1 - 1) { x = unused(2); }
+        while (0) { x = 7; }
+        if (1) { x = x + 1; }
+    }'''
+    memory = []
+    for optimize in [False, True]:
+        compiler = Compiler(OldParser(), optimize=optimize)
+        code = compiler.compile(src)
+        vm = VirtualMachine()
+        vm.run_code(code)
+        memory.append(vm.memory)
+    assert memory[0] == memory[1] and memory[1][0] == 6
+    assert 'func_used:' in code and 'func_unused' not in code and 'func_also_unused' not in code
+    assert 'push 7' not in code and compiler.peephole_hits['constant_branch'] == 3
+
+    # nothing after an unconditional `ret` or `jump` runs, unless a jump lands there
+    eliminator = DeadCodeEliminator()
+    assert eliminator.optimize(['f:', 'push 1', 'ret', 'push 2', 'dealloc', 'ret', 'program:', 'push 0', 'push 1',
+                                'call f', 'jz _if1', 'jump _if2', 'push 3', '_if1:', 'push 4', '_if2:', 'halt']) == \
+        ['f:', 'push 1', 'ret', 'program:', 'push 0', 'push 1', 'call f', 'jz _if1', 'jump _if2', '_if1:', 'push 4',
+         '_if2:', 'halt']
+    assert eliminator.removed == 4 and eliminator.called == {'f'}
+    # without an entry point, nothing is known to be dead
+    assert DeadCodeEliminator().optimize(['push 1', 'ret', 'push 2']) == ['push 1', 'ret', 'push 2']
+    # nor when a branch goes to a label the code does not define
+    code = ['program:', 'call f', 'jump _if1', 'push 2', 'halt']
+    eliminator = DeadCodeEliminator()
+    assert eliminator.optimize(code) == code and eliminator.removed == 0 and eliminator.called == set()
+
+
+def test_resolve_context():
+    ast = OldParser().parse(Lexer().analyze(
+        '{ var int x = 0; while (x) { func int f() { { return 1; } } if (x) { { break; } } continue; } }'))
+    ast.resolve_context()
+    loop = ast.children[1]
+    f, if_stmt, cont = loop.children[1].children
+    assert f.children[0].enclosing_block is f and f.children[0].children[0].enclosing_block is f.children[0]
+    assert cont.loop is loop and if_stmt.children[1].children[0].children[0].loop is loop
+
+    for src, error in [('{ break; }', LoopError), ('{ return 1; }', InvalidReturnError),
+                       # a loop around a function does not reach into its body
+                       ('{ while (1) { func int f() { continue; } } }', LoopError),
+                       # the first misplaced statement is reported
+                       ('{ if (1) { return 1; } while (1) { } break; }', InvalidReturnError)]:
+        with pytest.raises(error):
+            Compiler(OldParser()).compile(src)
+
+
+def test_walk_deep_ast(capsys):
+    n_operands = 20000
+    src = generate_chain_source(n_operands)
+    # deeper than the recursion limit: emission and printing must not recurse per level
+    assert n_operands > sys.getrecursionlimit()
+    cmds = OldParser().parse(Lexer().analyze(src)).emit()
+    assert cmds.count('add') == n_operands and cmds[-3:] == ['store 0', 'push 1', 'dealloc']
+
+    PrintVisitor().walk(NewParser().parse(Lexer().analyze(src)))
+    lines = capsys.readouterr().out.splitlines()
+    # under the block, the assignment and the `n_operands` additions
+    assert ' ' * (2 * (n_operands + 2) + 1) + 'Id(x)' in lines
+    assert lines[-3:] == ['     }', '   }', ' }']
+
+    print_ast(NewParser().parse(Lexer().analyze('{ while (x) { if (1) { break; } } }')))
+    assert capsys.readouterr().out == '\n'.join([
+        ' CodeBlock {', '   while (', '     Id(x)', '   ) {', '     CodeBlock {', '       If (', '         Number(1)',
+        '       ) {', '         CodeBlock {', '           break', '         }', '       }', '     }', '   }', ' }', ''])
+
+
+@pytest.mark.parametrize('use_new', [False, True])
+def test_compact_ast_nodes(use_new):
+    src = '{ var int x = 1; func int f(int a) { while (a) { a = a - 1; } return a; } x = f(x) * 2; }'
+    ast = create_parser(use_new).parse(Lexer().analyze(src))
+
+    def kinds(root):
+        out = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            assert not hasattr(node, '__dict__')
+            if not node.children:
+                assert node.children == ()
+            out.append(type(node).__name__)
+            stack.extend(node.children)
+        return out
+
+    copy = pickle.loads(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL))
+    assert kinds(copy) == kinds(ast)
+    if use_new:
+        # the ASTId of a declaration has no address until it is emitted
+        assert ast.children[0].name.address is None
+    else:
+        assert copy.emit() == ast.emit()
+    assert create_parser(use_new).parse(Lexer().analyze('{ var int x = 1; }')).emit()[:3] == ['push 1', 'alloc', 'push 1']
+
+
+def test_parse_million_statements_new_parser():
+    n_statements = 1000000
+    ast = NewParser().parse(Lexer().iter_tokens('{' + 'x;\n' * n_statements + '}'))
+    assert len(ast.children) == n_statements
+
+
+@pytest.mark.parametrize('use_new', [False, True])
+def test_long_operator_chains(use_new):
+    n_operands = 20000
+    chain = ' + '.join(['x * 2 / x'] * n_operands)
+    # 1 only if every `x * 2 / x` is 2, as it is when grouped to the left
+    src = '{ entry var int x = 3; x = ' + chain + ' != %d == 0; }' % (2 * n_operands)
+    stmt = create_parser(use_new).parse(Lexer().iter_tokens(src)).children[2]
+
+    node, depth = stmt.children[1], 0
+    while node.op != TokenType.PLUS:
+        node = node.children[0]
+    while isinstance(node, ASTExpr) and node.op == TokenType.PLUS:
+        node, depth = node.children[0], depth + 1
+    assert depth == n_operands - 1
+
+    if not use_new:
+        # NewParser leaves names unresolved, so only OldParser's tree is emitted
+        vm = VirtualMachine()
+        vm.run_code(Compiler(OldParser()).compile(src))
+        assert vm.memory[0] == 1
+
+
+def tree_shape(node):
+    if isinstance(node, ASTExpr):
+        return node.op, [tree_shape(ch) for ch in node.children]
+    return type(node).__name__, getattr(node, 'value', None), getattr(node, 'name', None), \
+        [tree_shape(ch) for ch in node.children]
+
+
+@pytest.mark.parametrize('use_new', [False, True])
+def test_pratt_expressions_match_grammar(use_new):
+    expressions = ['1', 'x = y = 1 + 2', 'x - y - 1 * 2 / x', 'x < y == 1 != 2 > x', '(x = 1) + f(1, y * 2) * 3',
+                   'x = f(x) - (y - (1 - x)) / 2 < y', 'f() + f(f(1), x = 2)']
+    decls = '{ func int f(int a, int b) { return a; } var int x = 1; var int y = 2; '
+    for expr in expressions:
+        src = decls + expr + '; }'
+        expected = tree_shape(TableParser().parse(Lexer().analyze(src)).children[-1])
+        actual = tree_shape(create_parser(use_new).parse(Lexer().analyze(src)).children[-1])
+        assert actual == expected, expr
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_validator_accepts_valid_files(file_path):
+    assert SyntaxValidator().validate_file(file_path).ok
+
+
+def test_validator_reports_all_errors():
+    src = '{ var int = 1;\n x = ;\n if (x { y = 2 }\n y = 3 $ 4; }'
+    diagnostics = SyntaxValidator().validate(src)
+    assert [(d.line_no, d.line_pos, d.message) for d in diagnostics] == [
+        (0, 10, "Unexpected token <=>, expected 'id'"),
+        (1, 5, "Unexpected token <;>, expected one of: '(', '*', 'id', 'number'"),
+        (2, 7, "Unexpected token <{>, expected ')'"),
+        (2, 15, "Unexpected token <}>, expected ';'"),
+        (3, 7, 'Unexpected character <$>'),
+        (3, 9, "Unexpected token <4>, expected ';'"),
+    ]
+
+
+def test_validator_end_of_input():
+    validator = SyntaxValidator()
+    assert [d.message for d in validator.validate('{ x = 1;')] == ["Unexpected end of input, expected '}'"]
+    assert [d.message for d in validator.validate('{ } }')] == ['Unexpected token <}>, expected end of input']
+
+
+def test_validate_directory(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.prog').write_text('{ var int x = 1; }')
+    (tmp_path / 'sub' / 'b.prog').write_text('{ x = ; }')
+    (tmp_path / 'c.prog').write_bytes(b'\xff\xfe')
+    (tmp_path / 'd.txt').write_text('{ x = ; }')
+
+    results = validate_directory(str(tmp_path), workers=2)
+    assert [os.path.relpath(r.path, tmp_path) for r in results] == ['a.prog', 'c.prog', os.path.join('sub', 'b.prog')]
+    assert [r.ok for r in results] == [True, False, False]
+    assert results[1].error is not None and not results[1].diagnostics
+    assert len(results[2].diagnostics) == 1 and results[2].error is None
+    assert results == validate_directory(str(tmp_path), workers=1)
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_lalr_parser_matches_old_parser(file_path):
+    with open(file_path, 'r') as f:
+        src = f.read()
+    assert compile_or_error(LALRParser(), src) == compile_or_error(OldParser(), src)
+
+
+def test_lalr_parser_matches_table_parser():
+    src = '{' + generate_source(30) + '''{
+        func int sum(int a, int b, int c) { return a + b * c - (a - b) / c; }
+        var int x = sum(1, 2, 3);
+        var int y = x = 4;
+        if (x == 1 != 0) { x = 2; }
+    }}'''
+    assert compile_or_error(LALRParser(), src) == compile_or_error(TableParser(), src)
+
+    decls = '{ func int f(int a, int b) { return a; } var int x = 1; var int y = 2; '
+    for expr in ['x = y = 1 + 2', 'x - y - 1 * 2 / x', 'x < y == 1 != 2 > x', 'f() + f(f(1), x = 2) * (y - 1)']:
+        src = decls + expr + '; }'
+        expected = tree_shape(TableParser().parse(Lexer().analyze(src)).children[-1])
+        assert tree_shape(LALRParser().parse(Lexer().analyze(src)).children[-1]) == expected, expr
+
+    for src in ['{ var int x }', '{ var int x; x = 1; } }', '{ if 1 { } }', '{ var foo x; }', '{ x; }']:
+        assert compile_or_error(LALRParser(), src) == compile_or_error(TableParser(), src), src
+
+
+@pytest.mark.parametrize('parser_class', [TableParser, LALRParser])
+def test_unsupported_syntax(parser_class):
+    for src, location in [('{ var int x = 1;\n x = x[0]; }', (1, 6)), ('{ var int x = 1;\n  x = *x; }', (1, 6))]:
+        with pytest.raises(UnsupportedSyntaxError) as e:
+            parser_class().parse(Lexer().analyze(src))
+        assert (e.value.tok.location.line_no, e.value.tok.location.line_pos) == location, src
+
+
+def test_lalr_parser_deep_nesting():
+    depth = 50000
+    src = '{ var int x = 1; x = ' + '(' * depth + 'x' + ')' * depth + ' + 1; }'
+    stmt = LALRParser().parse(Lexer().iter_tokens(src)).children[1]
+    assert stmt.op == TokenType.ASSIGN and stmt.children[1].op == TokenType.PLUS
+
+
+def test_lalr_table():
+    table = build_lalr_table(load_grammar())
+    # `*p(x)` and `*p[x]`: the call or subscript binds to `p`
+    assert sorted(terminal for _, terminal, _ in table.conflicts) == ['LEFT_BRACKET', 'LEFT_PARENTHESIS']
+
+    # LALR(1) but not SLR(1): FOLLOW(R) contains '=', yet R is never reduced on it
+    gr = Grammar()
+    for prod in ["S -> L '=' R", 'S -> R', "L -> '*' R", "L -> 'id'", 'R -> L']:
+        gr.add_prod_str(prod)
+    assert build_lalr_table(gr).conflicts == []
+
+    gr.add_prod_str("S -> 'id'")
+    with pytest.raises(ValueError):
+        build_lalr_table(gr)
+
+
+def test_lalr_table_cache(tmp_path):
+    grammar = load_grammar()
+    table = cached_lalr_table(grammar, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    cached = cached_lalr_table(grammar, cache_dir=str(tmp_path))
+    assert cached.actions == table.actions and cached.gotos == table.gotos
+
+    grammar.add_prod('arg_list', ["'comma'"])
+    cached_lalr_table(grammar, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_description_tables_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    table = build_description_table(cache_dir=cache_dir)
+    # the analysis the table was built from is kept too
+    assert sorted(f.split('-')[0] for f in os.listdir(cache_dir)) == ['analysis', 'll1']
+    cached = build_description_table(cache_dir=cache_dir)
+    assert cached.rows == description_table().rows == table.rows
+    analysis = analyze_description(cache_dir=cache_dir)
+    assert analysis.follow == description_analysis().follow
+
+    lalr_description_table(cache_dir=cache_dir)
+    assert lalr_description_table(cache_dir=cache_dir).actions == LALRParser().table.actions
+    assert len(os.listdir(cache_dir)) == 3
+
+    # keyed on the text of the grammar: any edit gives new tables
+    path = tmp_path / 'grammar.txt'
+    with open(GRAMMAR_PATH) as f:
+        path.write_text(f.read().replace("'break' , ';'", "'break' , 'number' , ';'"))
+    edited = build_description_table(str(path), cache_dir)
+    assert len(os.listdir(cache_dir)) == 5
+    assert edited.predict('statement', TokenType.BREAK)[2] == ("'break'", "'number'", "';'")
+
+
+class CountingParallelParser(ParallelParser):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.n_submitted = 0
+
+    def submit_batch_(self):
+        self.n_submitted += len(self.batch)
+        super().submit_batch_()
+
+
+def parallel_test_source(n_functions):
+    src = generate_source(n_functions).replace('acc = acc + arg', 'acc = acc + g + arg')
+    return src.replace('{', """{ var int g = 3;
+    if (g > 1) { g = 2; }
+    func int first(int a) { func int inner(int b) { while (b) { b = b - 1; } return b; } return inner(a) + g; }
+    """, 1)
+
+
+def test_parallel_parser_matches_old_parser():
+    src = parallel_test_source(40)
+    tokens = Lexer().analyze(src)
+    parser = CountingParallelParser(workers=2, min_parallel_tokens=0, batches_per_worker=3)
+    ast = parser.parse(tokens)
+    assert parser.n_submitted == 41
+    assert ast.emit() == OldParser().parse(tokens).emit()
+
+    f = ast.children[2]
+    body = f.children[0]
+    assert body.parent is f and body.symtable.parent is f.symtable
+    assert body.children[1].children[0].children[1].symbol is ast.symtable.find(names.intern('g'))
+
+
+def test_parallel_parser_skim():
+    tokens = Lexer().analyze('{ func int f() { if (1) { } { while (1) { } } } var int x; func int g(int a) { } }')
+    bodies = ParallelParser().skim(tokens)
+    assert [(tokens[start].type, tokens[end].type, n_labels) for start, (end, n_labels) in bodies.items()] == \
+        [(TokenType.LEFT_CURL, TokenType.RIGHT_CURL, 2), (TokenType.LEFT_CURL, TokenType.RIGHT_CURL, 0)]
+    assert [end - start for start, (end, _) in bodies.items()] == [15, 1]
+
+
+def test_parallel_parser_reports_first_error():
+    src = parallel_test_source(10)
+    for broken in [src.replace('k = k - 1;', 'k = k - ;', 1) + '}',
+                   src.replace('return acc;', 'return undefined;', 1),
+                   src.replace('helper5(int arg)', 'helper5(int g)', 1)]:
+        parser = ParallelParser(workers=2, min_parallel_tokens=0)
+        assert compile_or_error(parser, broken) == compile_or_error(OldParser(), broken)
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.prog'))))
+def test_parallel_parser_test_data(file_path):
+    with open(file_path, 'r') as f:
+        src = f.read()
+    assert compile_or_error(ParallelParser(workers=2, min_parallel_tokens=0), src) == \
+        compile_or_error(OldParser(), src)
@@ -0,0 +1,83 @@
+import glob
+import os
+
+import pytest
+
+from errors import InvalidReturnError
+from preprocessing import remove_comments
+from repl import Session
+from virtual_machine import VirtualMachine, split_statements
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'virtual_machine_test_data')
+
+
+def read_code(file_path):
+    with open(file_path, 'r') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*.bytecode'))))
+def test_split_statements_drops_comments(file_path):
+    code = read_code(file_path)
+    assert split_statements(code) == remove_comments(code).split(';')
+
+
+def test_factorial(capsys):
+    vm = VirtualMachine()
+    vm.run_code(read_code(os.path.join(TEST_DATA_DIR, 'factorial.bytecode')))
+    assert capsys.readouterr().out == '120\n'
+
+
+def test_load_and_run_appended_code():
+    vm = VirtualMachine()
+    vm.sp = -1
+    start = vm.append_code('sq: push 1; alloc; store 0; load 0; load 0; mul; ret')
+    assert start == 0
+    start = vm.append_code('push 7; push 1; call sq')
+    assert start == 7
+    vm.run(start)
+    assert vm.stack[vm.sp] == 49
+
+    vm.truncate(start)
+    assert len(vm.program) == 7 and vm.labels == {'sq': 0}
+
+
+def test_session_keeps_variables_and_functions():
+    session = Session()
+    assert session.execute('var int x = 5;') == []
+    assert session.execute('func int sq(int a) { return a * a; }') == []
+    assert session.execute('sq(x);') == [25]
+    assert session.execute('x = sq(x) + 1; var int y = x;') == []
+    assert session.value_of('x') == 26
+    assert session.value_of('y') == 26
+
+
+def test_session_labels_do_not_clash():
+    session = Session()
+    session.execute('var int n = 0; while (n < 3) { n = n + 1; }')
+    session.execute('var int m = 0; while (m < n) { m = m + 2; } if (m > 3) { m = 0; }')
+    assert session.value_of('m') == 0
+    assert len(session.vm.labels) == len(set(session.vm.labels.values()))
+
+
+def test_session_rolls_back_failed_input():
+    session = Session()
+    session.execute('var int x = 1;')
+    n_instructions = len(session.vm.program)
+
+    with pytest.raises(ValueError):
+        session.execute('var int y = 2; x = z;')
+    with pytest.raises(InvalidReturnError):
+        session.execute('var int y = 3; return y;')
+    with pytest.raises(ZeroDivisionError):
+        session.execute('func int f() { return 1 / 0; } var int y = f();')
+    with pytest.raises(ZeroDivisionError):
+        session.execute('x = 5; var int y = 1 / 0;')
+    with pytest.raises(ZeroDivisionError):
+        session.execute('while (x < 5) { x = x + 1; } { var int z = 1; x = z / 0; }')
+    assert len(session.vm.program) == n_instructions
+    assert session.parser.symtable.find_name('y') is None
+    assert session.value_of('x') == 1
+
+    # the names of the failed inputs are free again
+    assert session.execute('var int y = x + 1; func int f(int a) { return a; } f(y);') == [2]
@@ -0,0 +1,54 @@
+from collections import deque
+from itertools import islice
+
+from my_lexer import Token, TokenType
+
+
+class TokenSource:
+    """
+     Pull-based token supply for the parsers. Wraps any iterable of tokens (a list or
+     `Lexer.iter_tokens` generator) and keeps only the tokens that were peeked but not yet
+     consumed, so memory is bounded by the lookahead instead of the source size.
+     When the input is exhausted an EOF token is returned.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.buffer = deque()
+        self.consumed = 0
+        self.eof_token = Token('', TokenType.EOF)
+
+    def fill_(self, n):
+        while len(self.buffer) < n:
+            tok = next(self.tokens, None)
+            if tok is None:
+                return False
+            self.buffer.append(tok)
+        return True
+
+    def peek(self, k=0):
+        if not self.fill_(k + 1):
+            return self.eof_token
+        return self.buffer[k]
+
+    def next(self):
+        if self.buffer:
+            tok = self.buffer.popleft()
+        else:
+            # nothing was peeked, so the buffer is skipped
+            tok = next(self.tokens, None)
+            if tok is None:
+                return self.eof_token
+        self.consumed += 1
+        return tok
+
+    def skip(self, n):
+        """
+         Consumes `n` tokens without returning them; the caller knows they are there.
+        """
+        from_buffer = min(n, len(self.buffer))
+        for _ in range(from_buffer):
+            self.buffer.popleft()
+        # islice drops the rest in C, without a Python-level step per token
+        deque(islice(self.tokens, n - from_buffer), maxlen=0)
+        self.consumed += n
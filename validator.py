@@ -0,0 +1,201 @@
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from errors import UnexpectedCharacterError
+from first_and_follow import description_analysis
+from ll1_table import ParseTable, description_table, terminal_types
+from my_lexer import Lexer, TokenType, find_line_starts
+from token_source import TokenSource
+
+
+@dataclass
+class Diagnostic:
+    line_no: int
+    line_pos: int
+    message: str
+
+    def __str__(self):
+        return f'line:{self.line_no},pos:{self.line_pos}: {self.message}'
+
+
+@dataclass
+class ValidationResult:
+    path: str
+    diagnostics: list = field(default_factory=list)
+    # set when the file could not be read at all
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None and not self.diagnostics
+
+
+class SyntaxValidator:
+    """
+     Checks the syntax of programs without building an AST, and reports every error of a program
+     instead of stopping at the first one.
+
+     The validator runs the predictive parse table of the grammar description with no actions.
+     On an error it recovers in panic mode. A nonterminal with an empty production takes it for
+     any token it has no entry for, so the error shows up at the next terminal with a precise
+     expectation. When another nonterminal A on top of the stack has no entry for the current
+     token, tokens are skipped until one is in FIRST(A), where parsing of A resumes, or in
+     FOLLOW(A), where A is given up. A terminal that does not match is reported as
+     missing and popped. After an error nothing is reported until a token is matched again, so
+     one mistake does not cascade into many. A character the lexer does not know is reported
+     and skipped.
+    """
+
+    def __init__(self, table: ParseTable = None, lexer: Lexer = None):
+        self.table = table or description_table()
+        self.lexer = lexer or Lexer()
+
+        types = terminal_types()
+        self.n_terminals = len(TokenType)
+        nonterminals = self.table.nonterminals
+
+        # stack items: token type values for terminals, n_terminals + index for nonterminals
+        self.expansions = [[types[s].value if s in types else self.n_terminals + nonterminals.index(s)
+                            for s in symbols][::-1] for _, _, symbols in self.table.productions]
+        self.start_item = self.n_terminals + nonterminals.index(self.table.start)
+
+        # the empty production of each nonterminal, or -1
+        self.empty_prods = [-1] * len(nonterminals)
+        for prod, (nonterminal, _, symbols) in enumerate(self.table.productions):
+            if not symbols:
+                self.empty_prods[nonterminals.index(nonterminal)] = prod
+
+        analysis = description_analysis()
+        self.first_sets = [frozenset(types[s].value for s in analysis.first[nt]) for nt in nonterminals]
+        self.follow_sets = [frozenset(types[s].value for s in analysis.follow[nt]) for nt in nonterminals]
+
+        self.terminal_names = {}
+        for name, token_type in types.items():
+            if name.startswith("'"):
+                self.terminal_names[token_type.value] = name
+        self.terminal_names[TokenType.EOF.value] = 'end of input'
+
+    def expected_(self, nonterminal):
+        row = self.table.rows[nonterminal]
+        return ', '.join(sorted(self.terminal_names[t] for t in range(self.n_terminals) if row[t] >= 0))
+
+    def tokens_(self, code, diagnostics):
+        """
+         Tokens of `code`. A character the lexer does not know is reported and scanning goes on
+         right after it.
+        """
+        start = 0
+        line_starts = None
+        while True:
+            try:
+                yield from self.lexer.scan(code, 0, start)
+                return
+            except UnexpectedCharacterError as e:
+                location = e.location
+                diagnostics.append(Diagnostic(location.line_no, location.line_pos,
+                                              f'Unexpected character <{e.char}>'))
+                if line_starts is None:
+                    line_starts = find_line_starts(code)
+                start = line_starts[location.line_no] + location.line_pos + 1
+
+    def validate(self, code):
+        """
+         Returns the list of diagnostics for `code`, ordered by location; empty for a valid program.
+        """
+        diagnostics = []
+        source = TokenSource(self.tokens_(code, diagnostics))
+
+        n_terminals = self.n_terminals
+        rows = self.table.rows
+        eof = TokenType.EOF.value
+
+        tok = source.next()
+        location = tok.location or (0, 0)
+        in_error = False
+
+        def report(expected):
+            if in_error:
+                return
+            found = 'end of input' if tok.type.value == eof else f'token <{tok.lexeme}>'
+            diagnostics.append(Diagnostic(location[0], location[1], f'Unexpected {found}, expected {expected}'))
+
+        stack = [self.start_item]
+        while stack:
+            item = stack.pop()
+            tok_type = tok.type.value
+            if item >= n_terminals:
+                nonterminal = item - n_terminals
+                prod = rows[nonterminal][tok_type]
+                if prod < 0:
+                    prod = self.empty_prods[nonterminal]
+                if prod >= 0:
+                    stack.extend(self.expansions[prod])
+                    continue
+
+                report('one of: ' + self.expected_(nonterminal))
+                in_error = True
+
+                first, follow = self.first_sets[nonterminal], self.follow_sets[nonterminal]
+                while tok_type != eof and tok_type not in first and tok_type not in follow:
+                    tok = source.next()
+                    tok_type = tok.type.value
+                    if tok.location is not None:
+                        location = tok.location.line_no, tok.location.line_pos
+                if tok_type in first:
+                    stack.append(item)
+            elif item == tok_type:
+                in_error = False
+                if tok_type != eof:
+                    tok = source.next()
+                    if tok.location is not None:
+                        location = tok.location.line_no, tok.location.line_pos
+            else:
+                report(self.terminal_names[item])
+                in_error = True
+
+        diagnostics.sort(key=lambda d: (d.line_no, d.line_pos))
+        return diagnostics
+
+    def validate_file(self, path):
+        try:
+            with open(path, 'r') as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            return ValidationResult(path, error=str(e))
+        return ValidationResult(path, self.validate(code))
+
+
+# validator of a worker process, created on first use
+worker_validator = None
+
+
+def validate_file(path):
+    global worker_validator
+    if worker_validator is None:
+        worker_validator = SyntaxValidator()
+    return worker_validator.validate_file(path)
+
+
+def validate_directory(dir_path, workers=None):
+    """
+     Validates every `.prog` file under `dir_path` in a process pool and returns a
+     ValidationResult per file, ordered by path.
+    """
+    paths = sorted(glob.glob(os.path.join(dir_path, '**', '*.prog'), recursive=True))
+    if workers == 1 or len(paths) < 2:
+        return [validate_file(path) for path in paths]
+
+    with ProcessPoolExecutor(workers) as pool:
+        chunk_size = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+        return list(pool.map(validate_file, paths, chunksize=chunk_size))
+
+
+if __name__ == '__main__':
+    for result in validate_directory(sys.argv[1] if len(sys.argv) > 1 else 'parsing_test_data'):
+        if result.error is not None:
+            print(f'{result.path}: {result.error}')
+        for diagnostic in result.diagnostics:
+            print(f'{result.path}:{diagnostic}')
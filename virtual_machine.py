@@ -1,6 +1,9 @@
 # -*- coding=utf-8 -*-
 
-from preprocessing import remove_comments
+import re
+
+# comments, runs of ordinary text, a lone slash or a statement separator
+statement_part_re = re.compile(r'//[^\n]*|[^;/]+|/|;')
 
 
 def parse(cmd):
@@ -15,19 +18,42 @@ def parse(cmd):
     return op, arg
 
 
-def preprocess_code(program_code):
-    program_code = remove_comments(program_code, '//')
-    lines = program_code.split(';')
+def split_statements(program_code):
+    """
+     Splits code on `;` in a single pass, dropping comments on the way.
+    """
+    statements = []
+    parts = []
+    for m in statement_part_re.finditer(program_code):
+        part = m.group()
+        if part == ';':
+            statements.append(''.join(parts))
+            parts = []
+        elif not part.startswith('//'):
+            parts.append(part)
+    statements.append(''.join(parts))
+    return statements
+
+
+def preprocess_code(program_code, labels=None, offset=0):
+    """
+     Parses bytecode into (op, arg) instructions with jump targets resolved to instruction
+     indices. The code is placed at `offset` in a program whose labels so far are `labels`: jumps
+     may refer to them, and the labels the code defines are added to them.
+    """
+    lines = split_statements(program_code)
     lines = [s.strip() for s in lines if len(s.strip()) > 0]
 
+    if labels is None:
+        labels = {}
+
     # form map of labels and rows where each label is defined
     # allows to use integer indices for jumps
-    labels = {}
     for i, line in enumerate(lines):
         parts = line.split(':')
         while len(parts) > 1:
             lab = parts.pop(0).strip()
-            labels[lab] = i
+            labels[lab] = offset + i
 
     # replace labels in commands to numbers of corresponding lines
     for i, line in enumerate(lines):
@@ -69,6 +95,10 @@ class VirtualMachine:
         self.ip_changed = False
         self.is_stopped = False
 
+        # instructions and labels of the loaded program
+        self.program = []
+        self.labels = {}
+
         self.debug = debug
 
     @property
@@ -272,23 +302,46 @@ class VirtualMachine:
 
     def run_code(self, program_code):
 
-        lines, labels = preprocess_code(program_code)
+        self.program, self.labels = preprocess_code(program_code)
         if self.debug:
-            print(lines)
-            print(labels)
-        num_instructions = len(lines)
+            print(self.program)
+            print(self.labels)
 
-        self.ip = 0
         self.sp = -1
 
-        self.jump(labels['program'])
-
+        self.run(self.labels['program'])
+
+    def append_code(self, program_code):
+        """
+         Appends bytecode to the loaded program; it may jump to labels of the code loaded before.
+         Returns the index of its first instruction.
+        """
+        start = len(self.program)
+        instructions, _ = preprocess_code(program_code, self.labels, start)
+        self.program += instructions
+        return start
+
+    def truncate(self, size):
+        """
+         Drops the instructions loaded after the first `size` ones, with their labels.
+        """
+        del self.program[size:]
+        for label in [label for label, idx in self.labels.items() if idx >= size]:
+            del self.labels[label]
+
+    def run(self, start):
+        """
+         Executes the loaded program from instruction `start` until it halts or runs past its end.
+        """
+        program = self.program
+
+        self.ip = start
         self.ip_changed = False
         self.is_stopped = False
 
-        while self.ip < num_instructions and not self.is_stopped:
+        while self.ip < len(program) and not self.is_stopped:
 
-            op, arg = lines[self.ip]
+            op, arg = program[self.ip]
             if self.debug:
                 arg_str = f'({arg})' if arg is not None else ''
                 print(f'Execute {op.upper()}' + arg_str)